@@ -0,0 +1,37 @@
+import argparse
+import asyncio
+import json
+import sys
+from src.client.hipaa_client import HIPAAMedicalClient
+from src.client.batch_runner import load_checkpoint
+
+async def main():
+    parser = argparse.ArgumentParser(description="Replay JSONL requests against the HIPAA Medical Smart Agent")
+    parser.add_argument("input", nargs="?", default="-", help="JSONL request file, or - for stdin")
+    parser.add_argument("-o", "--output", default="-", help="JSONL result file, or - for stdout")
+    parser.add_argument("--role", default="doctor", choices=["doctor", "administrator"])
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="Tool calls kept in flight")
+    parser.add_argument("--order", default="input", choices=["input", "completion"], help="Result order")
+    parser.add_argument("--resume", action="store_true", help="Skip request IDs already present in --output")
+    parser.add_argument("--server", default="server.py")
+    parser.add_argument("--url", help="Use a shared HTTP server instead of spawning --server")
+    args = parser.parse_args()
+    
+    if args.resume and args.output == "-":
+        parser.error("--resume needs --output to name a file")
+    done_ids = load_checkpoint(args.output) if args.resume else set()
+    
+    input_stream = sys.stdin if args.input == "-" else open(args.input)
+    output_stream = sys.stdout if args.output == "-" else open(args.output, "a" if args.resume else "w")
+    client = HIPAAMedicalClient()
+    client.user_role = args.role
+    try:
+        counts = await client.run_batch(input_stream, output_stream, args.concurrency,
+                                        args.order == "input", done_ids, args.server, args.url)
+    finally:
+        if input_stream is not sys.stdin:input_stream.close()
+        if output_stream is not sys.stdout:output_stream.close()
+    print(json.dumps(counts), file=sys.stderr)
+
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,105 @@
+"""Compare X-ray inference backends: parity with eager mode, latency and throughput per batch size.
+
+Uses the real DenseNet weights when they can be loaded; ``--random-weights``
+benchmarks the same architecture with randomly initialized weights (useful
+offline, though int8 parity numbers are then less meaningful).
+
+    python benchmarks/inference_benchmark.py --backends eager,torchscript,int8_static,onnx --threads 4
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from src.server.models.inference_backends import BACKENDS, build_backend, check_parity, default_tolerance
+from src.server.models.model_manager import ModelManager, TORCHXRAYVISION_WEIGHTS, DEFAULT_MODEL, xray_transform
+
+def load_model(manager, model_name, random_weights):
+    """Load the weights (or a randomly initialized model of the same shape) without building a backend"""
+    import torchxrayvision as xrv
+    if random_weights:
+        architecture, resolution = TORCHXRAYVISION_WEIGHTS[model_name]
+        model = getattr(xrv.models, architecture)(weights=None)
+        model.pathologies = xrv.datasets.default_pathologies
+        manager.register_model(model_name, lambda: model, resolution)
+    entry = manager.get_entry(model_name)
+    entry.model = entry.factory().eval()
+    entry.transform = xray_transform(entry.resolution)
+    return entry
+
+def time_backend(backend, sample, batch_sizes, iterations):
+    import torch
+    results = {}
+    for batch_size in batch_sizes:
+        batch = torch.stack([sample[i % len(sample)] for i in range(batch_size)])
+        for _ in range(backend.warmup_runs):
+            backend(batch)
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            backend(batch)
+            timings.append(time.perf_counter() - started)
+        p50 = statistics.median(timings)
+        results[str(batch_size)] = {
+            "p50_ms": 1000 * p50,
+            "min_ms": 1000 * min(timings),
+            "images_per_s": batch_size / p50
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--model", default=DEFAULT_MODEL, choices=sorted(TORCHXRAYVISION_WEIGHTS))
+    parser.add_argument("--batch-sizes", default="1,2,4,8,16,32")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--threads", type=int, help="Intra-op threads (default: HIPAA_TORCH_THREADS)")
+    parser.add_argument("--channels-last", action="store_true")
+    parser.add_argument("--image-dir", default=os.path.join(REPO_ROOT, "normalized_patients"),
+                        help="Images for calibration and parity")
+    parser.add_argument("--random-weights", action="store_true")
+    args = parser.parse_args()
+
+    os.environ["HIPAA_XRAY_CALIBRATION_DIR"] = args.image_dir
+    manager = ModelManager(torch_threads=args.threads, channels_last=args.channels_last)
+    entry = load_model(manager, args.model, args.random_weights)
+    sample = entry._calibration_tensors()
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+
+    eager = build_backend("eager", entry.model, manager.torch_threads, resolution=entry.resolution)
+    # Export fresh each run; random weights differ between runs
+    onnx_path = os.path.join(tempfile.mkdtemp(prefix="xray-onnx-"), f"{args.model}.onnx")
+    report = {
+        "model": args.model,
+        "threads": manager.torch_threads,
+        "channels_last": args.channels_last,
+        "sample_images": len(sample),
+        "backends": {}
+    }
+    for name in args.backends.split(","):
+        result = {}
+        try:
+            started = time.perf_counter()
+            backend = build_backend(name, entry.model, manager.torch_threads, args.channels_last,
+                                    calibration=sample, onnx_path=onnx_path, resolution=entry.resolution)
+            result["build_s"] = time.perf_counter() - started
+            parity = check_parity(eager, backend, sample[:8], default_tolerance(name))
+            result["parity"] = {key: parity[key] for key in ("max_abs_diff", "tolerance", "ok")}
+            result["latency"] = time_backend(backend, sample, batch_sizes, args.iterations)
+        except Exception as e:
+            result["error"] = f"{type(e).__name__}: {e}"
+        report["backends"][name] = result
+        print(f"{name}: {json.dumps(result.get('parity') or result.get('error'))}", file=sys.stderr)
+    manager.shutdown()
+    shutil.rmtree(os.path.dirname(onnx_path), ignore_errors=True)
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
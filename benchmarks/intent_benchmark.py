@@ -0,0 +1,136 @@
+"""Compare the single-pass intent router in InputProcessor with the original per-pattern checks.
+
+Generates a corpus of clinician utterances (patient mentions in every supported
+form, keywords in mixed case, long free-text lines, some non-ASCII text and
+repeated lines), verifies that the router returns exactly what the original
+methods return for every line, and times routing the whole corpus.
+
+    python benchmarks/intent_benchmark.py --utterances 200000
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.client.input_processor import InputProcessor
+
+class LegacyInputProcessor:
+    """The original InputProcessor, kept as the baseline"""
+    def extract_patient_id(self, text):
+        patterns = [
+            r'patient\s+(\d+)',
+            r'patient\s+id\s+(\d+)',
+            r'pt\s+(\d+)',
+            r'patient_(\d+)',
+            r'Patient_(\d+)'
+        ]
+        for pattern in patterns:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:return match.group(1)
+        return None
+    def is_patient_info_request(self, text):
+        keywords = ["notes", "information", "summary", "details", "record", "history", "data"]
+        return any(keyword in text.lower() for keyword in keywords)
+    def is_xray_request(self, text):
+        keywords = ["xray", "x-ray", "scan", "imaging", "radiolog", "chest"]
+        return any(keyword in text.lower() for keyword in keywords)
+
+MENTIONS = ["patient {n}", "Patient {n}", "PATIENT  {n}", "patient id {n}", "pt {n}", "PT {n}", "patient_{n}",
+            "Patient_{n}", "pt {n} and patient {m}", "patient id {n} (patient_{m})", "patient {n}{n}", "pt{n}"]
+KEYWORDS = ["notes", "information", "Summary", "DETAILS", "record", "history", "data", "xray", "X-Ray", "scan",
+            "imaging", "radiology", "Chest", "recordata", "scanotes"]
+FILLER = ("can you please tell me what we know about the latest visit and whether anything changed since "
+          "last week given the current medication plan and the follow up schedule").split()
+UNICODE = ["PATİENT {n}", "résumé", "naïve", "pàtient {n}", "Ωmega", "ıd"]
+
+def utterance(rng, long_fraction):
+    words = rng.sample(FILLER, rng.randint(2, 10))
+    if rng.random() < long_fraction:
+        words += [rng.choice(FILLER) for _ in range(rng.randint(50, 200))]
+    for _ in range(rng.randint(0, 2)):
+        words.insert(rng.randint(0, len(words)), rng.choice(KEYWORDS))
+    if rng.random() < 0.7:
+        mention = rng.choice(MENTIONS).format(n=rng.randint(1, 500), m=rng.randint(1, 500))
+        words.insert(rng.randint(0, len(words)), mention)
+    if rng.random() < 0.03:
+        words.insert(rng.randint(0, len(words)), rng.choice(UNICODE).format(n=rng.randint(1, 500)))
+    return " ".join(words)
+
+def legacy_route(processor, text):
+    """Everything the client asked per line: the patient ID plus the intent checks in handler order"""
+    patient_id = processor.extract_patient_id(text)
+    if processor.is_patient_info_request(text):return patient_id, "patient_info"
+    if processor.is_xray_request(text):return patient_id, "xray"
+    return patient_id, None
+
+def time_call(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--utterances", type=int, default=200000)
+    parser.add_argument("--long-fraction", type=float, default=0.05, help="Share of long free-text lines")
+    parser.add_argument("--repeated-fraction", type=float, default=0.2, help="Share of lines repeating an earlier one")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = []
+    for _ in range(args.utterances):
+        # Replayed sessions and batch files repeat earlier lines
+        repeated = corpus and rng.random() < args.repeated_fraction
+        corpus.append(rng.choice(corpus) if repeated else utterance(rng, args.long_fraction))
+    legacy = LegacyInputProcessor()
+    router = InputProcessor()
+
+    expected = [(legacy_route(legacy, text), legacy.is_patient_info_request(text), legacy.is_xray_request(text))
+                for text in corpus]
+    routes = router.classify_many(corpus)
+    mismatches = 0
+    for text, route, (routed, info, xray) in zip(corpus, routes, expected):
+        single = router.classify(text)
+        if ((route.patient_id, route.intent) != routed or ("patient_info" in route.intents) != info
+                or ("xray" in route.intents) != xray or single != route):
+            mismatches += 1
+
+    def run_legacy():
+        for text in corpus:
+            legacy_route(legacy, text)
+
+    def run_classify():
+        processor = InputProcessor()
+        for text in corpus:
+            processor.classify(text)
+
+    def run_classify_many():
+        InputProcessor().classify_many(corpus)
+
+    results = {
+        "utterances": len(corpus),
+        "distinct": len(set(corpus)),
+        "mismatches": mismatches,
+        "seconds": {
+            "legacy_methods": time_call(run_legacy, args.repeat),
+            "router_classify": time_call(run_classify, args.repeat),
+            "router_classify_many": time_call(run_classify_many, args.repeat)
+        }
+    }
+    baseline = results["seconds"]["legacy_methods"]
+    results["speedup_vs_legacy"] = {
+        name: baseline / seconds for name, seconds in results["seconds"].items() if seconds > 0
+    }
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+"""Load-test HIPAAMedicalServer over in-memory MCP streams.
+
+Drives the real server object (no subprocess) with a weighted mix of tool
+calls at a fixed concurrency and reports p50/p95/p99 latency, throughput and
+a per-stage breakdown (record loading, PII masking, X-ray inference, LLM and
+audit logging). The LLM is replaced by a deterministic stub and, with
+``--stub-model``, the DenseNet by a tiny deterministic torch module, so runs
+are reproducible and need neither Ollama nor model weights.
+
+    python benchmarks/synthetic_data.py --out /tmp/hipaa-bench --patients 500 --xrays 100
+    python benchmarks/load_test.py --data-dir /tmp/hipaa-bench --requests 500 --concurrency 16 \\
+        --stub-model --output baseline.json
+    python benchmarks/load_test.py --data-dir /tmp/hipaa-bench --requests 500 --concurrency 16 \\
+        --stub-model --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from stub_llm import StubLLM, RESPONSE_PREFIX
+
+DEFAULT_MIX = "get_patient_info=5,analyze_xray=2,chat_with_agent=3"
+
+def stage_breakdown():
+    """Per-stage timings recorded by the server's always-on instrumentation"""
+    from src.server.utils.metrics import metrics
+    stages = {}
+    for entry in metrics.snapshot()["histograms"].get("hipaa_stage_duration_seconds", []):
+        if entry["count"]:
+            stages[entry["labels"]["stage"]] = {
+                "count": entry["count"],
+                "mean_ms": 1000 * entry["mean"],
+                "p50_ms": 1000 * entry["p50"],
+                "p95_ms": 1000 * entry["p95"],
+                "p99_ms": 1000 * entry["p99"],
+                "max_ms": 1000 * entry["max"]
+            }
+    return dict(sorted(stages.items()))
+
+def install_stub_model():
+    """Swap the DenseNet for a deterministic module with the same interface"""
+    import torch
+    from src.server import hipaa_server
+    from src.server.models.model_manager import ModelManager
+
+    class StubXrayModel(torch.nn.Module):
+        pathologies = ["Atelectasis", "Cardiomegaly", "Consolidation", "Edema", "Effusion",
+                       "Emphysema", "Fibrosis", "Pneumonia", "Pneumothorax", "Nodule"]
+
+        def __init__(self):
+            super().__init__()
+            generator = torch.Generator().manual_seed(0)
+            self.conv = torch.nn.Conv2d(1, 8, kernel_size=7, stride=4)
+            self.head = torch.nn.Linear(8, len(self.pathologies))
+            for parameter in self.parameters():
+                parameter.data = torch.randn(parameter.shape, generator=generator) * 0.05
+
+        def forward(self, x):
+            features = torch.relu(self.conv(x)).mean(dim=(2, 3))
+            return torch.sigmoid(self.head(features))
+
+    class StubModelManager(ModelManager):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.register_model("stub-model", StubXrayModel)
+            self.default_model = "stub-model"
+
+    hipaa_server.ModelManager = StubModelManager
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+def discover_patients(data_dir):
+    ehr_ids, xray_ids = [], []
+    for name in sorted(os.listdir(os.path.join(data_dir, "ehr"))):
+        if name.startswith("Patient_") and name.endswith(".json"):
+            ehr_ids.append(name[len("Patient_"):-len(".json")])
+    image_dir = os.path.join(data_dir, "normalized_patients")
+    if os.path.isdir(image_dir):
+        for name in sorted(os.listdir(image_dir)):
+            if name.startswith("Patient_") and name.endswith(".png"):
+                xray_ids.append(name[len("Patient_"):-len(".png")])
+    return ehr_ids, xray_ids
+
+def build_requests(count, mix, ehr_ids, xray_ids, seed, burst=1):
+    """``count`` weighted tool calls; with ``burst`` > 1 each call is issued that many times in a row,
+    like several clinicians opening the same patient at rounds"""
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    requests = []
+    for _ in range(-(-count // burst)):
+        name = rng.choices(names, weights)[0]
+        role = rng.choice(["doctor", "nurse", "administrator"])
+        if name == "analyze_xray":
+            arguments = {"patient_id": rng.choice(xray_ids), "user_role": role, "query": "Summarize findings"}
+        elif name == "get_patient_info":
+            arguments = {"patient_id": rng.choice(ehr_ids), "user_role": role, "query": "Current medications?"}
+        elif name == "chat_with_agent":
+            arguments = {"user_role": role, "message": "Any interactions to watch for?",
+                         "patient_context": rng.choice(ehr_ids)}
+        else:
+            raise ValueError(f"Unsupported tool in mix: {name}")
+        requests.extend([(name, arguments)] * burst)
+    return requests[:count]
+
+def percentiles(values):
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(round(q / 100.0 * (len(ordered) - 1))))]
+    return {
+        "count": len(ordered),
+        "mean_ms": 1000 * sum(ordered) / len(ordered),
+        "p50_ms": 1000 * pick(50),
+        "p95_ms": 1000 * pick(95),
+        "p99_ms": 1000 * pick(99),
+        "max_ms": 1000 * ordered[-1]
+    }
+
+async def run_load(args):
+    from mcp.shared.memory import create_connected_server_and_client_session
+    from src.server.hipaa_server import HIPAAMedicalServer
+    from src.server.utils.llama_client import set_llm_backend, close_ollama_client, llm_flight
+    from src.server.utils.data_loader import record_flight
+    from src.server.utils.metrics import metrics
+
+    stub = StubLLM(tokens=args.llm_tokens, tokens_per_second=args.llm_tokens_per_second,
+                   prefill_ms_per_kchar=args.llm_prefill_ms)
+    set_llm_backend(stub)
+
+    ehr_ids, xray_ids = discover_patients(".")
+    if not ehr_ids or not xray_ids:
+        raise SystemExit("Data directory needs ehr/Patient_N.json records and normalized_patients/Patient_N.png images")
+    requests = build_requests(args.requests, parse_mix(args.mix), ehr_ids, xray_ids, args.seed, args.burst)
+
+    server = HIPAAMedicalServer()
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    try:
+        async with create_connected_server_and_client_session(server.server) as session:
+            # Model loading is a one-off startup cost, not part of the steady-state numbers
+            await server.model_manager.ensure_loaded()
+
+            async def call(name, arguments):
+                async with semaphore:
+                    started = time.perf_counter()
+                    result = await session.call_tool(name, dict(arguments))
+                    elapsed = time.perf_counter() - started
+                text = result.content[0].text if result.content else ""
+                if result.isError or not text.startswith(RESPONSE_PREFIX):
+                    errors[name] += 1
+                latencies[name].append(elapsed)
+
+            for name, arguments in requests[:args.warmup]:
+                await call(name, arguments)
+            latencies.clear()
+            errors.clear()
+            metrics.reset()
+
+            started = time.perf_counter()
+            await asyncio.gather(*(call(name, arguments) for name, arguments in requests))
+            wall = time.perf_counter() - started
+    finally:
+        set_llm_backend(None)
+        await close_ollama_client()
+        server.model_manager.shutdown()
+
+    every = [value for values in latencies.values() for value in values]
+    return {
+        "config": {
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "burst": args.burst,
+            "mix": args.mix,
+            "stub_model": args.stub_model,
+            "llm_cache": args.llm_cache,
+            "llm_tokens": args.llm_tokens,
+            "llm_tokens_per_second": args.llm_tokens_per_second,
+            "patients": len(ehr_ids),
+            "xrays": len(xray_ids)
+        },
+        "wall_s": wall,
+        "throughput_rps": len(every) / wall if wall else None,
+        "latency": percentiles(every),
+        "tools": {name: dict(percentiles(values), errors=errors[name]) for name, values in sorted(latencies.items())},
+        "stages": stage_breakdown(),
+        "llm_calls": stub.calls,
+        "batching": server.model_manager.get_batch_stats(),
+        "single_flight": {
+            "patient_record": record_flight.stats(),
+            "xray_inference": server.model_manager.inference_flight.stats(),
+            "llm": llm_flight.stats()
+        }
+    }
+
+def compare(current, baseline, threshold):
+    """Relative change of the headline numbers; positive means slower"""
+    rows = {}
+
+    def add(key, new, old):
+        if new is None or not old:
+            return
+        change = (new - old) / old
+        rows[key] = {"baseline": old, "current": new, "change": change, "regression": change > threshold}
+
+    add("latency.p50_ms", current["latency"].get("p50_ms"), baseline["latency"].get("p50_ms"))
+    add("latency.p95_ms", current["latency"].get("p95_ms"), baseline["latency"].get("p95_ms"))
+    add("latency.p99_ms", current["latency"].get("p99_ms"), baseline["latency"].get("p99_ms"))
+    if current.get("throughput_rps") and baseline.get("throughput_rps"):
+        # Lower throughput is the regression, so invert the sign
+        change = (baseline["throughput_rps"] - current["throughput_rps"]) / baseline["throughput_rps"]
+        rows["throughput_rps"] = {"baseline": baseline["throughput_rps"], "current": current["throughput_rps"],
+                                  "change": change, "regression": change > threshold}
+    for stage, stats in current["stages"].items():
+        old = baseline.get("stages", {}).get(stage, {})
+        add(f"stages.{stage}.p50_ms", stats.get("p50_ms"), old.get("p50_ms"))
+        add(f"stages.{stage}.p95_ms", stats.get("p95_ms"), old.get("p95_ms"))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", required=True, help="Directory created by synthetic_data.py")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Comma-separated tool=weight pairs")
+    parser.add_argument("--warmup", type=int, default=10, help="Requests run serially before measuring")
+    parser.add_argument("--burst", type=int, default=1, help="Issue each request this many times concurrently")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--stub-model", action="store_true", help="Replace the DenseNet with a tiny deterministic model")
+    parser.add_argument("--llm-cache", action="store_true", help="Keep the LLM response cache enabled")
+    parser.add_argument("--llm-tokens", type=int, default=64)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=500.0)
+    parser.add_argument("--llm-prefill-ms", type=float, default=2.0, help="Stub prefill cost per 1000 prompt chars")
+    parser.add_argument("--output", help="Write the JSON results here")
+    parser.add_argument("--compare", help="Baseline JSON results to diff against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    data_dir = os.path.abspath(args.data_dir)
+    # Paths are resolved before switching into the data directory
+    args.output = os.path.abspath(args.output) if args.output else None
+    args.compare = os.path.abspath(args.compare) if args.compare else None
+    os.environ.setdefault("HIPAA_LOG_DIR", os.path.join(data_dir, "logs"))
+    if not args.llm_cache:
+        os.environ["HIPAA_LLM_CACHE"] = "0"
+    os.chdir(data_dir)
+    if args.stub_model:
+        install_stub_model()
+
+    results = asyncio.run(run_load(args))
+    exit_code = 0
+    if args.compare:
+        with open(args.compare) as f:
+            results["comparison"] = compare(results, json.load(f), args.threshold)
+        if any(row["regression"] for row in results["comparison"].values()):
+            exit_code = 1
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Compare the compiled MaskingEngine with the original top-level masking loop.
+
+    python benchmarks/masking_benchmark.py --records 2000 --fields 200
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.server.compliance.hipaa_compliance import HIPAACompliance
+from src.server.compliance.masking_engine import MaskingEngine, mask_value
+
+PII_FIELDS = HIPAACompliance.PII_FIELDS
+
+def legacy_mask_pii_data(data, user_role):
+    """The original HIPAACompliance.mask_pii_data, kept as the baseline"""
+    if user_role == "administrator":
+        return data
+    if isinstance(data, dict):
+        masked_data = {}
+        for key, value in data.items():
+            if key.lower() in PII_FIELDS:
+                masked_data[key] = mask_value(value)
+            else:
+                masked_data[key] = value
+        return masked_data
+    return data
+
+def synthetic_record(rng, index, extra_fields):
+    record = {
+        "patient_id": f"{index:06d}",
+        "name": f"Patient {index}",
+        "age": rng.randint(18, 95),
+        "ssn": f"{rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(1000, 9999)}",
+        "address": f"{rng.randint(1, 999)} Main St, Buffalo, NY 14201",
+        "phone": f"(716) 555-{rng.randint(1000, 9999)}",
+        "email": f"patient{index}@email.com",
+        "date_of_birth": "1979-03-15",
+        "medical_conditions": ["Hypertension", "Type 2 Diabetes"],
+        "current_medications": ["Lisinopril 10mg daily", "Metformin 500mg twice daily"],
+        "vital_signs": {"blood_pressure": "145/92", "heart_rate": "78", "temperature": "98.6F"},
+        "emergency_contacts": [
+            {"name": f"Contact {index}-{i}", "phone": f"(716) 555-{rng.randint(1000, 9999)}", "relation": "spouse"}
+            for i in range(3)
+        ],
+        "lab_results": {f"lab_{i}": f"{rng.random():.3f}" for i in range(20)}
+    }
+    for i in range(extra_fields):
+        record[f"Observation_{i}"] = f"value {rng.random():.5f}"
+    return record
+
+def time_call(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--fields", type=int, default=200, help="Extra top-level fields per record")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    records = [synthetic_record(rng, i, args.fields) for i in range(args.records)]
+
+    def legacy():
+        for record in records:
+            legacy_mask_pii_data(record, "doctor")
+
+    def engine_cold():
+        engine = MaskingEngine(PII_FIELDS, memo_size=0)
+        for record in records:
+            engine.mask(record, "doctor")
+
+    warm_engine = MaskingEngine(PII_FIELDS, memo_size=len(records))
+    warm_engine.mask_many(records, "doctor")
+
+    def engine_bulk():
+        MaskingEngine(PII_FIELDS, memo_size=0).mask_many(records, "doctor")
+
+    def engine_memoized():
+        warm_engine.mask_many(records, "doctor")
+
+    results = {
+        "records": args.records,
+        "extra_fields": args.fields,
+        "seconds": {
+            "legacy_top_level_only": time_call(legacy, args.repeat),
+            "engine_nested": time_call(engine_cold, args.repeat),
+            "engine_bulk_nested": time_call(engine_bulk, args.repeat),
+            "engine_memoized": time_call(engine_memoized, args.repeat)
+        }
+    }
+    baseline = results["seconds"]["legacy_top_level_only"]
+    results["speedup_vs_legacy"] = {
+        name: baseline / seconds for name, seconds in results["seconds"].items() if seconds > 0
+    }
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
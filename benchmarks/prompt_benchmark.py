@@ -0,0 +1,242 @@
+"""Compare prompt size and prefill latency of the compact prompt builder with the original templates.
+
+Runs a fixed set of patient-info, X-ray and chat queries against the EHR
+records in ``--ehr-dir`` (masked for the doctor role), and reports estimated
+prompt tokens per request for the original ``json.dumps(indent=2)`` templates
+and the query-aware builder in ``src/server/utils/prompt_builder.py``. The
+builder's system prompt is shared between requests, so it is reported
+separately from the tokens that must be prefilled on every call.
+
+Latency is modelled with the deterministic stub LLM (prefill cost per prompt
+character, system prefix charged once); ``--live`` instead times real
+generations against ``OLLAMA_HOST``.
+
+    python benchmarks/prompt_benchmark.py --ehr-dir ehr
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from stub_llm import StubLLM
+from src.server.compliance.hipaa_compliance import HIPAACompliance
+from src.server.utils.prompt_builder import (build_patient_info_prompt, build_xray_prompt, build_chat_prompt,
+                                             estimate_tokens, token_budget)
+
+QUERIES = [
+    ("patient_info", "What medications is this patient currently taking?"),
+    ("patient_info", "Any drug allergies I should know about before prescribing?"),
+    ("patient_info", "What were the latest lab results?"),
+    ("patient_info", "Summarize the vital signs from the last visit"),
+    ("patient_info", "Give me a summary of this patient"),
+    ("xray", "Is there evidence of cardiomegaly?"),
+    ("xray", "Summarize the X-ray findings"),
+    ("chat", "Could any of the current medications interact with ibuprofen?"),
+    ("chat", "When was the last admission and discharge?"),
+    ("chat", "What follow-up would you recommend for this patient's condition?"),
+]
+
+SCORES = {
+    "Atelectasis": 0.512, "Consolidation": 0.203, "Infiltration": 0.388, "Pneumothorax": 0.061,
+    "Edema": 0.274, "Emphysema": 0.145, "Fibrosis": 0.092, "Effusion": 0.331, "Pneumonia": 0.226,
+    "Pleural_Thickening": 0.118, "Cardiomegaly": 0.622, "Nodule": 0.173, "Mass": 0.084, "Hernia": 0.011,
+    "Lung Lesion": 0.135, "Fracture": 0.058, "Lung Opacity": 0.547, "Enlarged Cardiomediastinum": 0.481
+}
+
+def legacy_patient_info_prompt(user_role, masked_data, query):
+    return f"""You are a clinical decision support AI assistant integrated into a hospital's EHR system. You are assisting a licensed {user_role} with patient care as part of their clinical workflow.
+
+CLINICAL CONTEXT:
+- This is a legitimate medical consultation within a healthcare facility
+- You are providing clinical decision support to a licensed medical professional
+- All patient data is from the hospital's secure EHR system
+- HIPAA compliance is maintained through system-level access controls
+
+Patient Medical Record (HIPAA processed for {user_role}):
+{json.dumps(masked_data, indent=2)}
+
+Clinical Query: {query}
+
+INSTRUCTIONS:
+1. Provide clinically relevant information based on the patient's medical record
+2. Focus on medical conditions, medications, and clinical findings
+3. Suggest appropriate clinical considerations
+4. Maintain professional medical terminology
+5. Include appropriate medical disclaimers
+
+Respond as a clinical decision support tool would in a hospital setting."""
+
+def legacy_xray_prompt(user_role, patient_id, masked_data, results, query):
+    return f"""You are a clinical decision support AI assistant integrated into a hospital's EHR system. You are providing analysis to a licensed {user_role} as part of their clinical workflow.
+
+CLINICAL CONTEXT:
+- This is a legitimate medical consultation within a healthcare facility
+- You are assisting a licensed medical professional with patient care
+- All data is from the hospital's secure EHR system
+- HIPAA compliance is maintained through system-level controls
+
+Patient ID: {patient_id}
+Patient Medical Record (HIPAA processed): {json.dumps(masked_data, indent=2)}
+
+DIAGNOSTIC IMAGING ANALYSIS:
+The torchxrayvision AI model has processed the chest X-ray with the following pathology probability scores:
+{json.dumps(results, indent=2)}
+
+Clinical Query: {query}
+
+INSTRUCTIONS:
+1. Provide a clinical interpretation of the imaging analysis results
+2. Highlight significant findings (scores >0.5 are noteworthy, >0.7 are highly significant)
+3. Suggest clinical correlations with patient history
+4. Recommend appropriate follow-up actions
+5. Include standard medical disclaimers about AI-assisted diagnosis
+
+Format your response as a clinical report suitable for medical documentation."""
+
+def legacy_chat_prompt(user_role, message, patient_context, masked_data):
+    context = f"\nPatient Context ({patient_context}): {json.dumps(masked_data, indent=2)}" if masked_data else ""
+    return f"""You are a clinical decision support AI assistant integrated into a hospital's EHR system. You are assisting a licensed {user_role} with patient care.
+
+CLINICAL CONTEXT:
+- This is a legitimate medical consultation within a healthcare facility
+- You are providing clinical decision support to a licensed medical professional
+- HIPAA compliance is maintained through system-level access controls
+
+{context}
+
+Clinical Query: {message}
+
+INSTRUCTIONS:
+1. Respond professionally as a clinical decision support tool
+2. Provide medically relevant information when appropriate
+3. Suggest clinical considerations and recommendations
+4. Maintain appropriate medical disclaimers
+5. Be conversational but clinically focused
+
+Respond as you would in a hospital's clinical decision support system."""
+
+def load_records(ehr_dir):
+    records = {}
+    for name in sorted(os.listdir(ehr_dir)):
+        if name.endswith(".json"):
+            with open(os.path.join(ehr_dir, name)) as f:
+                records[name[:-len(".json")]] = json.load(f)
+    return records
+
+def build_cases(records, role="doctor"):
+    cases = []
+    for record_name, record in records.items():
+        masked = HIPAACompliance.mask_pii_data(record, role)
+        patient_id = str(record.get("patient_id", record_name))
+        for kind, query in QUERIES:
+            if kind == "patient_info":
+                legacy = legacy_patient_info_prompt(role, masked, query)
+                compact = build_patient_info_prompt(role, masked, query)
+            elif kind == "xray":
+                legacy = legacy_xray_prompt(role, patient_id, masked, SCORES, query)
+                compact = build_xray_prompt(role, patient_id, masked, SCORES, query)
+            else:
+                legacy = legacy_chat_prompt(role, query, patient_id, masked)
+                compact = build_chat_prompt(role, query, patient_id, masked)
+            cases.append({"record": record_name, "kind": kind, "query": query, "legacy": legacy, "compact": compact})
+    return cases
+
+async def model_latency(cases, prefill_ms_per_kchar, tokens):
+    legacy_llm = StubLLM(tokens=tokens, tokens_per_second=0, prefill_ms_per_kchar=prefill_ms_per_kchar)
+    compact_llm = StubLLM(tokens=tokens, tokens_per_second=0, prefill_ms_per_kchar=prefill_ms_per_kchar)
+    legacy_times, compact_times = [], []
+    for case in cases:
+        started = time.perf_counter()
+        await legacy_llm(case["legacy"])
+        legacy_times.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        await compact_llm(case["compact"].prompt, system=case["compact"].system)
+        compact_times.append(time.perf_counter() - started)
+    return legacy_times, compact_times
+
+async def live_latency(cases, repeat):
+    from src.server.utils.llama_client import OllamaClient
+    client = OllamaClient()
+    legacy_times, compact_times = [], []
+    try:
+        for case in cases:
+            for _ in range(repeat):
+                started = time.perf_counter()
+                await client.generate(case["legacy"])
+                legacy_times.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                await client.generate(case["compact"].prompt, case["compact"].system)
+                compact_times.append(time.perf_counter() - started)
+    finally:
+        await client.aclose()
+    return legacy_times, compact_times
+
+def summarize(values):
+    ordered = sorted(values)
+    return {
+        "mean": statistics.mean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "max": ordered[-1]
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ehr-dir", default=os.path.join(REPO_ROOT, "ehr"))
+    parser.add_argument("--prefill-ms-per-kchar", type=float, default=25.0,
+                        help="Modelled prefill cost; roughly a 3B model on CPU")
+    parser.add_argument("--live", action="store_true", help="Time real generations against OLLAMA_HOST")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--show", action="store_true", help="Print one compact prompt per query kind")
+    args = parser.parse_args()
+
+    cases = build_cases(load_records(args.ehr_dir))
+    budget = token_budget()
+    legacy_tokens = [estimate_tokens(case["legacy"]) for case in cases]
+    compact_tokens = [estimate_tokens(case["compact"].system) + estimate_tokens(case["compact"].prompt)
+                      for case in cases]
+    prefill_tokens = [estimate_tokens(case["compact"].prompt) for case in cases]
+    over_budget = sum(1 for tokens in prefill_tokens if tokens > budget)
+
+    if args.live:
+        legacy_times, compact_times = await live_latency(cases, args.repeat)
+    else:
+        legacy_times, compact_times = await model_latency(cases, args.prefill_ms_per_kchar, tokens=0)
+
+    by_kind = {}
+    for case, old, new in zip(cases, legacy_tokens, prefill_tokens):
+        entry = by_kind.setdefault(case["kind"], {"legacy_tokens": [], "prefill_tokens": []})
+        entry["legacy_tokens"].append(old)
+        entry["prefill_tokens"].append(new)
+
+    results = {
+        "cases": len(cases),
+        "token_budget": budget,
+        "over_budget": over_budget,
+        "legacy_prompt_tokens": summarize(legacy_tokens),
+        "compact_prompt_tokens": summarize(compact_tokens),
+        "compact_prefill_tokens": summarize(prefill_tokens),
+        "prefill_token_reduction": 1 - sum(prefill_tokens) / sum(legacy_tokens),
+        "by_kind": {kind: {"legacy_mean": statistics.mean(v["legacy_tokens"]),
+                           "prefill_mean": statistics.mean(v["prefill_tokens"])}
+                    for kind, v in by_kind.items()},
+        "latency_mode": "live" if args.live else f"stub ({args.prefill_ms_per_kchar:g} ms per 1000 chars)",
+        "legacy_latency_s": summarize(legacy_times),
+        "compact_latency_s": summarize(compact_times),
+        "latency_reduction": 1 - sum(compact_times) / sum(legacy_times)
+    }
+    print(json.dumps(results, indent=2))
+    if args.show:
+        shown = set()
+        for case in cases:
+            if case["kind"] not in shown:
+                shown.add(case["kind"])
+                print(f"\n--- {case['kind']}: {case['query']}\n{case['compact'].prompt}", file=sys.stderr)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,209 @@
+"""Compare one shared HTTP server against one stdio server per client as sessions increase.
+
+For each session count, opens that many concurrent MCP client sessions and
+has each replay ``--requests-per-session`` tool calls from the load-test mix.
+In ``http`` mode all sessions connect to a single ``--transport http`` server;
+in ``stdio`` mode every session spawns its own server process, which is how
+``client.py`` worked before the shared transport. Reports latency
+percentiles, the resident memory of all server processes, and the time for a
+new session to connect and get its first result.
+
+Servers run with the stub LLM (and, with ``--stub-model``, the stub X-ray
+model) from ``load_test.py``, so no Ollama or model weights are needed.
+
+    python benchmarks/synthetic_data.py --out /tmp/hipaa-bench --patients 500 --xrays 100
+    python benchmarks/session_benchmark.py --data-dir /tmp/hipaa-bench --stub-model \\
+        --sessions 1,4,16 --stdio-sessions 1,4
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from load_test import (DEFAULT_MIX, RESPONSE_PREFIX, build_requests, discover_patients, install_stub_model,
+                       parse_mix, percentiles)
+from stub_llm import StubLLM
+
+def server_args(args, transport):
+    command = [os.path.abspath(__file__), "--serve", transport, "--data-dir", args.data_dir,
+               "--port", str(args.port), "--llm-tokens", str(args.llm_tokens),
+               "--llm-tokens-per-second", str(args.llm_tokens_per_second)]
+    return command + (["--stub-model"] if args.stub_model else [])
+
+def children_rss_mb():
+    """Resident memory of this process's direct children (Linux /proc)"""
+    parent = str(os.getpid())
+    total_kb = 0
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                # The command name may contain spaces; fields resume after its closing parenthesis
+                if f.read().rsplit(")", 1)[1].split()[1] != parent:
+                    continue
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total_kb += int(line.split()[1])
+        except (OSError, IndexError):
+            continue
+    return total_kb / 1024.0
+
+async def run_session(connect, requests, latencies, errors):
+    from mcp import ClientSession
+    started = time.perf_counter()
+    async with connect() as streams:
+        async with ClientSession(streams[0], streams[1]) as session:
+            await session.initialize()
+            first = None
+            for name, arguments in requests:
+                call_started = time.perf_counter()
+                result = await session.call_tool(name, dict(arguments))
+                now = time.perf_counter()
+                if first is None:
+                    # Connect + initialize + first answer, as a clinician opening a session sees it
+                    first = now - started
+                    continue
+                latencies.append(now - call_started)
+                text = result.content[0].text if result.content else ""
+                if result.isError or not text.startswith(RESPONSE_PREFIX):
+                    errors.append(name)
+    return first
+
+async def run_level(args, transport, sessions, requests):
+    from mcp import StdioServerParameters
+    from mcp.client.stdio import stdio_client
+    from mcp.client.streamable_http import streamablehttp_client
+
+    if transport == "http":
+        def connect():
+            return streamablehttp_client(f"http://127.0.0.1:{args.port}/mcp", timeout=120)
+    else:
+        params = StdioServerParameters(command=sys.executable, args=server_args(args, "stdio"), cwd=REPO_ROOT,
+                                       env=dict(os.environ))
+
+        def connect():
+            return stdio_client(params)
+
+    per_session = args.requests_per_session + 1
+    latencies, errors, peak_rss = [], [], 0.0
+
+    async def sample_memory():
+        nonlocal peak_rss
+        while True:
+            peak_rss = max(peak_rss, children_rss_mb())
+            await asyncio.sleep(0.2)
+
+    sampler = asyncio.create_task(sample_memory())
+    started = time.perf_counter()
+    try:
+        firsts = await asyncio.gather(*(
+            run_session(connect, requests[i * per_session:(i + 1) * per_session], latencies, errors)
+            for i in range(sessions)
+        ))
+    finally:
+        sampler.cancel()
+    wall = time.perf_counter() - started
+    return {
+        "sessions": sessions,
+        "wall_s": wall,
+        "throughput_rps": len(latencies) / wall if wall else None,
+        "latency": percentiles(latencies),
+        "errors": len(errors),
+        "first_result": percentiles(firsts),
+        "server_processes_peak_rss_mb": round(peak_rss, 1)
+    }
+
+async def wait_for_http(port, process, timeout=300):
+    import httpx
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.returncode is not None:
+                raise SystemExit(f"HTTP server exited with code {process.returncode}")
+            try:
+                response = await client.get(f"http://127.0.0.1:{port}/healthz")
+                if response.json().get("model_loaded"):
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.25)
+    raise SystemExit("HTTP server did not become ready")
+
+async def run_benchmark(args):
+    ehr_ids, xray_ids = discover_patients(args.data_dir)
+    if not ehr_ids or not xray_ids:
+        raise SystemExit("Data directory needs ehr/Patient_N.json records and normalized_patients/Patient_N.png images")
+    mix = parse_mix(args.mix)
+    results = {"config": {"requests_per_session": args.requests_per_session, "mix": args.mix,
+                          "stub_model": args.stub_model}, "http": [], "stdio": []}
+
+    levels = [int(n) for n in args.sessions.split(",") if n]
+    if levels:
+        process = await asyncio.create_subprocess_exec(sys.executable, *server_args(args, "http"), cwd=REPO_ROOT)
+        try:
+            await wait_for_http(args.port, process)
+            results["http_idle_rss_mb"] = round(children_rss_mb(), 1)
+            for sessions in levels:
+                requests = build_requests(sessions * (args.requests_per_session + 1), mix, ehr_ids, xray_ids,
+                                          args.seed)
+                results["http"].append(await run_level(args, "http", sessions, requests))
+        finally:
+            process.terminate()
+            await process.wait()
+
+    for sessions in [int(n) for n in args.stdio_sessions.split(",") if n]:
+        requests = build_requests(sessions * (args.requests_per_session + 1), mix, ehr_ids, xray_ids, args.seed)
+        results["stdio"].append(await run_level(args, "stdio", sessions, requests))
+    return results
+
+def serve(args):
+    """Run one server with the benchmark stubs installed"""
+    from src.server.utils.llama_client import set_llm_backend
+    os.environ.setdefault("HIPAA_LOG_DIR", os.path.join(args.data_dir, "logs"))
+    os.environ.setdefault("HIPAA_LLM_CACHE", "0")
+    os.chdir(args.data_dir)
+    if args.stub_model:
+        install_stub_model()
+    from src.server import hipaa_server
+    set_llm_backend(StubLLM(tokens=args.llm_tokens, tokens_per_second=args.llm_tokens_per_second))
+    server = hipaa_server.HIPAAMedicalServer()
+    if args.serve == "http":
+        asyncio.run(server.run_http("127.0.0.1", args.port))
+    else:
+        asyncio.run(server.run())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data-dir", required=True, help="Directory created by synthetic_data.py")
+    parser.add_argument("--sessions", default="1,4,16", help="Concurrent sessions against the shared HTTP server")
+    parser.add_argument("--stdio-sessions", default="1,4", help="Concurrent sessions with one stdio server each")
+    parser.add_argument("--requests-per-session", type=int, default=10)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Comma-separated tool=weight pairs")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--stub-model", action="store_true", help="Replace the DenseNet with a tiny deterministic model")
+    parser.add_argument("--llm-tokens", type=int, default=64)
+    parser.add_argument("--llm-tokens-per-second", type=float, default=500.0)
+    parser.add_argument("--output", help="Write the JSON results here")
+    parser.add_argument("--serve", choices=["http", "stdio"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    args.data_dir = os.path.abspath(args.data_dir)
+
+    if args.serve:
+        serve(args)
+        return
+    results = asyncio.run(run_benchmark(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Measure server startup latency as seen by a stdio client.
+
+Reports, per run, the time from spawning ``python server.py`` until
+``initialize`` returns and until the first ``analyze_xray`` result arrives.
+Set ``OLLAMA_CLI_FALLBACK=0`` and point ``OLLAMA_HOST`` at an unused port to
+exclude LLM generation time from the X-ray measurement.
+
+    python benchmarks/startup_benchmark.py --runs 5 --patient-id 1
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+async def measure_once(patient_id):
+    server_params = StdioServerParameters(
+        command=sys.executable,
+        args=[os.path.join(REPO_ROOT, "server.py")],
+        cwd=REPO_ROOT,
+        env=dict(os.environ)
+    )
+    started = time.perf_counter()
+    async with stdio_client(server_params) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            initialized = time.perf_counter()
+            await session.list_tools()
+            tools_listed = time.perf_counter()
+            result = await session.call_tool("analyze_xray", {
+                "patient_id": patient_id,
+                "user_role": "doctor",
+                "query": "startup benchmark"
+            })
+            first_xray = time.perf_counter()
+    text = result.content[0].text if result.content else ""
+    return {
+        "initialize_s": initialized - started,
+        "list_tools_s": tools_listed - started,
+        "first_xray_s": first_xray - started,
+        "xray_ok": not text.startswith(("X-ray analysis failed", "X-ray analysis model is not loaded"))
+    }
+
+def summarize(values):
+    return {
+        "min": min(values),
+        "median": statistics.median(values),
+        "max": max(values)
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--patient-id", default="1")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    runs = []
+    for i in range(args.runs):
+        run = await measure_once(args.patient_id)
+        print(f"run {i + 1}: initialize {run['initialize_s']:.3f}s, first X-ray {run['first_xray_s']:.3f}s",
+              file=sys.stderr)
+        runs.append(run)
+
+    report = {
+        "runs": runs,
+        "initialize_s": summarize([r["initialize_s"] for r in runs]),
+        "first_xray_s": summarize([r["first_xray_s"] for r in runs])
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    print(output)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,45 @@
+"""Deterministic stand-in for the Ollama model used by the benchmarks."""
+import asyncio
+import hashlib
+
+RESPONSE_PREFIX = "Stub clinical summary: "
+
+class StubLLM:
+    """Return a reproducible response derived from the prompt hash.
+
+    Latency is modelled as ``prefill_ms_per_kchar`` per 1000 prompt characters
+    followed by ``tokens`` chunks at ``tokens_per_second``, so prompt size and
+    streaming behave like a real backend without running one. A system prompt
+    is only charged the first time it is seen, like a backend reusing its
+    KV/prompt cache for a shared prefix.
+    """
+
+    def __init__(self, tokens=64, tokens_per_second=200.0, prefill_ms_per_kchar=2.0):
+        self.tokens = tokens
+        self.tokens_per_second = tokens_per_second
+        self.prefill_ms_per_kchar = prefill_ms_per_kchar
+        self.calls = 0
+        self.prompt_chars = 0
+        self.prefill_chars = 0
+        self._seen_systems = set()
+
+    async def __call__(self, prompt, on_token=None, system=None):
+        self.calls += 1
+        prefill = len(prompt)
+        if system and system not in self._seen_systems:
+            self._seen_systems.add(system)
+            prefill += len(system)
+        self.prompt_chars += len(prompt) + len(system or "")
+        self.prefill_chars += prefill
+        digest = hashlib.sha256(f"{system}\0{prompt}".encode()).hexdigest()
+        await asyncio.sleep(prefill / 1000.0 * self.prefill_ms_per_kchar / 1000.0)
+        delay = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+        parts = []
+        for i in range(self.tokens):
+            token = f"{digest[i % len(digest)]}{' ' if i % 5 == 4 else ''}"
+            parts.append(token)
+            if on_token is not None:
+                await on_token(token)
+            if delay:
+                await asyncio.sleep(delay)
+        return RESPONSE_PREFIX + "".join(parts).strip()
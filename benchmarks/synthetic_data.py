@@ -0,0 +1,112 @@
+"""Generate a synthetic EHR + X-ray dataset for load testing.
+
+Writes ``<out>/ehr/Patient_N.json`` (demographic schema),
+``<out>/ehr/patient_PNNN.json`` (encounter schema) and
+``<out>/normalized_patients/Patient_N.png`` grayscale images.
+
+    python benchmarks/synthetic_data.py --out /tmp/hipaa-bench --patients 1000 --xrays 200
+"""
+import argparse
+import json
+import os
+import random
+
+CONDITIONS = ["Hypertension", "Type 2 Diabetes", "Asthma", "COPD", "Congestive Heart Failure",
+              "Pneumonia", "Chronic Kidney Disease", "Atrial Fibrillation", "Hyperlipidemia", "Mild Sleep Apnea"]
+MEDICATIONS = ["Lisinopril 10mg daily", "Metformin 500mg twice daily", "Aspirin 81mg daily",
+               "Albuterol inhaler as needed", "Atorvastatin 20mg daily", "Furosemide 40mg daily",
+               "Warfarin 5mg daily", "Amoxicillin 500mg three times daily"]
+ALLERGIES = ["Penicillin", "Shellfish", "Latex", "Sulfa drugs", "Peanuts"]
+FIRST_NAMES = ["John", "Maria", "Wei", "Aisha", "Carlos", "Emma", "Raj", "Olga", "Kwame", "Yuki"]
+LAST_NAMES = ["Smith", "Garcia", "Chen", "Khan", "Lopez", "Novak", "Patel", "Ivanova", "Mensah", "Sato"]
+
+def demographic_record(rng, index):
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return {
+        "patient_id": f"{index:03d}",
+        "name": f"{first} {last}",
+        "age": rng.randint(18, 95),
+        "gender": rng.choice(["Male", "Female"]),
+        "date_of_birth": f"{rng.randint(1930, 2005)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "ssn": f"{rng.randint(100, 999)}-{rng.randint(10, 99)}-{rng.randint(1000, 9999)}",
+        "address": f"{rng.randint(1, 9999)} Main St, Buffalo, NY 14201",
+        "phone": f"(716) 555-{rng.randint(1000, 9999)}",
+        "email": f"{first.lower()}.{last.lower()}{index}@email.com",
+        "insurance": "Blue Cross Blue Shield",
+        "policy_number": f"BC{rng.randint(10**8, 10**9 - 1)}",
+        "medical_conditions": rng.sample(CONDITIONS, rng.randint(1, 4)),
+        "current_medications": rng.sample(MEDICATIONS, rng.randint(1, 4)),
+        "allergies": rng.sample(ALLERGIES, rng.randint(0, 2)),
+        "last_visit": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "chief_complaint": "Shortness of breath and fatigue",
+        "vital_signs": {
+            "blood_pressure": f"{rng.randint(100, 170)}/{rng.randint(60, 100)}",
+            "heart_rate": str(rng.randint(55, 110)),
+            "temperature": f"{rng.uniform(97.0, 101.0):.1f}°F",
+            "weight": f"{rng.randint(110, 260)} lbs"
+        },
+        "lab_results": {
+            "hba1c": f"{rng.uniform(5.0, 10.0):.1f}%",
+            "glucose": f"{rng.randint(80, 250)} mg/dL"
+        },
+        "notes": "Synthetic record generated for load testing."
+    }
+
+def encounter_record(rng, index):
+    admission_month = rng.randint(1, 11)
+    return {
+        "patient_id": f"P{index:03d}",
+        "age": rng.randint(18, 95),
+        "gender": rng.choice(["M", "F"]),
+        "diagnosis": rng.choice(CONDITIONS),
+        "admission_date": f"2024-{admission_month:02d}-{rng.randint(1, 20):02d}",
+        "discharge_date": f"2024-{admission_month + 1:02d}-{rng.randint(1, 28):02d}",
+        "notes": "Synthetic encounter generated for load testing.",
+        "medications": [m.split(" daily")[0] for m in rng.sample(MEDICATIONS, rng.randint(1, 3))],
+        "allergies": rng.sample(ALLERGIES, rng.randint(0, 2)),
+        "status": rng.choice(["Stable", "Improving", "Critical"])
+    }
+
+def write_xray(path, rng, size):
+    import numpy as np
+    from PIL import Image
+    noise = np.random.default_rng(rng.randint(0, 2**31)).normal(128, 40, (size, size))
+    # A bright ellipse roughly where the lungs/heart would be keeps images non-uniform
+    yy, xx = np.mgrid[0:size, 0:size]
+    mask = ((xx - size / 2) / (size / 3)) ** 2 + ((yy - size / 2) / (size / 2.5)) ** 2 < 1
+    noise[mask] += 50
+    Image.fromarray(np.clip(noise, 0, 255).astype(np.uint8), mode="L").save(path)
+
+def generate(out_dir, patients, encounters=None, xrays=None, image_size=512, seed=7):
+    """Create the dataset and return a summary dict"""
+    rng = random.Random(seed)
+    encounters = patients if encounters is None else encounters
+    xrays = patients if xrays is None else xrays
+    ehr_dir = os.path.join(out_dir, "ehr")
+    image_dir = os.path.join(out_dir, "normalized_patients")
+    os.makedirs(ehr_dir, exist_ok=True)
+    os.makedirs(image_dir, exist_ok=True)
+
+    for index in range(1, patients + 1):
+        with open(os.path.join(ehr_dir, f"Patient_{index}.json"), "w") as f:
+            json.dump(demographic_record(rng, index), f, indent=2)
+    for index in range(1, encounters + 1):
+        with open(os.path.join(ehr_dir, f"patient_P{index:03d}.json"), "w") as f:
+            json.dump(encounter_record(rng, index), f, indent=2)
+    for index in range(1, xrays + 1):
+        write_xray(os.path.join(image_dir, f"Patient_{index}.png"), rng, image_size)
+    return {"out_dir": out_dir, "patients": patients, "encounters": encounters, "xrays": xrays}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--patients", type=int, default=100, help="Patient_N.json records")
+    parser.add_argument("--encounters", type=int, help="patient_PNNN.json records (default: --patients)")
+    parser.add_argument("--xrays", type=int, help="X-ray PNGs (default: --patients)")
+    parser.add_argument("--image-size", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    print(json.dumps(generate(args.out, args.patients, args.encounters, args.xrays, args.image_size, args.seed)))
+
+if __name__ == "__main__":
+    main()
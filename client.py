@@ -1,10 +1,15 @@
+import argparse
 import asyncio
 # import sys
 from src.client.hipaa_client import HIPAAMedicalClient
 
 async def main():
+    parser = argparse.ArgumentParser(description="HIPAA Medical Smart Agent client")
+    parser.add_argument("--url", help="Join a shared server started with 'server.py --transport http' (e.g. http://127.0.0.1:8765/mcp)")
+    parser.add_argument("--server", default="server.py", help="Server script to spawn over stdio when --url is not given")
+    args = parser.parse_args()
     client = HIPAAMedicalClient()
-    await client.run()
+    await client.run(args.server, args.url)
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
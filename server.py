@@ -1,9 +1,26 @@
+import argparse
 import asyncio
-from src.server.hipaa_server import HIPAAMedicalServer
+import os
+from src.server.hipaa_server import HIPAAMedicalServer, parse_role_tokens
 
 async def main():
+    parser = argparse.ArgumentParser(description="HIPAA Medical MCP server")
+    parser.add_argument("--transport", default=os.environ.get("HIPAA_TRANSPORT", "stdio"), choices=["stdio", "http"],
+                        help="stdio serves one client; http serves many clients from one process")
+    parser.add_argument("--host", default=os.environ.get("HIPAA_HTTP_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("HIPAA_HTTP_PORT", "8765")))
+    parser.add_argument("--path", default="/mcp", help="Streamable HTTP endpoint path")
+    parser.add_argument("--ssl-certfile", default=os.environ.get("HIPAA_HTTP_SSL_CERTFILE"))
+    parser.add_argument("--ssl-keyfile", default=os.environ.get("HIPAA_HTTP_SSL_KEYFILE"))
+    args = parser.parse_args()
+    
     server = HIPAAMedicalServer()
-    await server.run()
+    if args.transport == "http":
+        await server.run_http(args.host, args.port, args.path, os.environ.get("HIPAA_HTTP_TOKEN"),
+                              args.ssl_certfile, args.ssl_keyfile,
+                              role_tokens=parse_role_tokens(os.environ.get("HIPAA_HTTP_ROLE_TOKENS")))
+    else:
+        await server.run()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
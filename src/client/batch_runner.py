@@ -0,0 +1,168 @@
+import asyncio
+import json
+import os
+import sys
+import time
+from .input_processor import InputProcessor
+
+# Request IDs that can be matched against a checkpoint; lists and objects are always rerun
+SCALAR_IDS = (str, int, float, bool)
+
+class BatchRunner:
+    """Replay JSONL requests over one MCP session with a bounded number of calls in flight.
+
+    Each input line is either plain text, ``{"text": ..., "id": ..., "role": ..., "patient_id": ...}``
+    (routed through ``InputProcessor`` like interactive input) or ``{"tool": ..., "arguments": {...}}``
+    (called as-is). Results are written as JSONL in input or completion order; with ``resume``
+    the IDs already present in the output file are skipped.
+    """
+    def __init__(self, session, user_role="doctor", concurrency=8, ordered=True, retries=2, input_processor=None):
+        self.session = session
+        self.user_role = user_role
+        self.concurrency = max(1, concurrency)
+        self.ordered = ordered
+        self.retries = retries
+        self.input_processor = input_processor or InputProcessor()
+        self.counts = {"ok": 0, "error": 0, "skipped": 0}
+
+    def route(self, request):
+        """Return ``(tool, arguments)`` for a parsed request, or raise ValueError"""
+        if "tool" in request:
+            arguments = dict(request.get("arguments") or {})
+            arguments.setdefault("user_role", request.get("role", self.user_role))
+            return request["tool"], arguments
+        text = (request.get("text") or request.get("body") or "").strip()
+        if not text:raise ValueError("Request has no text")
+        role = request.get("role", self.user_role)
+        route = self.input_processor.classify(text)
+        patient_id = request.get("patient_id") or route.patient_id
+        if route.intent == "patient_info":
+            if not patient_id:raise ValueError("No patient specified for a patient information request")
+            return "get_patient_info", {"patient_id": str(patient_id), "user_role": role, "query": text}
+        if route.intent == "xray":
+            if not patient_id:raise ValueError("No patient specified for an X-ray request")
+            return "analyze_xray", {"patient_id": str(patient_id), "user_role": role, "query": text}
+        return "chat_with_agent", {"user_role": role, "message": text, "patient_context": str(patient_id or "")}
+
+    async def run(self, input_stream, output_stream, done_ids=()):
+        """Process every line of ``input_stream`` and write one result line per request"""
+        done_ids = set(done_ids)
+        slots = asyncio.Semaphore(self.concurrency)
+        # In ordered mode finished results wait for slower earlier ones; the window
+        # bounds how far ahead of the oldest unwritten request we may run
+        window = asyncio.Semaphore(self.concurrency * 4 if self.ordered else sys.maxsize)
+        pending = {}
+        next_seq = 0
+        tasks = set()
+
+        def write(result):
+            output_stream.write(json.dumps(result) + "\n")
+            output_stream.flush()
+            self.counts[result["status"]] = self.counts.get(result["status"], 0) + 1
+
+        def complete(seq, result):
+            nonlocal next_seq
+            if not self.ordered:
+                write(result)
+                window.release()
+                return
+            pending[seq] = result
+            while next_seq in pending:
+                write(pending.pop(next_seq))
+                next_seq += 1
+                window.release()
+
+        async def process(seq, line_no, request):
+            try:
+                result = await self._execute(line_no, request)
+            finally:
+                slots.release()
+            complete(seq, result)
+
+        seq = 0
+        line_no = 0
+        while True:
+            line = await asyncio.to_thread(input_stream.readline)
+            if not line:break
+            line_no += 1
+            if not line.strip():continue
+            request = self._parse(line)
+            request_id = request.get("id", request.get("request_id", line_no))
+            if str(request_id) in done_ids or (isinstance(request_id, SCALAR_IDS) and request_id in done_ids):
+                self.counts["skipped"] += 1
+                continue
+            request["id"] = request_id
+            await window.acquire()
+            await slots.acquire()
+            task = asyncio.create_task(process(seq, line_no, request))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            seq += 1
+        if tasks:await asyncio.gather(*tasks)
+        return dict(self.counts)
+
+    async def _execute(self, line_no, request):
+        result = {"id": request["id"], "line": line_no}
+        started = time.perf_counter()
+        try:
+            if "error" in request:raise ValueError(request["error"])
+            tool, arguments = self.route(request)
+            result["tool"] = tool
+            if "patient_id" in arguments:result["patient_id"] = arguments["patient_id"]
+            response = await self._call_with_retries(tool, arguments)
+            text = self._text(response)
+            result["status"] = "error" if response.isError or text.startswith("Error:") else "ok"
+            result["text"] = text
+        except Exception as e:
+            result["status"] = "error"
+            result["text"] = str(e)
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000.0, 1)
+        return result
+
+    async def _call_with_retries(self, tool, arguments):
+        delay = 0.5
+        for attempt in range(self.retries + 1):
+            response = await self.session.call_tool(tool, dict(arguments))
+            text = self._text(response)
+            # The server sheds load when a tool's queue is full; back off and retry
+            if not (text.startswith("Error:") and "overloaded" in text) or attempt == self.retries:
+                return response
+            await asyncio.sleep(delay)
+            delay *= 2
+        return response
+
+    @staticmethod
+    def _text(response):
+        return "\n".join(content.text for content in response.content if hasattr(content, "text"))
+
+    @staticmethod
+    def _parse(line):
+        stripped = line.strip()
+        if not stripped.startswith("{"):return {"text": stripped}
+        try:
+            request = json.loads(stripped)
+        except json.JSONDecodeError as e:
+            return {"error": f"Invalid JSON: {e}"}
+        return request if isinstance(request, dict) else {"error": "Request must be a JSON object"}
+
+def load_checkpoint(output_path):
+    """Return IDs already written to ``output_path``, dropping a torn last line"""
+    done_ids = set()
+    if not os.path.exists(output_path):return done_ids
+    good_offset = 0
+    with open(output_path, "rb") as f:
+        for raw in f:
+            try:
+                result = json.loads(raw)
+            except ValueError:
+                break
+            if not raw.endswith(b"\n"):break
+            good_offset += len(raw)
+            request_id = result.get("id") if isinstance(result, dict) else None
+            if isinstance(request_id, SCALAR_IDS):
+                done_ids.add(request_id)
+                done_ids.add(str(request_id))
+    if good_offset != os.path.getsize(output_path):
+        with open(output_path, "r+b") as f:
+            f.truncate(good_offset)
+    return done_ids
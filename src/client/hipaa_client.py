@@ -1,8 +1,15 @@
 import asyncio
+import os
+import time
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
 from .ui_handler import UIHandler
 from .input_processor import InputProcessor
+from .batch_runner import BatchRunner
+from .prefetcher import Prefetcher, SessionCache
+
+# Server-side work each tool waits for that a prefetch can do ahead of time
+PREFETCH_KINDS = {"get_patient_info": "record", "chat_with_agent": "record", "analyze_xray": "xray"}
 
 class HIPAAMedicalClient:
     def __init__(self):
@@ -11,43 +18,63 @@ class HIPAAMedicalClient:
         self.current_patient = None
         self.ui_handler = UIHandler()
         self.input_processor = InputProcessor()
+        self.response_cache = SessionCache()
+        self.prefetcher = None
         
-    async def connect(self, server_path="server.py"):
-        server_params = StdioServerParameters(
-            command="python",
-            args=[server_path]
-        )
-        self.stdio_client = stdio_client(server_params)
-        read, write = await self.stdio_client.__aenter__()
+    async def connect(self, server_path="server.py", url=None, token=None):
+        """Spawn ``server_path`` over stdio, or join a shared server at ``url`` (``.../mcp``, or ``.../sse``)"""
+        if url:
+            token = token or os.environ.get("HIPAA_HTTP_TOKEN")
+            headers = {"Authorization": f"Bearer {token}"} if token else None
+            if url.rstrip("/").endswith("/sse"):
+                from mcp.client.sse import sse_client
+                self.transport = sse_client(url, headers=headers)
+            else:
+                from mcp.client.streamable_http import streamablehttp_client
+                self.transport = streamablehttp_client(url, headers=headers)
+        else:
+            server_params = StdioServerParameters(
+                command="python",
+                args=[server_path]
+            )
+            self.transport = stdio_client(server_params)
+        read, write = (await self.transport.__aenter__())[:2]
         self.client_session = ClientSession(read, write)
         self.session = await self.client_session.__aenter__()
         await self.session.initialize()
     async def disconnect(self):
+        if self.prefetcher:await self.prefetcher.cancel()
         if self.session:
             await self.client_session.__aexit__(None, None, None)
-            await self.stdio_client.__aexit__(None, None, None)
+            await self.transport.__aexit__(None, None, None)
             
     def select_role(self): self.user_role = self.ui_handler.display_role_selection()
     
     async def start_conversation(self):
         greeting = self.ui_handler.get_greeting(self.user_role)
         print(f"\n Agent: {greeting}")
+        self.prefetcher = Prefetcher(self.session, self.user_role)
         while True:
             user_input = input(f"\n👤 {self.user_role.title()}: ").strip()
             
             if user_input.lower() == "quit":
+                self.ui_handler.display_session_report(self.prefetcher.report(), self.response_cache)
                 print("Agent: Thank you for using the HIPAA Medical Smart Agent. Goodbye!")
                 break
             
             if not user_input:continue
             patient_id = self.input_processor.extract_patient_id(user_input)
-            if patient_id:self.current_patient = patient_id
+            if patient_id:
+                self.current_patient = patient_id
+                # Warm the server while this question is answered and the next one is typed
+                await self.prefetcher.prefetch(patient_id)
             await self.process_user_input(user_input)
     
     async def process_user_input(self, user_input):
         try:
-            if self.input_processor.is_patient_info_request(user_input):await self.handle_patient_info_request(user_input)
-            elif self.input_processor.is_xray_request(user_input):await self.handle_xray_request(user_input)
+            intent = self.input_processor.classify(user_input).intent
+            if intent == "patient_info":await self.handle_patient_info_request(user_input)
+            elif intent == "xray":await self.handle_xray_request(user_input)
             else:await self.handle_general_chat(user_input)
                 
         except Exception as e:
@@ -61,14 +88,11 @@ class HIPAAMedicalClient:
             return
         
         try:
-            result = await self.session.call_tool("get_patient_info", {
+            await self._call_tool_streaming("get_patient_info", {
                 "patient_id": patient_id,
                 "user_role": self.user_role,
                 "query": user_input
-            })
-            
-            response = self._extract_response_text(result)
-            print(f" Agent: {response}")
+            }, " Agent: ")
             
         except Exception as e:
             print(f" Agent: I couldn't retrieve patient information: {str(e)}")
@@ -81,32 +105,51 @@ class HIPAAMedicalClient:
             return
         
         try:
-            result = await self.session.call_tool("analyze_xray", {
+            await self._call_tool_streaming("analyze_xray", {
                 "patient_id": patient_id,
                 "user_role": self.user_role,
                 "query": user_input
-            })
-            
-            response = self._extract_response_text(result)
-            print(f"Agent: {response}")
+            }, "Agent: ")
             
         except Exception as e:
             print(f"Agent: I couldn't analyze the X-ray: {str(e)}")
     
     async def handle_general_chat(self, user_input):
         try:
-            result = await self.session.call_tool("chat_with_agent", {
+            await self._call_tool_streaming("chat_with_agent", {
                 "user_role": self.user_role,
                 "message": user_input,
                 "patient_context": self.current_patient or ""
-            })
-            
-            response = self._extract_response_text(result)
-            print(f" Agent: {response}")
+            }, " Agent: ")
             
         except Exception as e:
             print(f" Agent: I couldn't process your request: {str(e)}")
     
+    async def _call_tool_streaming(self, name, arguments, prefix):
+        key = self.response_cache.key(name, arguments)
+        cached = self.response_cache.get(key)
+        if cached is not None:
+            print(f"{prefix}{self._extract_response_text(cached)}")
+            return cached
+        if self.prefetcher and name in PREFETCH_KINDS:
+            self.prefetcher.note_request(arguments.get("patient_id") or arguments.get("patient_context"), PREFETCH_KINDS[name])
+        stream = self.ui_handler.start_stream(prefix)
+        started = time.perf_counter()
+        try:
+            result = await self.session.call_tool(name, arguments, progress_callback=stream.on_progress)
+        finally:
+            stream.end()
+        text = self._extract_response_text(result)
+        if not stream.received:
+            print(f"{prefix}{text}")
+        elif result.isError:
+            # The chunks shown so far are only part of the answer
+            print("⚠️ The response above is incomplete: the server failed before it finished. Please try again.")
+        # Tools report every failure (not found, model unavailable, interrupted) as isError
+        if not result.isError:
+            self.response_cache.put(key, result, time.perf_counter() - started)
+        return result
+    
     def _extract_response_text(self, result):
         if hasattr(result, 'content') and result.content:
             for content in result.content:
@@ -116,10 +159,20 @@ class HIPAAMedicalClient:
                     return str(content)
         return "I apologize, but I couldn't generate a proper response."
     
-    async def run(self):
+    async def run_batch(self, input_stream, output_stream, concurrency=8, ordered=True, done_ids=(), server_path="server.py", url=None):
+        """Replay a JSONL request stream over one session; see ``BatchRunner``"""
+        await self.connect(server_path, url)
+        try:
+            runner = BatchRunner(self.session, self.user_role or "doctor", concurrency, ordered,
+                                 input_processor=self.input_processor)
+            return await runner.run(input_stream, output_stream, done_ids)
+        finally:
+            await self.disconnect()
+    
+    async def run(self, server_path="server.py", url=None):
         try:
-            print("Connecting to HIPAA Medical Smart Agent...")
-            await self.connect()
+            print(f"Connecting to HIPAA Medical Smart Agent{f' at {url}' if url else ''}...")
+            await self.connect(server_path, url)
             print("Connected successfully!")
             
             self.select_role()
@@ -1,21 +1,121 @@
 import re
+from collections import namedtuple
+
+# Intents in precedence order: a line hitting several is routed to the first.
+# Each maps to the client handler / tool for it; add entries for new tools.
+INTENT_KEYWORDS = {
+    "patient_info": ("notes", "information", "summary", "details", "record", "history", "data"),
+    "xray": ("xray", "x-ray", "scan", "imaging", "radiolog", "chest")
+}
+
+# Patient ID patterns in precedence order (case-insensitive): the first that occurs anywhere wins
+# Each starts with a literal character and has one group
+PATIENT_ID_PATTERNS = (r'patient\s+(\d+)', r'patient\s+id\s+(\d+)', r'pt\s+(\d+)', r'patient_(\d+)')
+
+Route = namedtuple("Route", ["patient_id", "intent", "intents"])
 
 class InputProcessor:
-    def extract_patient_id(self, text):
-        patterns = [
-            r'patient\s+(\d+)',
-            r'patient\s+id\s+(\d+)',
-            r'pt\s+(\d+)',
-            r'patient_(\d+)',
-            r'Patient_(\d+)'
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
+    """Extract the patient ID and intent keywords from a line in one regex pass.
+
+    All patient patterns and keywords are alternatives of one regex, so
+    ``finditer`` reports every position where any of them starts,
+    overlapping ones included, while scanning the lowered text once.
+    A keyword table where one alternative could shadow another at the same
+    position has every keyword starting at a hit confirmed with
+    ``startswith``, so no hit is lost.
+    Results match the original per-pattern ``re.search`` and
+    ``keyword in text.lower()`` checks; non-ASCII lines, where lowering and
+    case-insensitive matching can disagree, get their patient ID from the
+    original patterns.
+    """
+    def __init__(self, intents=None):
+        self.intents = dict(intents or INTENT_KEYWORDS)
+        # Routed intent for each combination of hits seen so far
+        self._primary = {}
+        self._keywords_at = {}
+        for intent, keywords in self.intents.items():
+            for keyword in filter(None, keywords):
+                keyword = keyword.lower()
+                self._keywords_at.setdefault(keyword[0], []).append((keyword, intent))
+        # Each alternative consumes only its first character and checks the rest
+        # in a lookahead: sre can skip straight to candidate first characters,
+        # and a hit never hides another one starting on the next character.
+        # Group i (1-based) is patient pattern i; later groups are keywords
+        by_first = {}
+        for pattern in PATIENT_ID_PATTERNS:by_first.setdefault(pattern[0], []).append(pattern[1:])
+        alternatives = [f"{re.escape(first)}(?={'|'.join(rests)})" for first, rests in by_first.items()]
+        self._group_intent = [None] * (len(PATIENT_ID_PATTERNS) + 1)
+        for first, entries in self._keywords_at.items():
+            rests = []
+            for keyword, intent in sorted(entries, key=lambda entry: len(entry[0]), reverse=True):
+                rests.append(f"({re.escape(keyword[1:])})")
+                self._group_intent.append(intent)
+            alternatives.append(f"{re.escape(first)}(?={'|'.join(rests)})")
+        self._scanner = re.compile("|".join(alternatives))
+        # Only one alternative is reported per position; when a keyword could be
+        # shadowed there (a prefix of another keyword, or sharing a patient
+        # pattern's first character) every keyword starting there is checked
+        entries = [entry for entries in self._keywords_at.values() for entry in entries]
+        self._shadowing = any(keyword[0] in by_first for keyword, _ in entries) or any(
+            other != entry and other[0].startswith(entry[0]) for entry in entries for other in entries)
+        self._patient_patterns = [re.compile(pattern, re.IGNORECASE) for pattern in PATIENT_ID_PATTERNS]
+        self._last = (None, None)
+
+    def classify(self, text):
+        """``Route(patient_id, intent, intents)`` for one line; ``intent`` is None for general chat"""
+        if self._last[0] == text:return self._last[1]
+        route = self._classify(text)
+        self._last = (text, route)
+        return route
+
+    def classify_many(self, texts):
+        """Routes for a batch of lines; repeated lines (common in replays) are classified once"""
+        classify = self._classify
+        routes = {}
+        result = []
+        for text in texts:
+            route = routes.get(text)
+            if route is None:route = routes[text] = classify(text)
+            result.append(route)
+        return result
+
+    def _classify(self, text):
+        lowered = text.lower()
+        patient_hits = [None] * len(PATIENT_ID_PATTERNS)
+        intents = set()
+        group_intent = self._group_intent
+        for match in self._scanner.finditer(lowered):
+            index = match.lastindex
+            intent = group_intent[index]
+            if intent is not None:
+                intents.add(intent)
+            elif patient_hits[index - 1] is None:
+                patient_hits[index - 1] = match.group(index)
+            if self._shadowing:
+                position = match.start()
+                for keyword, intent in self._keywords_at.get(lowered[position], ()):
+                    if lowered.startswith(keyword, position):intents.add(intent)
+
+        patient_id = None
+        if not text.isascii():
+            patient_id = self._search_patient_id(text)
+        else:
+            for hit in patient_hits:
+                if hit is not None:
+                    patient_id = hit
+                    break
+        intents = frozenset(intents)
+        intent = self._primary.get(intents, False)
+        if intent is False:
+            intent = self._primary[intents] = next((name for name in self.intents if name in intents), None)
+        return Route(patient_id, intent, intents)
+
+    def _search_patient_id(self, text):
+        for pattern in self._patient_patterns:
+            match = pattern.search(text)
             if match:return match.group(1)
         return None
-    def is_patient_info_request(self, text):
-        keywords = ["notes", "information", "summary", "details", "record", "history", "data"]
-        return any(keyword in text.lower() for keyword in keywords)
-    def is_xray_request(self, text):
-        keywords = ["xray", "x-ray", "scan", "imaging", "radiolog", "chest"]
-        return any(keyword in text.lower() for keyword in keywords)
\ No newline at end of file
+
+    def extract_patient_id(self, text):return self.classify(text).patient_id
+    def is_patient_info_request(self, text):return "patient_info" in self.classify(text).intents
+    def is_xray_request(self, text):return "xray" in self.classify(text).intents
\ No newline at end of file
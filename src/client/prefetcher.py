@@ -0,0 +1,148 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+import mcp.types
+
+# Prefetched work each kind of request would otherwise wait for on the server
+PARTS = {"record": ("record",), "xray": ("record", "xray")}
+
+def next_request_id(session):
+    """ID ``session`` will give the next request it sends, or None if unknown.
+
+    Pinned to mcp 1.10.x, which numbers requests from the private
+    ``BaseSession._request_id`` counter and has no public accessor (nor does
+    it send ``notifications/cancelled`` when a call is cancelled). If the
+    counter goes away, prefetches are still cancelled locally, just not on
+    the server.
+    """
+    request_id = getattr(session, "_request_id", None)
+    return request_id if isinstance(request_id, int) else None
+
+class SessionCache:
+    """Per-session LRU of tool responses so a repeated question is answered locally"""
+    def __init__(self, max_entries=None):
+        if max_entries is None:max_entries = int(os.environ.get("HIPAA_CLIENT_CACHE_SIZE", "128"))
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.saved_s = 0.0
+
+    @staticmethod
+    def key(name, arguments):
+        # Questions differing only in case or spacing are the same question
+        normalized = {k: " ".join(v.lower().split()) if isinstance(v, str) else v for k, v in arguments.items()}
+        return name, json.dumps(normalized, sort_keys=True)
+
+    def get(self, key):
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        result, latency = self._entries[key]
+        self.hits += 1
+        self.saved_s += latency
+        return result
+
+    def put(self, key, result, latency):
+        if self.max_entries <= 0:return
+        self._entries[key] = (result, latency)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:self._entries.popitem(last=False)
+
+class Prefetcher:
+    """Warm the server for a patient as soon as they are mentioned.
+
+    ``prefetch`` calls the non-LLM ``prefetch_patient`` tool in the
+    background; starting a prefetch for another patient cancels the ones
+    still running (and tells the server). When a request for a prefetched
+    patient is sent, ``note_request`` credits the server work that was done
+    ahead of it: all of it if the prefetch had finished, otherwise the time
+    it had been running, capped at its duration once it completes. Each part
+    of a prefetch (record, X-ray) is credited to the first request using it;
+    later ones would have hit the server's caches anyway.
+    """
+    def __init__(self, session, user_role, enabled=None):
+        if enabled is None:enabled = os.environ.get("HIPAA_CLIENT_PREFETCH", "1") != "0"
+        self.session = session
+        self.user_role = user_role
+        self.enabled = enabled
+        self._tasks = {}
+        self._request_ids = {}
+        self._started = {}
+        self._results = {}
+        self._pending = []
+        self._credited = set()
+        self.counts = {"started": 0, "completed": 0, "cancelled": 0, "failed": 0}
+        self.saved_s = 0.0
+        self.credited_requests = 0
+
+    async def prefetch(self, patient_id):
+        if not self.enabled or patient_id in self._tasks or patient_id in self._results:return
+        await self.cancel(keep=patient_id)
+        self._started[patient_id] = time.perf_counter()
+        self._tasks[patient_id] = asyncio.create_task(self._run(patient_id))
+        self.counts["started"] += 1
+
+    async def _run(self, patient_id):
+        # Requests are numbered when sent; nothing else can send between here and call_tool's send
+        self._request_ids[patient_id] = next_request_id(self.session)
+        try:
+            result = await self.session.call_tool("prefetch_patient", {"patient_id": patient_id, "user_role": self.user_role})
+            summary = json.loads(result.content[0].text)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Best effort: overloaded servers reject prefetches, older ones don't have the tool
+            self.counts["failed"] += 1
+            return
+        finally:
+            self._tasks.pop(patient_id, None)
+            self._request_ids.pop(patient_id, None)
+        summary["finished"] = time.perf_counter()
+        self._results[patient_id] = summary
+        self.counts["completed"] += 1
+        pending, self._pending = self._pending, []
+        for pending_id, parts, overlap in pending:
+            if pending_id == patient_id:self._credit(patient_id, parts, overlap)
+            else:self._pending.append((pending_id, parts, overlap))
+
+    async def cancel(self, keep=None):
+        """Cancel running prefetches (except ``keep``'s) locally and on the server"""
+        for patient_id, task in list(self._tasks.items()):
+            if patient_id == keep:continue
+            request_id = self._request_ids.get(patient_id)
+            task.cancel()
+            self._tasks.pop(patient_id, None)
+            for pending in [p for p in self._pending if p[0] == patient_id]:
+                self._pending.remove(pending)
+                self._credited.difference_update((patient_id, part) for part in pending[1])
+            self.counts["cancelled"] += 1
+            if request_id is None:continue
+            try:
+                await self.session.send_notification(mcp.types.ClientNotification(mcp.types.CancelledNotification(
+                    method="notifications/cancelled",
+                    params=mcp.types.CancelledNotificationParams(requestId=request_id, reason="prefetch no longer needed"))))
+            except Exception:pass
+
+    def note_request(self, patient_id, kind):
+        """Record that a ``kind`` ("record" or "xray") request for ``patient_id`` is being sent now"""
+        if not patient_id:return
+        parts = [part for part in PARTS[kind] if (patient_id, part) not in self._credited]
+        if not parts:return
+        self._credited.update((patient_id, part) for part in parts)
+        if patient_id in self._results:self._credit(patient_id, parts, None)
+        elif patient_id in self._tasks:self._pending.append((patient_id, parts, time.perf_counter() - self._started[patient_id]))
+        else:self._credited.difference_update((patient_id, part) for part in parts)
+
+    def _credit(self, patient_id, parts, overlap):
+        summary = self._results[patient_id]
+        work = sum(summary.get(f"{part}_ms", 0.0) for part in parts if summary.get(part)) / 1000.0
+        if work <= 0:return
+        self.saved_s += work if overlap is None else min(overlap, work)
+        self.credited_requests += 1
+
+    def report(self):
+        return dict(self.counts, saved_s=round(self.saved_s, 3), requests_helped=self.credited_requests)
\ No newline at end of file
@@ -1,3 +1,24 @@
+import sys
+
+class ResponseStream:
+    """Print streamed response chunks as progress notifications arrive"""
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.received = False
+    
+    async def on_progress(self, progress, total, message):
+        if not message:return
+        if not self.received:
+            sys.stdout.write(self.prefix)
+            self.received = True
+        sys.stdout.write(message)
+        sys.stdout.flush()
+    
+    def end(self):
+        if self.received:
+            sys.stdout.write("\n")
+            sys.stdout.flush()
+
 class UIHandler:
     def display_role_selection(self):
         print("=" * 60)
@@ -23,4 +44,12 @@ class UIHandler:
     
     def get_greeting(self, user_role):
         if user_role == "doctor":return "Hi Doctor, let's get to know about your patients"
-        else:return "Hi Admin, let's get to know about your patients"
\ No newline at end of file
+        else:return "Hi Admin, let's get to know about your patients"
+    
+    def start_stream(self, prefix):return ResponseStream(prefix)
+    
+    def display_session_report(self, prefetch, cache):
+        if prefetch["started"]:
+            print(f"Prefetch: {prefetch['completed']}/{prefetch['started']} patients warmed ({prefetch['cancelled']} cancelled), "
+                  f"~{prefetch['saved_s']:.2f}s of waiting saved across {prefetch['requests_helped']} requests")
+        if cache.hits:print(f"Session cache: {cache.hits} repeat questions answered locally, ~{cache.saved_s:.2f}s saved")
\ No newline at end of file
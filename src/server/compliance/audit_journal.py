@@ -0,0 +1,192 @@
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import logging
+
+logger = logging.getLogger("hipaa-medical-mcp")
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+class AuditJournal:
+    """Append-only JSON-lines journal with a background group-commit writer.
+
+    Callers only enqueue entries; a single writer thread drains the queue,
+    appends every pending entry in one write, flushes at most every
+    ``flush_interval`` seconds and fsyncs written entries within
+    ``fsync_interval`` seconds, even if nothing else is logged (``0`` means
+    on every batch, ``None`` disables fsync).
+    """
+
+    def __init__(self, path, flush_interval=0.05, fsync_interval=1.0, max_batch=512):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._closed = False
+        self._last_fsync = time.monotonic()
+        self._unsynced = False
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = self._open()
+        self._writer = threading.Thread(target=self._run, name=f"audit-journal:{path}", daemon=True)
+        self._writer.start()
+
+    def append(self, entry):
+        if self._closed:
+            raise RuntimeError(f"Journal {self.path} is closed")
+        self._queue.put(entry)
+
+    def flush(self, timeout=None):
+        """Block until everything enqueued so far is written and flushed"""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+        self._file.close()
+
+    def _open(self):
+        return open(self.path, "a", encoding="utf-8")
+
+    def _written(self, lines):
+        """Called on the writer thread after ``lines`` were appended and flushed"""
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self._fsync_wait())]
+            except queue.Empty:
+                # Nothing new arrived before written entries were due on disk
+                try:
+                    self._sync()
+                except OSError as e:
+                    logger.error(f"Failed to sync log: {e}")
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch and batch[-1] is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            stop = self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch):
+        lines = []
+        waiters = []
+        stop = False
+        for item in batch:
+            if item is None:
+                stop = True
+            elif isinstance(item, threading.Event):
+                waiters.append(item)
+            else:
+                try:
+                    lines.append(json.dumps(item, default=str) + "\n")
+                except (TypeError, ValueError) as e:
+                    logger.error(f"Dropping unserializable log entry: {e}")
+        try:
+            if lines:
+                self._file.write("".join(lines))
+                self._unsynced = True
+            self._file.flush()
+            if self._should_fsync(stop or bool(waiters)):
+                self._sync()
+            if lines:
+                self._written(lines)
+        except OSError as e:
+            logger.error(f"Failed to write log: {e}")
+        for waiter in waiters:
+            waiter.set()
+        return stop
+
+    def _fsync_wait(self):
+        """Seconds the writer may idle before unsynced entries must be fsynced, None for no limit"""
+        if not self._unsynced or self.fsync_interval is None:
+            return None
+        return max(0.0, self._last_fsync + self.fsync_interval - time.monotonic())
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._last_fsync = time.monotonic()
+        self._unsynced = False
+
+    def _should_fsync(self, force):
+        if self.fsync_interval is None:
+            return False
+        return force or time.monotonic() - self._last_fsync >= self.fsync_interval
+
+
+def get_journal(path, journal_class=None, **options):
+    """Return the process-wide journal for ``path``, creating it on first use"""
+    path = os.path.abspath(path)
+    with _journals_lock:
+        journal = _journals.get(path)
+        if journal is None:
+            journal = (journal_class or AuditJournal)(path, **options)
+            _journals[path] = journal
+        return journal
+
+
+def close_all_journals():
+    with _journals_lock:
+        journals = list(_journals.values())
+        _journals.clear()
+    for journal in journals:
+        journal.close()
+
+
+atexit.register(close_all_journals)
+
+
+def migrate_json_array(json_path, journal_path):
+    """One-shot conversion of a legacy JSON-array log into a JSON-lines journal.
+
+    Entries are appended to ``journal_path`` and the legacy file is renamed to
+    ``<json_path>.migrated`` so the conversion never runs twice.
+    """
+    if not os.path.exists(json_path):
+        return 0
+    with open(json_path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError(f"{json_path} does not contain a JSON array")
+    with open(journal_path, "a", encoding="utf-8") as f:
+        for entry in entries:
+            f.write(json.dumps(entry, default=str) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(json_path, json_path + ".migrated")
+    logger.info(f"Migrated {len(entries)} entries from {json_path} to {journal_path}")
+    return len(entries)
+
+
+def read_journal(journal_path):
+    """Yield entries from a JSON-lines journal, skipping a torn trailing line"""
+    if not os.path.exists(journal_path):
+        return
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logger.warning(f"Skipping corrupt journal line in {journal_path}")
@@ -0,0 +1,375 @@
+import functools
+import gzip
+import heapq
+import itertools
+import json
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from .audit_journal import AuditJournal
+from ..utils.metrics import metrics
+
+logger = logging.getLogger("hipaa-medical-mcp")
+
+ACTIVE_SUFFIX = ".jsonl"
+SEALED_SUFFIX = ".jsonl.gz"
+INDEX_SUFFIX = ".idx.json"
+LOCK_SUFFIX = ".lock"
+
+
+class SegmentedJournal(AuditJournal):
+    """Audit journal split into rotated segments that are sealed when full.
+
+    ``path`` is a directory; each process appends to its own active segment
+    ``<prefix>-<utc start>-<pid>-<seq>.jsonl`` (``prefix`` is the directory
+    name) so several servers can share one log directory. A segment is
+    rotated once it reaches ``max_bytes`` or is ``max_age`` seconds old, and
+    when the journal closes. Rotated segments are sealed on a background
+    thread so logging never waits for compression; sealing gzips the
+    segment and writes a sidecar
+    ``.idx.json`` holding its timestamp range and, for every value of each
+    ``index_fields`` field, the ordinals of the entries carrying it. Segments
+    left active by a process that died are sealed by the next journal that
+    opens the directory.
+    """
+
+    def __init__(self, path, index_fields=(), max_bytes=16 * 1024 * 1024, max_age=24 * 3600, **options):
+        self.directory = path
+        self.prefix = os.path.basename(os.path.normpath(path))
+        self.index_fields = tuple(index_fields)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._sequence = 0
+        self._segment_path = None
+        self._segment_bytes = 0
+        self._segment_opened = 0.0
+        self._sealer = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"audit-seal:{self.prefix}")
+        os.makedirs(path, exist_ok=True)
+        recover_segments(path, self.prefix, self.index_fields)
+        # The base class creates the parent directory, which already exists
+        super().__init__(path, **options)
+
+    def close(self):
+        if self._closed:
+            return
+        super().close()
+        self._sealer.shutdown(wait=True)
+        self._seal(self._segment_path)
+
+    def _open(self):
+        self._sequence += 1
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        name = f"{self.prefix}-{stamp}-{os.getpid()}-{self._sequence:04d}{ACTIVE_SUFFIX}"
+        self._segment_path = os.path.join(self.directory, name)
+        self._segment_bytes = 0
+        self._segment_opened = time.monotonic()
+        return open(self._segment_path, "a", encoding="utf-8")
+
+    def _written(self, lines):
+        self._segment_bytes += sum(len(line) for line in lines)
+        if (self._segment_bytes >= self.max_bytes
+                or (self.max_age is not None and time.monotonic() - self._segment_opened >= self.max_age)):
+            self._rotate()
+
+    def _rotate(self):
+        # Open the next segment first so a failure leaves the writer usable
+        previous_file, previous_path = self._file, self._segment_path
+        self._file = self._open()
+        previous_file.close()
+        self._sealer.submit(self._seal, previous_path)
+
+    def _seal(self, path):
+        try:
+            seal_segment(path, self.index_fields)
+        except OSError as e:
+            # The segment stays active on disk; the next journal to open the
+            # directory retries sealing it
+            logger.error(f"Failed to seal audit segment {path}: {e}")
+
+
+def _segment_pid(stem):
+    try:
+        return int(stem.rsplit("-", 2)[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+def _pid_alive(pid):
+    if pid <= 0 or pid == os.getpid():
+        # Our own pid can only belong to an earlier process (e.g. PID 1 in a container)
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _claim(lock_path):
+    """Take the sealing lock for a segment, stealing it from a dead holder"""
+    for _ in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                with open(lock_path, "r") as f:
+                    holder = int(f.read().strip() or 0)
+            except (OSError, ValueError):
+                holder = 0
+            if _pid_alive(holder):
+                return False
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+            continue
+        with os.fdopen(fd, "w") as f:
+            f.write(str(os.getpid()))
+        return True
+    return False
+
+
+def recover_segments(directory, prefix, index_fields):
+    """Seal active segments whose writing process is gone"""
+    for name in sorted(os.listdir(directory)):
+        if not (name.startswith(prefix + "-") and name.endswith(ACTIVE_SUFFIX)):
+            continue
+        stem = name[:-len(ACTIVE_SUFFIX)]
+        if _pid_alive(_segment_pid(stem)):
+            continue
+        logger.info(f"Sealing audit segment {name} left by an earlier process")
+        try:
+            _seal_claimed(os.path.join(directory, name), index_fields)
+        except OSError as e:
+            logger.error(f"Failed to seal audit segment {name}: {e}")
+
+
+def _seal_claimed(path, index_fields):
+    """Seal ``path`` unless another process is already sealing it"""
+    lock_path = path[:-len(ACTIVE_SUFFIX)] + LOCK_SUFFIX
+    if not _claim(lock_path):
+        return None
+    try:
+        if os.path.exists(path):
+            return seal_segment(path, index_fields)
+        return None
+    finally:
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+
+
+def seal_segment(path, index_fields):
+    """Compress an active segment and write its sidecar index.
+
+    The gzip file is published before the index and the plain segment is
+    removed last, so readers always find either the active file or a
+    complete sealed segment. Empty segments are simply removed.
+    """
+    stem = path[:-len(ACTIVE_SUFFIX)]
+    index_path = stem + INDEX_SUFFIX
+    if os.path.exists(index_path):
+        # Sealed before a crash that left the plain file behind
+        os.remove(path)
+        return None
+    sealed_path = stem + SEALED_SUFFIX
+    tmp_sealed = f"{sealed_path}.{os.getpid()}.tmp"
+    postings = {field: {} for field in index_fields}
+    entries = 0
+    first_timestamp = last_timestamp = None
+    with open(path, "rb") as source, open(tmp_sealed, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) as out:
+            for line in source:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping corrupt journal line in {path}")
+                    continue
+                if not isinstance(entry, dict):
+                    continue
+                out.write(line if line.endswith(b"\n") else line + b"\n")
+                timestamp = entry.get("timestamp")
+                if isinstance(timestamp, str):
+                    if first_timestamp is None or timestamp < first_timestamp:
+                        first_timestamp = timestamp
+                    if last_timestamp is None or timestamp > last_timestamp:
+                        last_timestamp = timestamp
+                for field in index_fields:
+                    value = entry.get(field)
+                    if value is not None:
+                        postings[field].setdefault(str(value), []).append(entries)
+                entries += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+    if entries == 0:
+        os.remove(tmp_sealed)
+        os.remove(path)
+        return None
+
+    index = {"version": 1, "segment": os.path.basename(sealed_path), "entries": entries,
+             "first_timestamp": first_timestamp, "last_timestamp": last_timestamp, "fields": postings}
+    tmp_index = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_index, "w", encoding="utf-8") as f:
+        json.dump(index, f, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_sealed, sealed_path)
+    os.replace(tmp_index, index_path)
+    os.remove(path)
+    metrics.counter("hipaa_audit_segments_sealed_total", "Audit log segments compressed and indexed").inc()
+    return index
+
+
+def migrate_journal(journal_path, directory, index_fields):
+    """Move a single-file JSON-lines journal into ``directory`` as one sealed segment"""
+    if not os.path.exists(journal_path):
+        return 0
+    os.makedirs(directory, exist_ok=True)
+    prefix = os.path.basename(os.path.normpath(directory))
+    # Pid 0 marks a segment no live process owns; the legacy stamp sorts it first
+    stamp = time.strftime("%Y%m%dT%H%M%S", time.gmtime(os.path.getmtime(journal_path)))
+    segment = os.path.join(directory, f"{prefix}-{stamp}-0-0000{ACTIVE_SUFFIX}")
+    try:
+        os.replace(journal_path, segment)
+    except FileNotFoundError:
+        # Another server starting at the same time migrated it
+        return 0
+    index = _seal_claimed(segment, index_fields)
+    entries = index["entries"] if index else 0
+    logger.info(f"Migrated {entries} entries from {journal_path} to {directory}")
+    return entries
+
+
+@functools.lru_cache(maxsize=4096)
+def _load_index(index_path, signature):
+    # Sealed segments never change, so the (mtime, size) signature only
+    # guards against a segment being re-sealed after recovery
+    with open(index_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def parse_bound(value):
+    """Normalize an ISO-8601 date or datetime to the journal's local timestamp format"""
+    if value is None or value == "":
+        return None
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment.isoformat()
+
+
+def query_segments(directory, filters=None, since=None, until=None, limit=100):
+    """Entries in a segmented journal matching ``filters`` within ``[since, until)``.
+
+    ``filters`` maps entry fields to the value they must equal (compared as
+    strings). Sealed segments are skipped using their sidecar index when
+    their timestamp range misses the window or a filtered value does not
+    occur in them, and within a segment only entries listed for every
+    filtered value are decoded. Active segments are scanned in full. Returns
+    ``(entries, stats)`` with the newest ``limit`` matches first.
+    """
+    filters = {field: str(value) for field, value in (filters or {}).items() if value is not None}
+    since, until = parse_bound(since), parse_bound(until)
+    stats = {"segments": 0, "sealed_skipped": 0, "sealed_scanned": 0, "active_scanned": 0,
+             "entries_decoded": 0, "matched": 0}
+    if not os.path.isdir(directory):
+        return [], stats
+
+    names = set(os.listdir(directory))
+    # Min-heap of the newest ``limit`` matches so far; the counter breaks timestamp ties
+    newest = []
+    order = itertools.count()
+
+    def keep(entry):
+        stats["matched"] += 1
+        item = (str(entry.get("timestamp", "")), next(order), entry)
+        if limit is None or len(newest) < limit:
+            heapq.heappush(newest, item)
+        elif newest and item > newest[0]:
+            heapq.heapreplace(newest, item)
+
+    for name in sorted(names):
+        if name.endswith(INDEX_SUFFIX):
+            stem = name[:-len(INDEX_SUFFIX)]
+            if stem + SEALED_SUFFIX not in names:
+                continue
+            stats["segments"] += 1
+            ordinals = _candidate_ordinals(os.path.join(directory, name), filters, since, until)
+            if ordinals is not None and not ordinals:
+                stats["sealed_skipped"] += 1
+                continue
+            stats["sealed_scanned"] += 1
+            with gzip.open(os.path.join(directory, stem + SEALED_SUFFIX), "rb") as f:
+                _scan(f, ordinals, filters, since, until, keep, stats)
+        elif name.endswith(ACTIVE_SUFFIX):
+            stem = name[:-len(ACTIVE_SUFFIX)]
+            if stem + INDEX_SUFFIX in names:
+                # Sealed between the writer publishing the index and removing this file
+                continue
+            stats["segments"] += 1
+            stats["active_scanned"] += 1
+            try:
+                with open(os.path.join(directory, name), "rb") as f:
+                    _scan(f, None, filters, since, until, keep, stats)
+            except FileNotFoundError:
+                # Sealed since we listed the directory; pick up the sealed copy
+                index_name = stem + INDEX_SUFFIX
+                if os.path.exists(os.path.join(directory, index_name)):
+                    ordinals = _candidate_ordinals(os.path.join(directory, index_name), filters, since, until)
+                    if ordinals is None or ordinals:
+                        with gzip.open(os.path.join(directory, stem + SEALED_SUFFIX), "rb") as sealed:
+                            _scan(sealed, ordinals, filters, since, until, keep, stats)
+
+    return [entry for _, _, entry in sorted(newest, reverse=True)], stats
+
+
+def _candidate_ordinals(index_path, filters, since, until):
+    """Entry ordinals worth decoding: None for all, an empty set to skip the segment"""
+    stat = os.stat(index_path)
+    index = _load_index(index_path, (stat.st_mtime_ns, stat.st_size))
+    first, last = index.get("first_timestamp"), index.get("last_timestamp")
+    if since is not None and last is not None and last < since:
+        return set()
+    if until is not None and first is not None and first >= until:
+        return set()
+    ordinals = None
+    for field, value in filters.items():
+        postings = index["fields"].get(field)
+        if postings is None:
+            # Not an indexed field: every entry is a candidate
+            continue
+        matching = postings.get(value)
+        if not matching:
+            return set()
+        ordinals = set(matching) if ordinals is None else ordinals.intersection(matching)
+        if not ordinals:
+            return ordinals
+    return ordinals
+
+
+def _scan(lines, ordinals, filters, since, until, keep, stats):
+    for ordinal, line in enumerate(lines):
+        if ordinals is not None and ordinal not in ordinals:
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        stats["entries_decoded"] += 1
+        if not isinstance(entry, dict):
+            continue
+        timestamp = str(entry.get("timestamp", ""))
+        if since is not None and timestamp < since:
+            continue
+        if until is not None and timestamp >= until:
+            continue
+        if any(str(entry.get(field)) != value for field, value in filters.items()):
+            continue
+        keep(entry)
@@ -1,27 +1,31 @@
+from .masking_engine import MaskingEngine, mask_value
+from ..utils.metrics import timed_stage
+
 class HIPAACompliance:
     PII_FIELDS = ["name", "ssn", "address", "phone", "email", "policy_number", "date_of_birth"]
-    
+
+    _engine = MaskingEngine(PII_FIELDS)
+
     @staticmethod
+    @timed_stage("mask")
     def mask_pii_data(data, user_role):
-        """Mask PII data based on user role"""
+        """Mask PII data based on user role, including nested dicts and lists"""
         if user_role == "administrator":
             return data
-        
+
         if isinstance(data, dict):
-            masked_data = {}
-            for key, value in data.items():
-                if key.lower() in HIPAACompliance.PII_FIELDS:
-                    masked_data[key] = HIPAACompliance._mask_value(value)
-                else:
-                    masked_data[key] = value
-            return masked_data
+            return HIPAACompliance._engine.mask(data, user_role)
         return data
-    
+
+    @staticmethod
+    @timed_stage("mask_bulk")
+    def mask_pii_records(records, user_role):
+        """Mask a list of records in bulk (cohort requests)"""
+        if user_role == "administrator":
+            return list(records)
+        return HIPAACompliance._engine.mask_many(records, user_role)
+
     @staticmethod
     def _mask_value(value):
         """Mask individual values"""
-        if isinstance(value, str):
-            if len(value) <= 4:
-                return "*" * len(value)
-            return value[:2] + "*" * (len(value) - 4) + value[-2:]
-        return "***MASKED***"
\ No newline at end of file
+        return mask_value(value)
\ No newline at end of file
@@ -1,16 +1,49 @@
-import json
 import os
 import logging
 from datetime import datetime
+from .audit_journal import get_journal, migrate_json_array
+from .audit_segments import SegmentedJournal, migrate_journal, query_segments
+from ..utils.metrics import timed_stage
 
 logger = logging.getLogger("hipaa-medical-mcp")
 
+# Entry fields each log's sealed segments are indexed on (timestamp ranges are always kept)
+INDEX_FIELDS = {
+    "audit_log": ("patient_id", "user_role", "action"),
+    "prompt_log": ("user_role",),
+    "violation_log": ("user_role", "violation_type")
+}
+
 class HIPAALogger:
-    def __init__(self):
-        self.audit_log = "logs/audit_log.json"
-        self.prompt_log = "logs/prompt_log.json"
-        self.violation_log = "logs/violation_log.json"
-        os.makedirs("logs", exist_ok=True)
+    def __init__(self, log_dir=None, flush_interval=None, fsync_interval=None):
+        log_dir = log_dir or os.environ.get("HIPAA_LOG_DIR", "logs")
+        if flush_interval is None:
+            flush_interval = float(os.environ.get("HIPAA_LOG_FLUSH_INTERVAL", "0.05"))
+        if fsync_interval is None:
+            fsync_env = os.environ.get("HIPAA_LOG_FSYNC_INTERVAL", "1.0")
+            fsync_interval = None if fsync_env.lower() == "never" else float(fsync_env)
+        segment_bytes = int(float(os.environ.get("HIPAA_LOG_SEGMENT_MB", "16")) * 1024 * 1024)
+        segment_hours = os.environ.get("HIPAA_LOG_SEGMENT_HOURS", "24")
+        segment_age = None if segment_hours.lower() == "never" else float(segment_hours) * 3600
+        self.audit_log = os.path.join(log_dir, "audit_log")
+        self.prompt_log = os.path.join(log_dir, "prompt_log")
+        self.violation_log = os.path.join(log_dir, "violation_log")
+        os.makedirs(log_dir, exist_ok=True)
+        
+        self._journals = {}
+        for journal_dir in (self.audit_log, self.prompt_log, self.violation_log):
+            index_fields = INDEX_FIELDS[os.path.basename(journal_dir)]
+            # Older layouts: a JSON array, then a single JSON-lines journal
+            try:
+                migrate_json_array(journal_dir + ".json", journal_dir + ".jsonl")
+                migrate_journal(journal_dir + ".jsonl", journal_dir, index_fields)
+            except Exception as e:
+                logger.error(f"Failed to migrate {journal_dir}: {e}")
+            self._journals[journal_dir] = get_journal(
+                journal_dir, journal_class=SegmentedJournal, index_fields=index_fields,
+                max_bytes=segment_bytes, max_age=segment_age,
+                flush_interval=flush_interval, fsync_interval=fsync_interval
+            )
     
     def log_audit(self, user_role, action, patient_id, details):
         log_entry = {
@@ -40,15 +73,22 @@ class HIPAALogger:
         }
         self._write_log(self.violation_log, log_entry)
     
+    def flush(self, timeout=None):
+        """Wait until all queued entries have been committed to disk"""
+        for journal in self._journals.values():
+            journal.flush(timeout)
+    
+    @timed_stage("audit_query")
+    def query_audit(self, patient_id=None, user_role=None, action=None, since=None, until=None, limit=100):
+        """Newest audit entries matching the filters within ``[since, until)``, plus scan statistics"""
+        # Entries still queued in this process would otherwise be missed
+        self._journals[self.audit_log].flush(timeout=5)
+        filters = {"patient_id": patient_id, "user_role": user_role, "action": action}
+        return query_segments(self.audit_log, filters, since=since, until=until, limit=limit)
+    
+    @timed_stage("audit_log")
     def _write_log(self, log_file, entry):
         try:
-            if os.path.exists(log_file):
-                with open(log_file, 'r') as f:
-                    logs = json.load(f)
-            else:
-                logs = []
-            logs.append(entry)
-            with open(log_file, 'w') as f:
-                json.dump(logs, f, indent=2)
+            self._journals[log_file].append(entry)
         except Exception as e:
             logger.error(f"Failed to write log: {e}")
\ No newline at end of file
@@ -0,0 +1,122 @@
+import threading
+from collections import OrderedDict
+
+_CONTAINERS = (dict, list)
+
+def mask_value(value):
+    """Mask individual values"""
+    if isinstance(value, str):
+        if len(value) <= 4:
+            return "*" * len(value)
+        return value[:2] + "*" * (len(value) - 4) + value[-2:]
+    return "***MASKED***"
+
+class MaskingEngine:
+    """Schema-aware PII masking with compiled per-schema plans.
+
+    A plan is compiled once per distinct key tuple (record schema) and splits
+    the keys into PII keys to mask and other keys to descend into when they
+    hold a dict or list. Containers without PII are returned as-is rather than
+    copied, so masked views share unchanged sub-objects with the source
+    record. Callers must treat both records and masked views as read-only.
+    """
+
+    def __init__(self, pii_fields, memo_size=1024, max_plans=4096):
+        self.pii_fields = frozenset(field.lower() for field in pii_fields)
+        self.memo_size = memo_size
+        self.max_plans = max_plans
+        self._plans = {}
+        self._memo = OrderedDict()
+        self._memo_lock = threading.Lock()
+        self.memo_hits = 0
+        self.memo_misses = 0
+
+    def mask(self, record, user_role, version=None):
+        """Masked view of ``record`` for ``user_role``, memoized per (version, role).
+
+        Without an explicit ``version`` the record's identity is used, which is
+        safe for the shared read-only objects returned by the record caches.
+        """
+        if self.memo_size <= 0 or not isinstance(record, _CONTAINERS):
+            return self._mask_node(record)
+        key = (version if version is not None else id(record), user_role)
+        with self._memo_lock:
+            entry = self._memo.get(key)
+            if entry is not None and (version is not None or entry[0] is record):
+                self._memo.move_to_end(key)
+                self.memo_hits += 1
+                return entry[1]
+            self.memo_misses += 1
+        masked = self._mask_node(record)
+        with self._memo_lock:
+            # Holding a reference to the record keeps its id from being reused
+            self._memo[key] = (record, masked)
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last=False)
+        return masked
+
+    def mask_many(self, records, user_role):
+        """Mask a cohort of records, reusing compiled plans across the batch"""
+        mask = self.mask
+        return [mask(record, user_role) for record in records]
+
+    def stats(self):
+        with self._memo_lock:
+            return {
+                "plans": len(self._plans),
+                "memo_entries": len(self._memo),
+                "memo_hits": self.memo_hits,
+                "memo_misses": self.memo_misses
+            }
+
+    def _compile(self, keys):
+        pii_keys = tuple(key for key in keys if isinstance(key, str) and key.lower() in self.pii_fields)
+        pii_set = set(pii_keys)
+        plan = (pii_keys, tuple(key for key in keys if key not in pii_set))
+        if len(self._plans) >= self.max_plans:
+            self._plans.clear()
+        self._plans[keys] = plan
+        return plan
+
+    def _mask_node(self, value):
+        if type(value) is dict:
+            return self._mask_dict(value)
+        if type(value) is list:
+            return self._mask_list(value)
+        return value
+
+    def _mask_dict(self, data):
+        keys = tuple(data)
+        plan = self._plans.get(keys)
+        if plan is None:
+            plan = self._compile(keys)
+        pii_keys, other_keys = plan
+
+        result = None
+        if pii_keys:
+            result = dict(data)
+            for key in pii_keys:
+                result[key] = mask_value(data[key])
+        for key in other_keys:
+            value = data[key]
+            if type(value) not in _CONTAINERS:
+                continue
+            masked = self._mask_node(value)
+            if masked is not value:
+                if result is None:
+                    result = dict(data)
+                result[key] = masked
+        return data if result is None else result
+
+    def _mask_list(self, items):
+        result = None
+        for index, item in enumerate(items):
+            if type(item) not in _CONTAINERS:
+                continue
+            masked = self._mask_node(item)
+            if masked is not item:
+                if result is None:
+                    result = list(items)
+                result[index] = masked
+        return items if result is None else result
@@ -1,31 +1,69 @@
 import asyncio
+import hmac
 import logging
+import os
 from typing import Any, Dict, List
 from mcp.server import NotificationOptions, Server
 from mcp.server.models import InitializationOptions
 import mcp.server.stdio
 import mcp.types
-from .tools.tool_registry import ToolRegistry
+from .tools.tool_registry import ToolRegistry, PRIORITY_INTERACTIVE, PRIORITY_STANDARD, PRIORITY_BATCH
+from .tools.base_tool import ToolFailure
 from .tools.patient_info_tool import PatientInfoTool
 from .tools.xray_analysis_tool import XrayAnalysisTool
 from .tools.chat_tool import ChatTool
+from .tools.cohort_info_tool import CohortInfoTool
+from .tools.xray_batch_tool import XrayBatchTool
+from .tools.metrics_tool import ServerMetricsTool
+from .tools.audit_query_tool import AuditQueryTool
+from .tools.prefetch_tool import PrefetchPatientTool
 from .models.model_manager import ModelManager
+from .compliance.hipaa_logger import HIPAALogger
+from .utils.llama_client import close_ollama_client
+from .utils.progress import bind_request_streamer
+from .utils.metrics import metrics, export_prometheus_file
+from .utils.profiling import profile_call, profiling_enabled
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("hipaa-medical-mcp")
 
+# ASGI scope key where BearerTokenMiddleware records the role a token was issued for
+ROLE_SCOPE_KEY = "hipaa.credential_role"
+
 class HIPAAMedicalServer:
     def __init__(self):
         self.server = Server("hipaa-medical-mcp")
         self.model_manager = ModelManager()
         self.tool_registry = ToolRegistry()
+        self.hipaa_logger = HIPAALogger()
         self._setup_tools()
         self._register_handlers()
     
     def _setup_tools(self):
-        self.tool_registry.register("get_patient_info", PatientInfoTool())
-        self.tool_registry.register("analyze_xray", XrayAnalysisTool(self.model_manager))
-        self.tool_registry.register("chat_with_agent", ChatTool())
+        # Cheap record lookups skip ahead of X-ray inference; each tool gets its
+        # own concurrency limit and bounded queue so bursts are rejected early
+        self.tool_registry.register("get_patient_info", PatientInfoTool(),
+                                    max_concurrency=8, max_queue=64, priority=PRIORITY_INTERACTIVE, timeout=300)
+        self.tool_registry.register("analyze_xray", XrayAnalysisTool(self.model_manager),
+                                    max_concurrency=4, max_queue=16, priority=PRIORITY_BATCH, timeout=600)
+        self.tool_registry.register("chat_with_agent", ChatTool(),
+                                    max_concurrency=8, max_queue=64, priority=PRIORITY_STANDARD, timeout=300)
+        self.tool_registry.register("get_cohort_info", CohortInfoTool(),
+                                    max_concurrency=2, max_queue=8, priority=PRIORITY_BATCH, timeout=1800)
+        self.tool_registry.register("analyze_xray_batch", XrayBatchTool(self.model_manager),
+                                    max_concurrency=2, max_queue=8, priority=PRIORITY_BATCH, timeout=1800)
+        self.tool_registry.register("get_server_metrics", ServerMetricsTool(self.tool_registry, self.model_manager),
+                                    max_concurrency=2, max_queue=8, priority=PRIORITY_INTERACTIVE, timeout=30)
+        # Speculative warm-ups from clients yield to every real request
+        self.tool_registry.register("prefetch_patient", PrefetchPatientTool(self.model_manager),
+                                    max_concurrency=2, max_queue=8, priority=PRIORITY_BATCH, timeout=120)
+        self.tool_registry.register("query_audit_log", AuditQueryTool(),
+                                    max_concurrency=2, max_queue=8, priority=PRIORITY_STANDARD, timeout=120)
+        metrics.register_histogram("hipaa_xray_batch_size", self.model_manager.batch_size_histogram,
+                                   "Images per batched X-ray forward pass")
+        # The batcher records milliseconds; Prometheus expects base units
+        metrics.register_histogram("hipaa_xray_batch_queue_wait_seconds", self.model_manager.queue_wait_histogram,
+                                   "Seconds an image waited for its batch", scale=0.001)
     
     def _register_handlers(self):
         @self.server.list_tools()
@@ -34,17 +72,41 @@ class HIPAAMedicalServer:
         
         @self.server.call_tool()
         async def handle_call_tool(name: str, arguments: Dict[str, Any]) -> List[mcp.types.TextContent]:
+            streamer = bind_request_streamer(self.server.request_context)
             try:
-                return await self.tool_registry.execute_tool(name, arguments)
+                self._check_credential_role(name, arguments)
+                deadline_ms = arguments.pop("_deadline_ms", None)
+                deadline = float(deadline_ms) / 1000.0 if deadline_ms is not None else None
+                profile = arguments.pop("_profile", False)
+                call = self.tool_registry.execute_tool(name, arguments, deadline=deadline)
+                if profile and profiling_enabled():
+                    result, report = await profile_call(call)
+                    if report:
+                        result = list(result) + [mcp.types.TextContent(type="text", text=report)]
+                    return result
+                return await call
+            except ToolFailure:
+                # Returned to the client as an error result carrying the tool's message
+                raise
             except Exception as e:
                 logger.error(f"Tool execution failed: {e}")
-                return [mcp.types.TextContent(type="text", text=f"Error: {str(e)}")]
+                raise ToolFailure(f"Error: {str(e)}") from e
+            finally:
+                if streamer:
+                    await streamer.close()
     
-    async def run(self):
-        # Load the ML model
-        self.model_manager.load_model()
-        
-        options = InitializationOptions(
+    def _check_credential_role(self, name, arguments):
+        """Refuse calls whose ``user_role`` differs from the role bound to the caller's HTTP token"""
+        request = self.server.request_context.request
+        bound_role = getattr(request, "scope", {}).get(ROLE_SCOPE_KEY)
+        if bound_role is None or arguments.get("user_role") == bound_role:
+            return
+        self.hipaa_logger.log_violation(arguments.get("user_role"), "role_credential_mismatch",
+                                        {"tool": name, "credential_role": bound_role})
+        raise ToolFailure(f"Access denied: this credential is issued for the {bound_role} role")
+    
+    def _initialization_options(self):
+        return InitializationOptions(
             server_name="hipaa-medical-mcp",
             server_version="1.0.0",
             capabilities=self.server.get_capabilities(
@@ -52,6 +114,139 @@ class HIPAAMedicalServer:
                 experimental_capabilities={}
             )
         )
+    
+    def _start_background_tasks(self):
+        # Load the ML model in the background so the MCP handshake isn't blocked;
+        # analyze_xray waits for it to become ready
+        self.model_manager.start_background_load()
+        
+        self._metrics_file = os.environ.get("HIPAA_METRICS_FILE")
+        self._exporter = None
+        if self._metrics_file:
+            interval = float(os.environ.get("HIPAA_METRICS_INTERVAL", "15"))
+            self._exporter = asyncio.create_task(export_prometheus_file(self._metrics_file, interval))
+    
+    async def _shutdown(self):
+        if self._exporter is not None:
+            self._exporter.cancel()
+            metrics.write_prometheus(self._metrics_file)
+        await close_ollama_client()
+        self.model_manager.shutdown()
+    
+    async def run(self):
+        """Serve a single client over stdio"""
+        self._start_background_tasks()
+        try:
+            async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
+                await self.server.run(read_stream, write_stream, self._initialization_options())
+        finally:
+            await self._shutdown()
+    
+    def http_app(self, path="/mcp", token=None, role_tokens=None):
+        """ASGI app serving MCP over streamable HTTP at ``path`` and the older SSE transport at ``/sse``.
+
+        Every session shares this server's model, caches, scheduler and audit
+        logger. If ``token`` or ``role_tokens`` ({role: token}) are set, requests
+        must carry ``Authorization: Bearer <token>``. A role token only
+        allows calls made as its role; holders of the shared ``token`` are
+        trusted to state their own role, administrator included.
+        """
+        from contextlib import asynccontextmanager
+        from starlette.applications import Starlette
+        from starlette.middleware import Middleware
+        from starlette.responses import JSONResponse, Response
+        from starlette.routing import Mount, Route
+        from mcp.server.sse import SseServerTransport
+        from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+        
+        session_manager = StreamableHTTPSessionManager(app=self.server)
+        sse = SseServerTransport("/messages/")
         
-        async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
-            await self.server.run(read_stream, write_stream, options)
\ No newline at end of file
+        async def handle_streamable_http(scope, receive, send):
+            await session_manager.handle_request(scope, receive, send)
+        
+        async def handle_sse(request):
+            async with sse.connect_sse(request.scope, request.receive, request._send) as (read_stream, write_stream):
+                await self.server.run(read_stream, write_stream, self._initialization_options())
+            return Response()
+        
+        async def handle_health(request):
+            return JSONResponse({"status": "ok", "model_loaded": self.model_manager.is_model_loaded()})
+        
+        @asynccontextmanager
+        async def lifespan(app):
+            async with session_manager.run():
+                yield
+        
+        tokens = {token: None} if token else {}
+        tokens.update({role_token: role for role, role_token in (role_tokens or {}).items()})
+        middleware = [Middleware(BearerTokenMiddleware, tokens=tokens)] if tokens else []
+        return Starlette(
+            routes=[
+                Route("/healthz", endpoint=handle_health),
+                Route("/sse", endpoint=handle_sse, methods=["GET"]),
+                Mount("/messages/", app=sse.handle_post_message),
+                Mount(path, app=handle_streamable_http),
+            ],
+            middleware=middleware,
+            lifespan=lifespan
+        )
+    
+    async def run_http(self, host="127.0.0.1", port=8765, path="/mcp", token=None, ssl_certfile=None, ssl_keyfile=None,
+                       role_tokens=None):
+        """Serve many concurrent clients from this one process over streamable HTTP/SSE"""
+        import uvicorn
+        if host not in ("127.0.0.1", "localhost", "::1") and not ssl_certfile:
+            logger.warning(f"Serving PHI over plain HTTP on {host}; use --ssl-certfile/--ssl-keyfile or a TLS proxy")
+        if not token and not role_tokens:
+            logger.warning("HIPAA_HTTP_TOKEN is not set; any client that can reach the port can call tools")
+        elif token:
+            logger.warning("HIPAA_HTTP_TOKEN holders may claim any role, including administrator; "
+                           "use HIPAA_HTTP_ROLE_TOKENS to bind roles to credentials")
+        config = uvicorn.Config(self.http_app(path, token, role_tokens), host=host, port=port, log_level="warning",
+                                ssl_certfile=ssl_certfile, ssl_keyfile=ssl_keyfile)
+        self._start_background_tasks()
+        try:
+            logger.info(f"Serving MCP on http{'s' if ssl_certfile else ''}://{host}:{port}{path}")
+            await uvicorn.Server(config).serve()
+        finally:
+            await self._shutdown()
+
+def parse_role_tokens(value):
+    """Parse ``HIPAA_HTTP_ROLE_TOKENS`` (``role:token,role:token``) into {role: token}"""
+    role_tokens = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        role, separator, token = item.partition(":")
+        if not separator or not role.strip() or not token.strip():
+            raise ValueError(f"Invalid HIPAA_HTTP_ROLE_TOKENS entry {item.strip()!r}; expected role:token")
+        role_tokens[role.strip()] = token.strip()
+    return role_tokens
+
+class BearerTokenMiddleware:
+    """Reject HTTP requests that don't present a known bearer token.
+
+    ``tokens`` maps each token to the role it was issued for (None for the
+    shared token); the role is recorded in the scope under ``ROLE_SCOPE_KEY``.
+    """
+    
+    def __init__(self, app, tokens):
+        self.app = app
+        self.expected = [(f"Bearer {token}".encode(), role) for token, role in tokens.items()]
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] != "/healthz":
+            supplied = dict(scope["headers"]).get(b"authorization", b"")
+            matched = False
+            role = None
+            # Compare against every token so the response time doesn't reveal which one was close
+            for expected, expected_role in self.expected:
+                if hmac.compare_digest(supplied, expected):
+                    matched, role = True, expected_role
+            if not matched:
+                from starlette.responses import JSONResponse
+                await JSONResponse({"error": "unauthorized"}, status_code=401)(scope, receive, send)
+                return
+            scope[ROLE_SCOPE_KEY] = role
+        await self.app(scope, receive, send)
\ No newline at end of file
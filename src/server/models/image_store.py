@@ -0,0 +1,218 @@
+import argparse
+import json
+import os
+import threading
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger("hipaa-medical-mcp")
+
+DEFAULT_STORE_DIR = os.path.join(".cache", "xray_store")
+IMAGE_SHAPE = (1, 224, 224)
+# Bump when the preprocessing in model_manager.preprocess_xray changes
+TRANSFORM_ID = "xrv-center-crop+resize-224/v1"
+
+_ROW_BYTES = 4 * IMAGE_SHAPE[0] * IMAGE_SHAPE[1] * IMAGE_SHAPE[2]
+
+# ``array`` is the mapping of the data file generation ``row`` refers to
+StoreEntry = namedtuple("StoreEntry", ["row", "sha256", "source", "mtime_ns", "size", "array"])
+
+class XrayImageStore:
+    """Preprocessed X-rays in one memory-mapped float32 file plus a JSON index.
+
+    The data file holds ``rows`` consecutive 1x224x224 tensors exactly as
+    ``preprocess_xray`` produces them; ``index.json`` names the data file and
+    maps each image id (the file name without extension, e.g. ``Patient_1``)
+    to its row, the source file's ``(st_mtime_ns, st_size)`` and its sha256.
+    Ingestion only appends rows and then atomically replaces the index, and a
+    rebuild writes a new data file, so readers in other processes keep a
+    consistent view and pick up new studies on their next lookup. Images
+    whose source file changed since ingestion are treated as missing so
+    callers fall back to decoding the PNG.
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR):
+        self.store_dir = store_dir
+        self.index_path = os.path.join(store_dir, "index.json")
+        self._lock = threading.Lock()
+        self._index_signature = None
+        self._entries = {}
+        self._array = None
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+
+    def lookup(self, image_path):
+        """Index entry for ``image_path`` if it was ingested and is unchanged, else None"""
+        image_id = os.path.splitext(os.path.basename(image_path))[0]
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(image_id)
+            if entry is None:
+                self.misses += 1
+                return None
+        try:
+            stat = os.stat(image_path)
+        except FileNotFoundError:
+            return None
+        if (stat.st_mtime_ns, stat.st_size) != (entry.mtime_ns, entry.size):
+            with self._lock:
+                self.stale += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return entry
+
+    def get_array(self, entry):
+        """Zero-copy view of one stored image as a 1x224x224 numpy array.
+
+        Reads the generation the entry was looked up in, never a newer one a
+        rebuild has published since, where the row may hold another image.
+        """
+        return entry.array[entry.row]
+
+    def get_tensor(self, entry):
+        import torch
+        return torch.from_numpy(self.get_array(entry))
+
+    def stats(self):
+        with self._lock:
+            self._refresh()
+            return {
+                "images": len(self._entries),
+                "rows": 0 if self._array is None else len(self._array),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale
+            }
+
+    def _refresh(self):
+        # Remap whenever an ingest has replaced the index; arrays handed out
+        # earlier keep their own mapping alive
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            self._index_signature, self._entries, self._array = None, {}, None
+            return
+        signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        if signature == self._index_signature:
+            return
+        index = _read_index(self.index_path)
+        if index is None:
+            return
+        array = None
+        if index["rows"]:
+            import numpy as np
+            # Copy-on-write mapping: pages are shared with the page cache and
+            # torch.from_numpy gets a writable array without touching the file
+            array = np.memmap(os.path.join(self.store_dir, index["data"]), dtype=np.float32, mode="c",
+                              shape=(index["rows"],) + IMAGE_SHAPE)
+        entries = {image_id: StoreEntry(array=array, **fields) for image_id, fields in index["images"].items()}
+        self._index_signature, self._entries, self._array = signature, entries, array
+
+    def ingest(self, image_dir, preprocess, rebuild=False):
+        """Append new or changed images from ``image_dir``; unchanged ones are skipped.
+
+        ``preprocess`` maps an image path to a 1x224x224 float32 tensor or
+        array. With ``rebuild`` the store is rewritten from scratch, which
+        also reclaims rows left behind by changed or removed images.
+        """
+        import hashlib
+        import numpy as np
+        os.makedirs(self.store_dir, exist_ok=True)
+        index = None if rebuild else _read_index(self.index_path)
+        if index is not None and index.get("transform") != TRANSFORM_ID:
+            logger.warning(f"X-ray store {self.store_dir} was built with a different transform; rebuilding")
+            index = None
+        previous_data = None
+        if index is None:
+            previous = _read_index(self.index_path)
+            generation = previous.get("generation", 0) + 1 if previous else 1
+            previous_data = previous.get("data") if previous else None
+            # Readers may still map the old file, so a fresh store never reuses it
+            index = {"version": 1, "generation": generation, "data": f"images-{generation}.f32",
+                     "transform": TRANSFORM_ID, "shape": list(IMAGE_SHAPE), "dtype": "float32",
+                     "rows": 0, "images": {}}
+        data_path = os.path.join(self.store_dir, index["data"])
+        mode = "r+b" if os.path.exists(data_path) else "wb"
+
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0, "failed": 0}
+        images = index["images"]
+        seen = set()
+        with open(data_path, mode) as data:
+            # Drop any partial rows left by an interrupted ingest
+            data.truncate(index["rows"] * _ROW_BYTES)
+            data.seek(0, os.SEEK_END)
+            for name in sorted(os.listdir(image_dir)):
+                if not name.lower().endswith((".png", ".jpg", ".jpeg")):
+                    continue
+                image_id = os.path.splitext(name)[0]
+                path = os.path.join(image_dir, name)
+                seen.add(image_id)
+                stat = os.stat(path)
+                known = images.get(image_id)
+                if known and (known["mtime_ns"], known["size"]) == (stat.st_mtime_ns, stat.st_size):
+                    stats["unchanged"] += 1
+                    continue
+                try:
+                    with open(path, "rb") as f:
+                        digest = hashlib.sha256(f.read()).hexdigest()
+                    array = np.ascontiguousarray(np.asarray(preprocess(path), dtype=np.float32))
+                    if array.shape != IMAGE_SHAPE:
+                        raise ValueError(f"preprocessed shape {array.shape}, expected {IMAGE_SHAPE}")
+                except Exception as e:
+                    stats["failed"] += 1
+                    logger.error(f"Failed to ingest {path}: {e}")
+                    continue
+                data.write(array.tobytes())
+                images[image_id] = {"row": index["rows"], "sha256": digest, "source": path,
+                                    "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+                index["rows"] += 1
+                stats["updated" if known else "added"] += 1
+            for image_id in set(images) - seen:
+                del images[image_id]
+                stats["removed"] += 1
+            data.flush()
+            os.fsync(data.fileno())
+
+        # The data is durable before the index that points at it is published
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, separators=(",", ":"))
+        os.replace(tmp_path, self.index_path)
+        if previous_data and previous_data != index["data"]:
+            try:
+                os.remove(os.path.join(self.store_dir, previous_data))
+            except OSError:
+                pass
+        stats["rows"] = index["rows"]
+        stats["dead_rows"] = index["rows"] - len(images)
+        return stats
+
+def _read_index(index_path):
+    try:
+        with open(index_path, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable X-ray store index {index_path}: {e}")
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the preprocessed X-ray image store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest = subparsers.add_parser("ingest", help="Preprocess images into the store")
+    ingest.add_argument("--image-dir", default="normalized_patients")
+    ingest.add_argument("--store", default=DEFAULT_STORE_DIR)
+    ingest.add_argument("--rebuild", action="store_true", help="Rewrite the store, dropping dead rows")
+    args = parser.parse_args(argv)
+
+    from .model_manager import xray_transform, preprocess_xray
+    transform = xray_transform()
+    store = XrayImageStore(args.store)
+    stats = store.ingest(args.image_dir, lambda path: preprocess_xray(path, transform), rebuild=args.rebuild)
+    print(json.dumps(stats))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import copy
+import os
+import logging
+
+logger = logging.getLogger("hipaa-medical-mcp")
+
+BACKENDS = ("eager", "torchscript", "compile", "int8_dynamic", "int8_static", "onnx")
+
+# Largest per-pathology score difference from eager mode accepted by default
+FP32_TOLERANCE = 1e-3
+INT8_TOLERANCE = 0.05
+
+def default_tolerance(name):
+    return INT8_TOLERANCE if name.startswith("int8") else FP32_TOLERANCE
+
+class InferenceBackend:
+    """Runs the X-ray model on a batch and returns per-pathology scores as a numpy array.
+
+    The convolutional trunk and classifier (the "core") are what each backend
+    optimizes; torchxrayvision's sigmoid and operating-point normalization
+    are applied afterwards in eager mode so every backend produces scores on
+    the same scale.
+    """
+
+    name = "eager"
+    warmup_runs = 1
+    # Extra copies of the model weights the backend keeps resident, for memory accounting
+    weight_copies = 0.0
+
+    def __init__(self, model, core, channels_last=False, resolution=224):
+        self.model = model
+        self.core = core
+        self.channels_last = channels_last
+        self.resolution = resolution
+
+    def prepare_input(self, batch):
+        import torch
+        if self.channels_last:
+            return batch.contiguous(memory_format=torch.channels_last)
+        return batch
+
+    def run_core(self, batch):
+        return self.core(self.prepare_input(batch))
+
+    def __call__(self, batch):
+        import torch
+        with torch.no_grad():
+            outputs = postprocess(self.model, self.run_core(batch))
+        return outputs.detach().numpy().astype(float)
+
+class TorchScriptBackend(InferenceBackend):
+    name = "torchscript"
+    # The profiling executor specializes the graph over the first few calls
+    warmup_runs = 3
+    weight_copies = 1.0
+
+    def __init__(self, model, core, channels_last=False, resolution=224):
+        import torch
+        super().__init__(model, core, channels_last, resolution)
+        example = self.prepare_input(torch.zeros(1, 1, resolution, resolution))
+        with torch.no_grad():
+            traced = torch.jit.trace(core, example, check_trace=False)
+            traced = torch.jit.freeze(traced)
+            self.core = torch.jit.optimize_for_inference(traced)
+
+class CompileBackend(InferenceBackend):
+    name = "compile"
+    warmup_runs = 2
+
+    def __init__(self, model, core, channels_last=False, resolution=224):
+        import torch
+        super().__init__(model, core, channels_last, resolution)
+        self.core = torch.compile(core, dynamic=True)
+
+class DynamicInt8Backend(InferenceBackend):
+    """int8 weights for the Linear classifier only; DenseNet's convolutions stay FP32"""
+
+    name = "int8_dynamic"
+    # quantize_dynamic works on a copy of the whole module
+    weight_copies = 1.0
+
+    def __init__(self, model, core, channels_last=False, resolution=224):
+        import torch
+        super().__init__(model, core, channels_last, resolution)
+        self.core = torch.ao.quantization.quantize_dynamic(core, {torch.nn.Linear}, dtype=torch.qint8)
+
+class StaticInt8Backend(InferenceBackend):
+    """FX graph mode post-training quantization of the whole trunk, calibrated on sample images"""
+
+    name = "int8_static"
+    weight_copies = 0.25
+
+    def __init__(self, model, core, channels_last=False, calibration=None, resolution=224):
+        import torch
+        from torch.ao.quantization import get_default_qconfig_mapping
+        from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+        # Quantized kernels expect contiguous NCHW input
+        super().__init__(model, core, channels_last=False, resolution=resolution)
+        engine = "x86" if "x86" in torch.backends.quantized.supported_engines else "fbgemm"
+        torch.backends.quantized.engine = engine
+        if not calibration:
+            logger.warning("No calibration images for int8 quantization; calibrating on synthetic inputs")
+            generator = torch.Generator().manual_seed(0)
+            calibration = [torch.rand(1, resolution, resolution, generator=generator) * 2048 - 1024 for _ in range(8)]
+        example = torch.stack(calibration[:1])
+        # prepare_fx fuses modules in place; keep the eager reference intact
+        prepared = prepare_fx(copy.deepcopy(core), get_default_qconfig_mapping(engine), example_inputs=(example,))
+        with torch.no_grad():
+            for start in range(0, len(calibration), 8):
+                prepared(torch.stack(calibration[start:start + 8]))
+        self.core = convert_fx(prepared)
+
+class OnnxBackend(InferenceBackend):
+    """Export the core to ONNX once and run it with ONNX Runtime (optional ``onnxruntime`` dependency)"""
+
+    name = "onnx"
+    weight_copies = 1.0
+
+    def __init__(self, model, core, channels_last=False, threads=None, onnx_path=None, resolution=224):
+        try:
+            import onnxruntime
+        except ImportError as e:
+            raise RuntimeError("The onnx backend requires the 'onnxruntime' package") from e
+        # ONNX Runtime chooses its own memory layout
+        super().__init__(model, core, channels_last=False, resolution=resolution)
+        onnx_path = onnx_path or os.path.join(".cache", "onnx", "xray_core.onnx")
+        if not os.path.exists(onnx_path):
+            export_onnx(core, onnx_path, resolution)
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def run_core(self, batch):
+        import torch
+        logits = self.session.run(None, {self.input_name: batch.numpy()})[0]
+        return torch.from_numpy(logits)
+
+def export_onnx(core, onnx_path, resolution=224):
+    import torch
+    os.makedirs(os.path.dirname(onnx_path) or ".", exist_ok=True)
+    tmp_path = f"{onnx_path}.{os.getpid()}.tmp"
+    kwargs = dict(input_names=["image"], output_names=["logits"], opset_version=17,
+                  dynamic_axes={"image": {0: "batch"}, "logits": {0: "batch"}})
+    with torch.no_grad():
+        try:
+            torch.onnx.export(core, (torch.zeros(1, 1, resolution, resolution),), tmp_path, dynamo=False, **kwargs)
+        except TypeError:
+            # Older torch without the dynamo switch
+            torch.onnx.export(core, (torch.zeros(1, 1, resolution, resolution),), tmp_path, **kwargs)
+    os.replace(tmp_path, onnx_path)
+    logger.info(f"Exported X-ray model to {onnx_path}")
+
+def model_core(model):
+    """The trunk + classifier of a torchxrayvision DenseNet, or the model itself for other modules"""
+    import torch
+    if not (hasattr(model, "features") and hasattr(model, "classifier")):
+        return model
+
+    class DenseNetCore(torch.nn.Module):
+        def __init__(self, features, classifier):
+            super().__init__()
+            self.features = features
+            self.classifier = classifier
+
+        def forward(self, x):
+            out = torch.nn.functional.relu(self.features(x))
+            out = torch.nn.functional.adaptive_avg_pool2d(out, (1, 1)).flatten(1)
+            return self.classifier(out)
+
+    return DenseNetCore(model.features, model.classifier).eval()
+
+def postprocess(model, logits):
+    """Apply the model's sigmoid / operating-point normalization to core outputs"""
+    import torch
+    if not (hasattr(model, "features") and hasattr(model, "classifier")):
+        return logits
+    out = logits
+    if getattr(model, "apply_sigmoid", False):
+        out = torch.sigmoid(out)
+    if getattr(model, "op_threshs", None) is not None:
+        from torchxrayvision.models import op_norm
+        out = op_norm(torch.sigmoid(out), model.op_threshs)
+    return out
+
+def build_backend(name, model, threads=None, channels_last=False, calibration=None, onnx_path=None, resolution=224):
+    """Wrap an eval-mode model in the requested inference backend"""
+    import torch
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {name!r}; choose from {', '.join(BACKENDS)}")
+    if threads:
+        torch.set_num_threads(threads)
+    core = model_core(model)
+    if channels_last and name in ("eager", "torchscript", "compile", "int8_dynamic"):
+        core = core.to(memory_format=torch.channels_last)
+    if name == "eager":
+        return InferenceBackend(model, core, channels_last, resolution)
+    if name == "torchscript":
+        return TorchScriptBackend(model, core, channels_last, resolution)
+    if name == "compile":
+        return CompileBackend(model, core, channels_last, resolution)
+    if name == "int8_dynamic":
+        return DynamicInt8Backend(model, core, channels_last, resolution)
+    if name == "int8_static":
+        return StaticInt8Backend(model, core, calibration=calibration, resolution=resolution)
+    return OnnxBackend(model, core, threads=threads, onnx_path=onnx_path, resolution=resolution)
+
+def check_parity(reference, candidate, inputs, tolerance):
+    """Compare two backends on ``inputs``; returns the per-pathology max absolute score difference"""
+    import torch
+    batch = torch.stack(inputs)
+    expected = reference(batch)
+    actual = candidate(batch)
+    diffs = abs(expected - actual).max(axis=0)
+    pathologies = getattr(reference.model, "pathologies", None) or [str(i) for i in range(len(diffs))]
+    per_pathology = {name: float(diff) for name, diff in zip(pathologies, diffs)}
+    worst = max(per_pathology.values()) if per_pathology else 0.0
+    return {"max_abs_diff": worst, "tolerance": tolerance, "ok": worst <= tolerance, "per_pathology": per_pathology}
+
+def tensor_bytes(module):
+    """Bytes held by a module's parameters and buffers"""
+    tensors = list(module.parameters()) + list(module.buffers())
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
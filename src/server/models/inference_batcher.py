@@ -0,0 +1,96 @@
+import asyncio
+import time
+import logging
+from ..utils.metrics import Histogram
+
+logger = logging.getLogger("hipaa-medical-mcp")
+
+def new_batch_size_histogram():
+    return Histogram([1, 2, 4, 8, 16, 32, 64])
+
+def new_queue_wait_histogram():
+    return Histogram([0.5, 1, 2, 5, 10, 20, 50, 100, 250, 1000])
+
+class InferenceBatcher:
+    """Gather concurrent single-image requests into one batched forward pass.
+
+    The first queued request opens a batch; the batch is dispatched once it
+    holds ``max_batch_size`` requests or ``max_wait_ms`` has elapsed, and each
+    caller's future resolves with its own output row.
+    """
+
+    def __init__(self, forward_fn, max_batch_size=8, max_wait_ms=10.0,
+                 batch_size_histogram=None, queue_wait_histogram=None):
+        self.forward_fn = forward_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        # Several batchers (one per model) may report into shared histograms
+        self.batch_size_histogram = batch_size_histogram if batch_size_histogram is not None else new_batch_size_histogram()
+        self.queue_wait_histogram = queue_wait_histogram if queue_wait_histogram is not None else new_queue_wait_histogram()
+        self._queue = None
+        self._worker = None
+
+    async def submit(self, item):
+        """Queue one preprocessed input and wait for its output row"""
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future, time.monotonic()))
+        return await future
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._dispatch(batch)
+
+    async def _dispatch(self, batch):
+        batch = [entry for entry in batch if not entry[1].cancelled()]
+        if not batch:
+            return
+        started = time.monotonic()
+        for _, _, enqueued in batch:
+            self.queue_wait_histogram.observe((started - enqueued) * 1000.0)
+        self.batch_size_histogram.observe(len(batch))
+        try:
+            outputs = self.forward_fn([item for item, _, _ in batch])
+            if asyncio.iscoroutine(outputs):
+                outputs = await outputs
+        except Exception as e:
+            logger.error(f"Batched inference failed: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), output in zip(batch, outputs):
+            if not future.done():
+                future.set_result(output)
+
+    def stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "queue_wait_ms": self.queue_wait_histogram.snapshot()
+        }
+
+    async def close(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
@@ -1,35 +1,433 @@
+import asyncio
+import os
+import time
 import logging
-import torchxrayvision as xrv
-import torch
-import torchvision
+from concurrent.futures import ThreadPoolExecutor
+from .inference_batcher import InferenceBatcher, new_batch_size_histogram, new_queue_wait_histogram
+from .xray_cache import XrayResultCache
+from .image_store import XrayImageStore, IMAGE_SHAPE
+from .inference_backends import build_backend, check_parity, default_tolerance, tensor_bytes
+from ..utils.metrics import metrics, timed_stage
+from ..utils.single_flight import SingleFlight
 
 logger = logging.getLogger("hipaa-medical-mcp")
 
-class ModelManager:
-    def __init__(self):
+DEFAULT_MODEL = "densenet121-res224-all"
+
+# torchxrayvision weights that can be requested by name: (model class, input resolution)
+TORCHXRAYVISION_WEIGHTS = {
+    "densenet121-res224-all": ("DenseNet", 224),
+    "densenet121-res224-nih": ("DenseNet", 224),
+    "densenet121-res224-pc": ("DenseNet", 224),
+    "densenet121-res224-chex": ("DenseNet", 224),
+    "densenet121-res224-rsna": ("DenseNet", 224),
+    "densenet121-res224-mimic_nb": ("DenseNet", 224),
+    "densenet121-res224-mimic_ch": ("DenseNet", 224),
+    "resnet50-res512-all": ("ResNet", 512),
+}
+
+def xray_transform(resolution=224):
+    """torchxrayvision's center crop + resize, shared by the server and the image store"""
+    import torchvision
+    import torchxrayvision as xrv
+    return torchvision.transforms.Compose([
+        xrv.datasets.XRayCenterCrop(),
+        xrv.datasets.XRayResizer(resolution)
+    ])
+
+def preprocess_xray(image_path, transform):
+    """Decode an image as grayscale float32 and apply ``transform``; returns a 1xHxW tensor"""
+    import numpy as np
+    import torch
+    from PIL import Image
+    img = Image.open(image_path).convert("L")
+    img = np.array(img).astype(np.float32)
+    img = img[None, ...]
+    img = transform(img)
+    return torch.from_numpy(img)
+
+def load_torchxrayvision(name):
+    import torchxrayvision as xrv
+    architecture, _ = TORCHXRAYVISION_WEIGHTS[name]
+    return getattr(xrv.models, architecture)(weights=name)
+
+class XrayModel:
+    """One registry entry: lazily loaded weights plus their transform, inference backend and batcher"""
+
+    def __init__(self, manager, name, factory, resolution):
+        self.manager = manager
+        self.name = name
+        self.factory = factory
+        self.resolution = resolution
         self.model = None
         self.transform = None
-    
-    def load_model(self):
+        self.backend = None
+        self.parity = None
+        self.memory_bytes = 0
+        self.last_used = 0.0
+        self.active = 0
+        self.loads = 0
+        self.evictions = 0
+        self.batcher = InferenceBatcher(self._forward_batch, manager.max_batch_size, manager.max_batch_wait_ms,
+                                        manager.batch_size_histogram, manager.queue_wait_histogram)
+        self._load_task = None
+
+    @property
+    def transform_id(self):
+        """Cache key for preprocessed tensors, which only depend on the input resolution"""
+        return f"xrv-res{self.resolution}"
+
+    @property
+    def model_id(self):
+        """Cache key for scores; quantized backends produce slightly different scores"""
+        if self.backend is None or self.backend.name == "eager":
+            return self.name
+        return f"{self.name}+{self.backend.name}"
+
+    def is_loaded(self):
+        return self.model is not None and self.transform is not None and self.backend is not None
+
+    def start_load(self):
+        task = self._load_task
+        if task is not None and task.done() and (task.cancelled() or task.exception() is not None):
+            # Let a later request retry a failed load
+            task = None
+        if task is None:
+            task = asyncio.ensure_future(self._load_and_warm_up())
+            self._load_task = task
+        return task
+
+    async def _load_and_warm_up(self):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await loop.run_in_executor(self.manager.executor, self.load)
+        await loop.run_in_executor(self.manager.executor, self._warm_up_sync)
+        logger.info(f"X-ray model {self.name} ready in {loop.time() - started:.2f}s")
+
+    def load(self):
+        # torch and torchxrayvision take seconds to import, so they are only
+        # pulled in when a model is actually loaded
+        import torch
         try:
-            logger.info("Loading DenseNet121 model for X-ray analysis...")
-            self.model = xrv.models.DenseNet(weights="densenet121-res224-all")
-            self.model.eval()
-            
-            self.transform = torchvision.transforms.Compose([
-                xrv.datasets.XRayCenterCrop(),
-                xrv.datasets.XRayResizer(224)
-            ])
-            logger.info("Model loaded successfully")
+            logger.info(f"Loading X-ray model {self.name}...")
+            torch.set_num_threads(self.manager.torch_threads)
+            model = self.factory()
+            model.eval()
+            self.transform = xray_transform(self.resolution)
+            self.model = model
+            self.backend = self._build_backend()
+            self.memory_bytes = int(tensor_bytes(model) * (1 + self.backend.weight_copies))
+            self.loads += 1
+            logger.info(f"Model {self.name} loaded ({self.backend.name} backend, "
+                        f"{self.memory_bytes / 2**20:.0f} MB)")
         except Exception as e:
-            logger.error(f"Failed to load model: {e}")
+            self.model = self.transform = self.backend = None
+            logger.error(f"Failed to load model {self.name}: {e}")
             raise
-    
-    def get_model(self):
-        return self.model
-    
-    def get_transform(self):
-        return self.transform
-    
-    def is_model_loaded(self):
-        return self.model is not None and self.transform is not None
\ No newline at end of file
+
+    def _build_backend(self):
+        """Build the configured backend, falling back to eager if it fails or misses the parity tolerance"""
+        manager = self.manager
+        eager = build_backend("eager", self.model, manager.torch_threads, manager.channels_last,
+                              resolution=self.resolution)
+        if manager.backend_name == "eager":
+            return eager
+        try:
+            calibration = self._calibration_tensors() if manager.backend_name == "int8_static" else None
+            onnx_path = os.path.join(os.environ.get("HIPAA_XRAY_ONNX_DIR", os.path.join(".cache", "onnx")),
+                                     f"{self.name}.onnx")
+            backend = build_backend(manager.backend_name, self.model, manager.torch_threads, manager.channels_last,
+                                    calibration=calibration, onnx_path=onnx_path, resolution=self.resolution)
+        except Exception as e:
+            logger.warning(f"X-ray backend {manager.backend_name} unavailable for {self.name} ({e}); using eager")
+            return eager
+
+        tolerance = float(os.environ.get("HIPAA_XRAY_PARITY_TOLERANCE", default_tolerance(manager.backend_name)))
+        inputs = (calibration or self._calibration_tensors())[:4]
+        self.parity = check_parity(eager, backend, inputs, tolerance)
+        if not self.parity["ok"]:
+            logger.warning(f"X-ray backend {manager.backend_name} differs from eager on {self.name} by "
+                           f"{self.parity['max_abs_diff']:.4f} (tolerance {tolerance}); using eager")
+            return eager
+        return backend
+
+    def _calibration_tensors(self, limit=32):
+        """Preprocessed sample X-rays for quantization calibration and parity checks"""
+        import torch
+        image_dir = os.environ.get("HIPAA_XRAY_CALIBRATION_DIR", "normalized_patients")
+        tensors = []
+        if os.path.isdir(image_dir):
+            for name in sorted(os.listdir(image_dir))[:limit]:
+                if name.lower().endswith((".png", ".jpg", ".jpeg")):
+                    try:
+                        tensors.append(self.preprocess(os.path.join(image_dir, name)))
+                    except Exception as e:
+                        logger.warning(f"Skipping calibration image {name}: {e}")
+        if not tensors:
+            generator = torch.Generator().manual_seed(0)
+            size = self.resolution
+            tensors = [torch.rand(1, size, size, generator=generator) * 2048 - 1024 for _ in range(4)]
+        return tensors
+
+    def _warm_up_sync(self):
+        # Dummy forward passes so the first real request doesn't pay for lazy
+        # kernel initialization (or graph specialization for jit backends)
+        import torch
+        for _ in range(self.backend.warmup_runs):
+            self._forward_batch_sync([torch.zeros(1, self.resolution, self.resolution)])
+
+    def unload(self):
+        """Drop the weights and backend; the next request loads them again"""
+        self.model = self.transform = self.backend = None
+        self.parity = None
+        self.memory_bytes = 0
+        self._load_task = None
+        self.evictions += 1
+        # The batch queue is empty (no active requests); stop its worker
+        self.manager.close_batcher(self.batcher)
+
+    @timed_stage("preprocess")
+    def preprocess(self, image_path):
+        return preprocess_xray(image_path, self.transform)
+
+    async def _forward_batch(self, tensors):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.manager.executor, self._forward_batch_sync, tensors)
+
+    @timed_stage("forward")
+    def _forward_batch_sync(self, tensors):
+        import torch
+        scores = self.backend(torch.stack(tensors))
+        return [dict(zip(self.model.pathologies, row)) for row in scores]
+
+    def stats(self, now):
+        return {
+            "loaded": self.is_loaded(),
+            "resolution": self.resolution,
+            "memory_mb": round(self.memory_bytes / 2**20, 1),
+            "backend": self.backend.name if self.backend is not None else None,
+            "parity": self.parity,
+            "active": self.active,
+            "idle_s": round(now - self.last_used, 1) if self.last_used else None,
+            "loads": self.loads,
+            "evictions": self.evictions
+        }
+
+class ModelManager:
+    """Registry of X-ray models, loaded on first use and evicted LRU-first under a memory budget.
+
+    Any torchxrayvision weights in ``TORCHXRAYVISION_WEIGHTS`` can be
+    requested by name; site-specific models are added with ``register_model``.
+    Each model keeps its own transform, inference backend and batcher, while
+    the inference thread pool, result cache and image store are shared.
+    """
+
+    def __init__(self, max_batch_size=None, max_batch_wait_ms=None, inference_workers=None, torch_threads=None,
+                 result_cache=None, backend=None, channels_last=None, image_store=None, default_model=None,
+                 memory_budget_mb=None):
+        self.backend_name = backend or os.environ.get("HIPAA_XRAY_BACKEND", "eager")
+        if channels_last is None:
+            channels_last = os.environ.get("HIPAA_XRAY_CHANNELS_LAST", "0") == "1"
+        self.channels_last = channels_last
+        self.result_cache = result_cache or XrayResultCache()
+        if image_store is None and os.environ.get("HIPAA_XRAY_STORE"):
+            image_store = XrayImageStore(os.environ["HIPAA_XRAY_STORE"])
+        self.image_store = image_store
+        if inference_workers is None:
+            inference_workers = int(os.environ.get("HIPAA_INFERENCE_WORKERS", "2"))
+        if torch_threads is None:
+            # Leave one core for the event loop thread by default
+            torch_threads = int(os.environ.get("HIPAA_TORCH_THREADS", str(max(1, (os.cpu_count() or 2) - 1))))
+        self.torch_threads = torch_threads
+        self.executor = ThreadPoolExecutor(max_workers=max(1, inference_workers), thread_name_prefix="xray-inference")
+        if max_batch_size is None:
+            max_batch_size = int(os.environ.get("HIPAA_XRAY_MAX_BATCH", "8"))
+        if max_batch_wait_ms is None:
+            max_batch_wait_ms = float(os.environ.get("HIPAA_XRAY_MAX_BATCH_WAIT_MS", "10"))
+        self.max_batch_size = max_batch_size
+        self.max_batch_wait_ms = max_batch_wait_ms
+        self.batch_size_histogram = new_batch_size_histogram()
+        self.queue_wait_histogram = new_queue_wait_histogram()
+        if memory_budget_mb is None:
+            memory_budget_mb = float(os.environ.get("HIPAA_XRAY_MODEL_MEMORY_MB", "1024"))
+        self.memory_budget_bytes = int(memory_budget_mb * 2**20)
+        self.default_model = default_model or os.environ.get("HIPAA_XRAY_MODEL", DEFAULT_MODEL)
+        self.inference_flight = SingleFlight("xray_inference")
+        self._specs = {}
+        self._models = {}
+        self._closing = set()
+        for name, (_, resolution) in TORCHXRAYVISION_WEIGHTS.items():
+            self.register_model(name, lambda name=name: load_torchxrayvision(name), resolution)
+
+    def register_model(self, name, factory, resolution=224):
+        """Make ``factory()`` (returning a torch module with ``pathologies``) available as ``name``"""
+        self._specs[name] = (factory, resolution)
+
+    def available_models(self):
+        return sorted(self._specs)
+
+    def get_entry(self, model=None):
+        name = model or self.default_model
+        entry = self._models.get(name)
+        if entry is None:
+            if name not in self._specs:
+                raise ValueError(f"Unknown X-ray model {name!r}; available: {', '.join(self.available_models())}")
+            factory, resolution = self._specs[name]
+            entry = self._models[name] = XrayModel(self, name, factory, resolution)
+        return entry
+
+    def is_model_loaded(self, model=None):
+        entry = self._models.get(model or self.default_model)
+        return entry is not None and entry.is_loaded()
+
+    def start_background_load(self, model=None):
+        """Load and warm up a model (the default one) on the inference pool without blocking the caller.
+
+        Returns the load task, or None if the model name is unknown (logged, not raised, so a bad
+        ``HIPAA_XRAY_MODEL`` doesn't stop the server from starting).
+        """
+        try:
+            entry = self.get_entry(model)
+        except ValueError as e:
+            logger.error(f"Not preloading an X-ray model: {e}. Check HIPAA_XRAY_MODEL; "
+                         f"X-ray requests for the default model will fail until it names an available model")
+            return None
+        task = entry.start_load()
+        task.add_done_callback(lambda t: t.cancelled() or t.exception() or self._enforce_budget(keep=entry))
+        return task
+
+    async def ensure_loaded(self, model=None):
+        """Wait until ``model`` (default: the default model) is loaded and warmed up; returns its entry"""
+        entry = self.get_entry(model)
+        if not entry.is_loaded():
+            await asyncio.shield(entry.start_load())
+            self._enforce_budget(keep=entry)
+        entry.last_used = time.monotonic()
+        return entry
+
+    def close_batcher(self, batcher):
+        """Stop an evicted model's batch worker in the background, keeping the task until it finishes"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Batch workers only run on the server's loop, so without one there is nothing to stop
+            return
+        task = loop.create_task(batcher.close())
+        self._closing.add(task)
+        task.add_done_callback(self._batcher_closed)
+
+    def _batcher_closed(self, task):
+        self._closing.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Failed to stop X-ray batch worker: {task.exception()}")
+
+    def _enforce_budget(self, keep=None):
+        """Evict least recently used idle models until the loaded ones fit the memory budget"""
+        loaded = [entry for entry in self._models.values() if entry.is_loaded()]
+        total = sum(entry.memory_bytes for entry in loaded)
+        for entry in sorted(loaded, key=lambda entry: entry.last_used):
+            if total <= self.memory_budget_bytes:
+                break
+            if entry is keep or entry.active:
+                continue
+            logger.info(f"Evicting X-ray model {entry.name} ({entry.memory_bytes / 2**20:.0f} MB) "
+                        f"to stay within the {self.memory_budget_bytes / 2**20:.0f} MB budget")
+            total -= entry.memory_bytes
+            entry.unload()
+            metrics.counter("hipaa_xray_model_evictions_total", "X-ray models evicted under the memory budget",
+                            model=entry.name).inc()
+        if total > self.memory_budget_bytes:
+            logger.warning(f"Loaded X-ray models use {total / 2**20:.0f} MB, over the "
+                           f"{self.memory_budget_bytes / 2**20:.0f} MB budget; the rest are in use or were just loaded")
+
+    async def analyze_image(self, image_path, model=None):
+        """Return pathology scores for an image, reusing cached tensors and scores by content hash"""
+        entry = await self.ensure_loaded(model)
+        # An active model is never evicted, even if another load needs the room
+        entry.active += 1
+        try:
+            return await self._analyze(entry, image_path)
+        finally:
+            entry.active -= 1
+            entry.last_used = time.monotonic()
+
+    async def _analyze(self, entry, image_path):
+        loop = asyncio.get_running_loop()
+        model_id = entry.model_id
+        content_hash, scores, array = await loop.run_in_executor(self.executor, self._lookup_cached, image_path, entry)
+        if scores is not None:
+            return scores
+
+        async def infer(_):
+            if array is None:
+                img_tensor = await loop.run_in_executor(self.executor, self._preprocess_and_cache, image_path,
+                                                        content_hash, entry)
+            else:
+                import torch
+                img_tensor = torch.from_numpy(array)
+            scores = await entry.batcher.submit(img_tensor)
+            await loop.run_in_executor(self.executor, self.result_cache.put_scores, content_hash, model_id, scores)
+            return scores
+
+        # The same image requested concurrently (e.g. several clinicians at
+        # rounds) is decoded and scored once
+        return await self.inference_flight.do((content_hash, model_id), infer)
+
+    @timed_stage("xray_cache")
+    def _lookup_cached(self, image_path, entry):
+        # Ingested images come with their content hash and a memory-mapped
+        # tensor, so neither the PNG bytes nor the decoder are touched
+        store = self.image_store if entry.resolution == IMAGE_SHAPE[-1] else None
+        stored = store.lookup(image_path) if store is not None else None
+        if stored is not None:
+            scores = self.result_cache.get_scores(stored.sha256, entry.model_id)
+            array = None if scores is not None else store.get_array(stored)
+            return stored.sha256, scores, array
+        content_hash = self.result_cache.content_hash(image_path)
+        scores = self.result_cache.get_scores(content_hash, entry.model_id)
+        array = None if scores is not None else self.result_cache.get_tensor(content_hash, entry.transform_id)
+        return content_hash, scores, array
+
+    def _preprocess_and_cache(self, image_path, content_hash, entry):
+        img_tensor = entry.preprocess(image_path)
+        self.result_cache.put_tensor(content_hash, entry.transform_id, img_tensor.numpy())
+        return img_tensor
+
+    async def predict(self, img_tensor, model=None):
+        """Score one preprocessed 1xHxW image; concurrent calls share a batched forward pass"""
+        entry = await self.ensure_loaded(model)
+        entry.active += 1
+        try:
+            return await entry.batcher.submit(img_tensor)
+        finally:
+            entry.active -= 1
+            entry.last_used = time.monotonic()
+
+    def get_batch_stats(self):
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_batch_wait_ms,
+            "batch_size": self.batch_size_histogram.snapshot(),
+            "queue_wait_ms": self.queue_wait_histogram.snapshot()
+        }
+
+    def get_backend_info(self):
+        return {
+            "configured": self.backend_name,
+            "channels_last": self.channels_last,
+            "torch_threads": self.torch_threads
+        }
+
+    def get_model_stats(self):
+        now = time.monotonic()
+        loaded = [entry for entry in self._models.values() if entry.is_loaded()]
+        return {
+            "default": self.default_model,
+            "available": self.available_models(),
+            "memory_budget_mb": round(self.memory_budget_bytes / 2**20, 1),
+            "resident_mb": round(sum(entry.memory_bytes for entry in loaded) / 2**20, 1),
+            "models": {name: entry.stats(now) for name, entry in self._models.items()}
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
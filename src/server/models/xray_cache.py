@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger("hipaa-medical-mcp")
+
+class _LRU:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+class XrayResultCache:
+    """Two-level content-addressed cache for X-ray analysis.
+
+    Keys are ``(sha256 of the image bytes, model weights id)``. Level one holds
+    the preprocessed float32 tensor, level two the per-pathology score dict.
+    Both levels have an in-memory LRU and an optional on-disk store under
+    ``cache_dir`` that survives restarts.
+    """
+
+    def __init__(self, cache_dir=None, max_tensors=None, max_scores=None, disk_enabled=None):
+        self.cache_dir = cache_dir or os.environ.get("HIPAA_XRAY_CACHE_DIR", os.path.join(".cache", "xray"))
+        if max_tensors is None:
+            max_tensors = int(os.environ.get("HIPAA_XRAY_TENSOR_CACHE_SIZE", "64"))
+        if max_scores is None:
+            max_scores = int(os.environ.get("HIPAA_XRAY_SCORE_CACHE_SIZE", "4096"))
+        if disk_enabled is None:
+            disk_enabled = os.environ.get("HIPAA_XRAY_DISK_CACHE", "1") != "0"
+        self.disk_enabled = disk_enabled
+        self._tensors = _LRU(max_tensors)
+        self._scores = _LRU(max_scores)
+        self._hashes = _LRU(4096)
+        self._counts_lock = threading.Lock()
+        self.counts = {"tensor_hits": 0, "tensor_misses": 0, "score_hits": 0, "score_misses": 0}
+
+    def content_hash(self, image_path):
+        """sha256 of the image bytes, memoized per (path, mtime, size)"""
+        stat = os.stat(image_path)
+        signature = (image_path, stat.st_mtime_ns, stat.st_size)
+        digest = self._hashes.get(signature)
+        if digest is None:
+            h = hashlib.sha256()
+            with open(image_path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+            digest = h.hexdigest()
+            self._hashes.put(signature, digest)
+        return digest
+
+    def get_scores(self, content_hash, model_id):
+        key = (content_hash, model_id)
+        scores = self._scores.get(key)
+        if scores is None and self.disk_enabled:
+            scores = self._read_json(self._path("scores", model_id, content_hash, ".json"))
+            if scores is not None:
+                self._scores.put(key, scores)
+        self._count("score", scores is not None)
+        return scores
+
+    def put_scores(self, content_hash, model_id, scores):
+        self._scores.put((content_hash, model_id), scores)
+        if self.disk_enabled:
+            self._write(self._path("scores", model_id, content_hash, ".json"),
+                        lambda f: f.write(json.dumps(scores).encode()))
+
+    def get_tensor(self, content_hash, model_id):
+        """Return the cached preprocessed image as a numpy array, or None"""
+        key = (content_hash, model_id)
+        array = self._tensors.get(key)
+        if array is None and self.disk_enabled:
+            path = self._path("tensors", model_id, content_hash, ".npy")
+            if os.path.exists(path):
+                import numpy as np
+                try:
+                    array = np.load(path)
+                    self._tensors.put(key, array)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Ignoring unreadable tensor cache entry {path}: {e}")
+        self._count("tensor", array is not None)
+        return array
+
+    def put_tensor(self, content_hash, model_id, array):
+        self._tensors.put((content_hash, model_id), array)
+        if self.disk_enabled:
+            import numpy as np
+            self._write(self._path("tensors", model_id, content_hash, ".npy"), lambda f: np.save(f, array))
+
+    def stats(self):
+        with self._counts_lock:
+            counts = dict(self.counts)
+        counts["tensor_entries"] = len(self._tensors)
+        counts["score_entries"] = len(self._scores)
+        return counts
+
+    def _count(self, level, hit):
+        with self._counts_lock:
+            self.counts[f"{level}_{'hits' if hit else 'misses'}"] += 1
+
+    def _path(self, kind, model_id, content_hash, suffix):
+        return os.path.join(self.cache_dir, kind, model_id, content_hash[:2], content_hash + suffix)
+
+    def _read_json(self, path):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable score cache entry {path}: {e}")
+            return None
+
+    def _write(self, path, writer):
+        # Write to a temp file and rename so readers never see a partial entry
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                writer(f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Failed to write X-ray cache entry {path}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
@@ -0,0 +1,58 @@
+import asyncio
+import json
+from typing import Dict, Any, List
+import mcp.types
+from .base_tool import BaseTool, ToolFailure
+from ..compliance.hipaa_logger import HIPAALogger
+
+MAX_LIMIT = 1000
+
+class AuditQueryTool(BaseTool):
+    def __init__(self):
+        self.hipaa_logger = HIPAALogger()
+
+    def get_definition(self) -> mcp.types.Tool:
+        return mcp.types.Tool(
+            name="query_audit_log",
+            description="Search the HIPAA audit log by patient, role, action and time range (administrator only)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "user_role": {"type": "string", "description": "User role (must be administrator)"},
+                    "patient_id": {"type": "string", "description": "Only accesses to this patient"},
+                    "accessor_role": {"type": "string", "description": "Only entries logged for this user role"},
+                    "action": {"type": "string", "description": "Only this tool action, e.g. get_patient_info"},
+                    "since": {"type": "string", "description": "ISO date or datetime, inclusive"},
+                    "until": {"type": "string", "description": "ISO date or datetime, exclusive"},
+                    "limit": {"type": "integer", "description": f"Newest entries to return (max {MAX_LIMIT})",
+                              "default": 100}
+                },
+                "required": ["user_role"]
+            }
+        )
+
+    async def execute(self, arguments: Dict[str, Any]) -> List[mcp.types.TextContent]:
+        user_role = arguments["user_role"]
+        filters = {
+            "patient_id": arguments.get("patient_id"),
+            "user_role": arguments.get("accessor_role"),
+            "action": arguments.get("action"),
+            "since": arguments.get("since"),
+            "until": arguments.get("until")
+        }
+
+        if user_role != "administrator":
+            self.hipaa_logger.log_violation(user_role, "unauthorized_audit_query", filters)
+            raise ToolFailure("Access denied: only administrators can query the audit log")
+
+        self.hipaa_logger.log_audit(user_role, "query_audit_log", filters["patient_id"],
+                                    {key: value for key, value in filters.items() if value is not None})
+
+        limit = max(1, min(int(arguments.get("limit") or 100), MAX_LIMIT))
+        try:
+            entries, stats = await asyncio.to_thread(self.hipaa_logger.query_audit, limit=limit, **filters)
+        except ValueError as e:
+            raise ToolFailure(f"Invalid time range: {e}")
+
+        report = {"matched": stats["matched"], "returned": len(entries), "scan": stats, "entries": entries}
+        return [mcp.types.TextContent(type="text", text=json.dumps(report, indent=2, default=str))]
\ No newline at end of file
@@ -2,6 +2,9 @@ from abc import ABC, abstractmethod
 from typing import Dict, Any, List
 import mcp.types
 
+class ToolFailure(Exception):
+    """Raised by a tool to return its message as an error result (``isError``) instead of an answer"""
+
 class BaseTool(ABC):
     @abstractmethod
     def get_definition(self) -> mcp.types.Tool:
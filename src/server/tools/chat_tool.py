@@ -1,9 +1,10 @@
-import json
 from typing import Dict, Any, List
 import mcp.types
-from .base_tool import BaseTool
-from ..utils.data_loader import load_patient_data
-from ..utils.llama_client import call_local_llama
+from .base_tool import BaseTool, ToolFailure
+from ..utils.data_loader import load_patient_data_async
+from ..utils.llama_client import call_local_llama, is_failed_response
+from ..utils.progress import get_stream_sink
+from ..utils.prompt_builder import build_chat_prompt
 from ..compliance.hipaa_compliance import HIPAACompliance
 from ..compliance.hipaa_logger import HIPAALogger
 
@@ -34,34 +35,17 @@ class ChatTool(BaseTool):
         
         self.hipaa_logger.log_audit(user_role, "chat", patient_context, {"message": message})
         
-        context = ""
+        masked_data = None
         if patient_context:
-            patient_data = load_patient_data(patient_context)
+            patient_data = await load_patient_data_async(patient_context)
             if patient_data:
                 masked_data = self.hipaa_compliance.mask_pii_data(patient_data, user_role)
-                context = f"\nPatient Context ({patient_context}): {json.dumps(masked_data, indent=2)}"
         
-        prompt = f"""You are a clinical decision support AI assistant integrated into a hospital's EHR system. You are assisting a licensed {user_role} with patient care.
-
-CLINICAL CONTEXT:
-- This is a legitimate medical consultation within a healthcare facility
-- You are providing clinical decision support to a licensed medical professional
-- HIPAA compliance is maintained through system-level access controls
-
-{context}
-
-Clinical Query: {message}
-
-INSTRUCTIONS:
-1. Respond professionally as a clinical decision support tool
-2. Provide medically relevant information when appropriate
-3. Suggest clinical considerations and recommendations
-4. Maintain appropriate medical disclaimers
-5. Be conversational but clinically focused
-
-Respond as you would in a hospital's clinical decision support system."""
+        prompt = build_chat_prompt(user_role, message, patient_context, masked_data)
         
-        response = await call_local_llama(prompt)
+        response = await call_local_llama(prompt.prompt, on_token=get_stream_sink(), system=prompt.system)
         self.hipaa_logger.log_prompt(user_role, message, response)
+        if is_failed_response(response):
+            raise ToolFailure(response)
         
         return [mcp.types.TextContent(type="text", text=response)]
\ No newline at end of file
@@ -0,0 +1,44 @@
+from typing import Dict, Any, List
+import mcp.types
+from .base_tool import BaseTool, ToolFailure
+from ..utils.prompt_builder import build_patient_info_prompt
+from ..utils.cohort import COHORT_INPUT_PROPERTIES, CohortRun
+from ..compliance.hipaa_compliance import HIPAACompliance
+from ..compliance.hipaa_logger import HIPAALogger
+
+class CohortInfoTool(BaseTool):
+    def __init__(self):
+        self.hipaa_logger = HIPAALogger()
+        self.hipaa_compliance = HIPAACompliance()
+    
+    def get_definition(self) -> mcp.types.Tool:
+        return mcp.types.Tool(
+            name="get_cohort_info",
+            description="Answer the same clinical question for a list or filtered cohort of patients",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "user_role": {"type": "string", "description": "User role (doctor/administrator)"},
+                    "query": {"type": "string", "description": "Information requested for each patient"},
+                    **COHORT_INPUT_PROPERTIES
+                },
+                "required": ["user_role", "query"]
+            }
+        )
+    
+    async def execute(self, arguments: Dict[str, Any]) -> List[mcp.types.TextContent]:
+        try:
+            cohort = await CohortRun.create(arguments, "get_cohort_info", self.hipaa_logger)
+        except ValueError as e:
+            raise ToolFailure(str(e))
+        
+        masked_records = await cohort.masked_records(self.hipaa_compliance)
+        
+        async def answer(patient_id):
+            if patient_id not in masked_records:
+                return {"patient_id": patient_id, "status": "not_found", "report": f"Patient {patient_id} not found"}
+            prompt = build_patient_info_prompt(cohort.user_role, masked_records[patient_id], cohort.query)
+            return await cohort.ask_llm(patient_id, prompt, "Cohort query")
+        
+        report = await cohort.run(answer, "Cohort report")
+        return [mcp.types.TextContent(type="text", text=report)]
\ No newline at end of file
@@ -0,0 +1,67 @@
+import json
+import time
+from typing import Dict, Any, List
+import mcp.types
+from .base_tool import BaseTool, ToolFailure
+from ..utils.data_loader import record_cache, record_flight
+from ..utils.llama_client import llm_flight
+from ..utils.metrics import metrics
+from ..utils.response_cache import get_response_cache
+from ..compliance.hipaa_logger import HIPAALogger
+
+class ServerMetricsTool(BaseTool):
+    def __init__(self, tool_registry, model_manager):
+        self.tool_registry = tool_registry
+        self.model_manager = model_manager
+        self.started = time.time()
+        self.hipaa_logger = HIPAALogger()
+
+    def get_definition(self) -> mcp.types.Tool:
+        return mcp.types.Tool(
+            name="get_server_metrics",
+            description="Report server latency histograms, per-stage timings, queue and cache statistics (administrator only)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "user_role": {"type": "string", "description": "User role (must be administrator)"},
+                    "format": {
+                        "type": "string",
+                        "enum": ["json", "prometheus"],
+                        "description": "Output format",
+                        "default": "json"
+                    }
+                },
+                "required": ["user_role"]
+            }
+        )
+
+    async def execute(self, arguments: Dict[str, Any]) -> List[mcp.types.TextContent]:
+        user_role = arguments["user_role"]
+        if user_role != "administrator":
+            self.hipaa_logger.log_violation(user_role, "unauthorized_metrics_access", {"format": arguments.get("format")})
+            raise ToolFailure("Access denied: only administrators can read server metrics")
+
+        if arguments.get("format") == "prometheus":
+            return [mcp.types.TextContent(type="text", text=metrics.to_prometheus())]
+
+        response_cache = get_response_cache()
+        report = {
+            "uptime_s": round(time.time() - self.started, 3),
+            "scheduler": self.tool_registry.get_stats(),
+            "metrics": metrics.snapshot(),
+            "xray_batching": self.model_manager.get_batch_stats(),
+            "xray_backend": self.model_manager.get_backend_info(),
+            "xray_models": self.model_manager.get_model_stats(),
+            "single_flight": {
+                "patient_record": record_flight.stats(),
+                "xray_inference": self.model_manager.inference_flight.stats(),
+                "llm": llm_flight.stats()
+            },
+            "caches": {
+                "patient_records": record_cache.stats(),
+                "xray_results": self.model_manager.result_cache.stats(),
+                "xray_store": self.model_manager.image_store.stats() if self.model_manager.image_store is not None else None,
+                "llm_responses": response_cache.stats() if response_cache is not None else None
+            }
+        }
+        return [mcp.types.TextContent(type="text", text=json.dumps(report, indent=2, default=str))]
\ No newline at end of file
@@ -0,0 +1,73 @@
+import asyncio
+import json
+import time
+from typing import Dict, Any, List
+import mcp.types
+from .base_tool import BaseTool
+from ..utils.data_loader import load_patient_data_async, get_xray_image_path
+from ..compliance.hipaa_logger import HIPAALogger
+import logging
+
+logger = logging.getLogger("hipaa-medical-mcp")
+
+class PrefetchPatientTool(BaseTool):
+    """Warm the server-side caches for a patient without calling the LLM.
+
+    Loads the EHR record into the record cache and scores the patient's
+    X-ray into the result cache, concurrently, so the follow-up questions a
+    client is about to ask skip that work. Only timings and found/not-found
+    flags are returned, never patient data.
+    """
+
+    def __init__(self, model_manager):
+        self.model_manager = model_manager
+        self.hipaa_logger = HIPAALogger()
+
+    def get_definition(self) -> mcp.types.Tool:
+        return mcp.types.Tool(
+            name="prefetch_patient",
+            description="Warm record and X-ray score caches for a patient ahead of questions (no LLM, no data returned)",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "patient_id": {"type": "string", "description": "Patient ID"},
+                    "user_role": {"type": "string", "description": "User role (doctor/administrator)"},
+                    "xray": {"type": "boolean", "description": "Also score the patient's X-ray", "default": True}
+                },
+                "required": ["patient_id", "user_role"]
+            }
+        )
+
+    async def execute(self, arguments: Dict[str, Any]) -> List[mcp.types.TextContent]:
+        patient_id = arguments["patient_id"]
+        user_role = arguments["user_role"]
+
+        self.hipaa_logger.log_audit(user_role, "prefetch_patient", patient_id, {})
+
+        async def warm_record():
+            started = time.perf_counter()
+            record = await load_patient_data_async(patient_id)
+            return record is not None, (time.perf_counter() - started) * 1000
+
+        async def warm_xray():
+            image_path = get_xray_image_path(patient_id) if arguments.get("xray", True) else None
+            if image_path is None:
+                return False, 0.0
+            started = time.perf_counter()
+            try:
+                await self.model_manager.analyze_image(image_path)
+            except Exception as e:
+                # Best effort: the real request reports the failure
+                logger.warning(f"X-ray prefetch for patient {patient_id} failed: {e}")
+                return False, (time.perf_counter() - started) * 1000
+            return True, (time.perf_counter() - started) * 1000
+
+        (record_found, record_ms), (xray_scored, xray_ms) = await asyncio.gather(warm_record(), warm_xray())
+        summary = {
+            "patient_id": patient_id,
+            "record": record_found,
+            "xray": xray_scored,
+            "record_ms": round(record_ms, 3),
+            "xray_ms": round(xray_ms, 3)
+        }
+        return [mcp.types.TextContent(type="text", text=json.dumps(summary))]
\ No newline at end of file
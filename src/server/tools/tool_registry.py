@@ -1,21 +1,190 @@
+import asyncio
+import heapq
+import itertools
+import os
+import time
 from typing import Dict, List, Any
 import mcp.types
+from ..utils.metrics import metrics
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_STANDARD = 1
+PRIORITY_BATCH = 2
+
+class ToolOverloadedError(Exception):
+    """Raised when a tool's wait queue is full and the request is rejected"""
+
+class ToolDeadlineExceeded(Exception):
+    """Raised when a request does not finish before its deadline"""
+
+class PrioritySlots:
+    """Global execution slots handed out lowest priority number first, FIFO within a class"""
+
+    def __init__(self, size):
+        self.size = size
+        self._free = size
+        self._waiters = []
+        self._counter = itertools.count()
+
+    async def acquire(self, priority):
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        entry = [priority, next(self._counter), future]
+        heapq.heappush(self._waiters, entry)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed to us just as we were cancelled
+                self.release()
+            else:
+                entry[2] = None
+            raise
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if future is not None and not future.done():
+                future.set_result(None)
+                return
+        self._free += 1
+
+    @property
+    def waiting(self):
+        return sum(1 for entry in self._waiters if entry[2] is not None and not entry[2].done())
+
+class ToolGate:
+    """Per-tool concurrency limit with a bounded wait queue"""
+
+    def __init__(self, name, max_concurrency, max_queue, priority, timeout):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.priority = priority
+        self.timeout = timeout
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.cancelled = 0
+        self.latency = metrics.histogram("hipaa_tool_duration_seconds", "End-to-end tool call latency", tool=name)
+        self.queue_wait = metrics.histogram("hipaa_tool_queue_wait_seconds",
+                                            "Time a tool call waited for its concurrency and priority slots",
+                                            tool=name)
+
+    def stats(self):
+        return {
+            "priority": self.priority,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "cancelled": self.cancelled
+        }
 
 class ToolRegistry:
-    def __init__(self):
+    def __init__(self, max_concurrency=None):
+        if max_concurrency is None:
+            max_concurrency = int(os.environ.get("HIPAA_MAX_CONCURRENT_TOOLS", "8"))
         self.tools = {}
-    
-    def register(self, name: str, tool_instance):
+        self.gates = {}
+        self.slots = PrioritySlots(max_concurrency)
+
+    def register(self, name: str, tool_instance, max_concurrency=None, max_queue=None,
+                 priority=PRIORITY_STANDARD, timeout=None):
+        """Register a tool with its scheduling policy.
+
+        ``max_concurrency`` bounds in-flight calls of this tool, ``max_queue``
+        bounds callers waiting behind them (extra callers are rejected),
+        ``priority`` orders access to the registry-wide slots and ``timeout``
+        is the default per-request deadline in seconds.
+        """
         self.tools[name] = tool_instance
-    
+        self.gates[name] = ToolGate(
+            name,
+            max_concurrency or self.slots.size,
+            max_queue if max_queue is not None else 4 * (max_concurrency or self.slots.size),
+            priority,
+            timeout
+        )
+
     def get_tool_definitions(self) -> List[mcp.types.Tool]:
         definitions = []
         for _, tool in self.tools.items():
             definitions.append(tool.get_definition())
         return definitions
-    
-    async def execute_tool(self, name: str, arguments: Dict[str, Any]) -> List[mcp.types.TextContent]:
+
+    async def execute_tool(self, name: str, arguments: Dict[str, Any], deadline=None) -> List[mcp.types.TextContent]:
+        """Run a tool under its concurrency limit, priority and deadline (seconds)"""
         if name not in self.tools:
             raise ValueError(f"Unknown tool: {name}")
-        
-        return await self.tools[name].execute(arguments)
\ No newline at end of file
+
+        gate = self.gates[name]
+        if gate.semaphore.locked() and gate.queued >= gate.max_queue:
+            gate.rejected += 1
+            self._count(name, "rejected")
+            raise ToolOverloadedError(f"Tool {name} is overloaded, please retry later")
+
+        timeout = deadline if deadline is not None else gate.timeout
+        started = time.perf_counter()
+        status = "error"
+        try:
+            result = await asyncio.wait_for(self._run(name, gate, arguments), timeout)
+            status = "ok"
+            return result
+        except asyncio.TimeoutError:
+            gate.timed_out += 1
+            status = "timeout"
+            raise ToolDeadlineExceeded(f"Tool {name} did not finish within {timeout:g}s")
+        except asyncio.CancelledError:
+            gate.cancelled += 1
+            status = "cancelled"
+            raise
+        finally:
+            gate.latency.observe(time.perf_counter() - started)
+            self._count(name, status)
+
+    @staticmethod
+    def _count(name, status):
+        metrics.counter("hipaa_tool_requests_total", "Tool calls by outcome", tool=name, status=status).inc()
+
+    async def _run(self, name, gate, arguments):
+        enqueued = time.perf_counter()
+        gate.queued += 1
+        try:
+            await gate.semaphore.acquire()
+        finally:
+            gate.queued -= 1
+        try:
+            await self.slots.acquire(gate.priority)
+            gate.queue_wait.observe(time.perf_counter() - enqueued)
+            try:
+                gate.in_flight += 1
+                try:
+                    result = await self.tools[name].execute(arguments)
+                except Exception:
+                    gate.failed += 1
+                    raise
+                finally:
+                    gate.in_flight -= 1
+                gate.completed += 1
+                return result
+            finally:
+                self.slots.release()
+        finally:
+            gate.semaphore.release()
+
+    def get_stats(self):
+        return {
+            "max_concurrency": self.slots.size,
+            "waiting_for_slot": self.slots.waiting,
+            "tools": {name: gate.stats() for name, gate in self.gates.items()}
+        }
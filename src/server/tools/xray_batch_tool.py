@@ -0,0 +1,70 @@
+from typing import Dict, Any, List
+import mcp.types
+from .base_tool import BaseTool, ToolFailure
+from ..utils.data_loader import get_xray_image_path
+from ..utils.prompt_builder import build_xray_prompt
+from ..utils.cohort import COHORT_INPUT_PROPERTIES, CohortRun
+from ..compliance.hipaa_compliance import HIPAACompliance
+from ..compliance.hipaa_logger import HIPAALogger
+import logging
+
+logger = logging.getLogger("hipaa-medical-mcp")
+
+class XrayBatchTool(BaseTool):
+    def __init__(self, model_manager):
+        self.model_manager = model_manager
+        self.hipaa_logger = HIPAALogger()
+        self.hipaa_compliance = HIPAACompliance()
+    
+    def get_definition(self) -> mcp.types.Tool:
+        return mcp.types.Tool(
+            name="analyze_xray_batch",
+            description="Analyze X-ray images for a list or filtered cohort of patients with HIPAA compliance",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "user_role": {"type": "string", "description": "User role (doctor/administrator)"},
+                    "query": {"type": "string", "description": "Analysis request for each patient"},
+                    "model": {
+                        "type": "string",
+                        "enum": self.model_manager.available_models(),
+                        "description": f"X-ray model weights (default {self.model_manager.default_model})"
+                    },
+                    **COHORT_INPUT_PROPERTIES
+                },
+                "required": ["user_role", "query"]
+            }
+        )
+    
+    async def execute(self, arguments: Dict[str, Any]) -> List[mcp.types.TextContent]:
+        model = arguments.get("model")
+        
+        try:
+            cohort = await CohortRun.create(arguments, "analyze_xray_batch", self.hipaa_logger)
+        except ValueError as e:
+            raise ToolFailure(str(e))
+        
+        try:
+            await self.model_manager.ensure_loaded(model)
+        except ValueError as e:
+            raise ToolFailure(str(e))
+        except Exception as e:
+            logger.error(f"X-ray model unavailable: {e}")
+            raise ToolFailure("X-ray analysis model is not loaded")
+        
+        masked_records = await cohort.masked_records(self.hipaa_compliance)
+        
+        async def analyze(patient_id):
+            image_path = get_xray_image_path(patient_id)
+            if image_path is None:
+                return {"patient_id": patient_id, "status": "no_image",
+                        "report": f"X-ray image for patient {patient_id} not found"}
+            # All patients enter the inference queue at once, so the model
+            # manager scores them in shared batches; only the LLM stage is bounded
+            results = await self.model_manager.analyze_image(image_path, model)
+            prompt = build_xray_prompt(cohort.user_role, patient_id, masked_records.get(patient_id, {}), results,
+                                       cohort.query)
+            return await cohort.ask_llm(patient_id, prompt, "X-ray batch analysis")
+        
+        report = await cohort.run(analyze, "X-ray cohort report")
+        return [mcp.types.TextContent(type="text", text=report)]
\ No newline at end of file
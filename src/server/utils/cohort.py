@@ -0,0 +1,161 @@
+import asyncio
+import os
+import logging
+from .data_loader import get_ehr_store, load_patient_records
+from .llama_client import call_local_llama, is_failed_response
+from .progress import get_stream_sink
+
+logger = logging.getLogger("hipaa-medical-mcp")
+
+MAX_COHORT_SIZE = int(os.environ.get("HIPAA_COHORT_MAX_PATIENTS", "200"))
+MAX_PARALLEL = 16
+
+COHORT_INPUT_PROPERTIES = {
+    "patient_ids": {
+        "type": "array",
+        "items": {"type": "string"},
+        "description": "Patient IDs to include"
+    },
+    "filter": {
+        "type": "object",
+        "description": "Select patients from the indexed EHR store instead of listing IDs",
+        "properties": {
+            "condition": {"type": "string", "description": "Diagnosis or condition word prefix, e.g. 'diabetes'"},
+            "medication": {"type": "string", "description": "Medication word prefix, e.g. 'metformin'"},
+            "visit_from": {"type": "string", "description": "Earliest visit date (YYYY-MM-DD)"},
+            "visit_to": {"type": "string", "description": "Latest visit date (YYYY-MM-DD)"}
+        }
+    },
+    "max_parallel": {
+        "type": "integer",
+        "description": f"Patients processed concurrently (1-{MAX_PARALLEL})",
+        "default": 4
+    }
+}
+
+def resolve_cohort_ids(arguments):
+    """Turn ``patient_ids`` and/or ``filter`` arguments into an ordered, de-duplicated ID list"""
+    patient_ids = [str(patient_id) for patient_id in arguments.get("patient_ids") or []]
+    cohort_filter = arguments.get("filter") or {}
+    if cohort_filter:
+        store = get_ehr_store()
+        if store is None:
+            raise ValueError("Cohort filters require the indexed EHR store (set HIPAA_EHR_STORE)")
+        selected = None
+        for matches in _filter_matches(store, cohort_filter):
+            selected = set(matches) if selected is None else selected & set(matches)
+        if selected is None:
+            raise ValueError("Cohort filter has no supported criteria")
+        if patient_ids:
+            patient_ids = [patient_id for patient_id in patient_ids if patient_id in selected]
+        else:
+            patient_ids = sorted(selected)
+    if not patient_ids:
+        raise ValueError("No patients selected; provide patient_ids or a filter")
+
+    unique_ids = list(dict.fromkeys(patient_ids))
+    if len(unique_ids) > MAX_COHORT_SIZE:
+        raise ValueError(f"Cohort of {len(unique_ids)} patients exceeds the limit of {MAX_COHORT_SIZE}")
+    return unique_ids
+
+def _filter_matches(store, cohort_filter):
+    if cohort_filter.get("condition"):
+        yield store.find_by_condition(cohort_filter["condition"])
+    if cohort_filter.get("medication"):
+        yield store.find_by_medication(cohort_filter["medication"])
+    if cohort_filter.get("visit_from") or cohort_filter.get("visit_to"):
+        yield store.find_by_visit_range(cohort_filter.get("visit_from"), cohort_filter.get("visit_to"))
+
+def parallelism(arguments, default=4):
+    try:
+        value = int(arguments.get("max_parallel", default))
+    except (TypeError, ValueError):
+        value = default
+    return max(1, min(MAX_PARALLEL, value))
+
+async def run_per_patient(patient_ids, handler, on_result=None):
+    """Run ``handler(patient_id)`` for every patient concurrently.
+
+    Failures are captured as an ``error`` status for that patient only.
+    ``on_result`` is awaited as each patient finishes; results are returned in
+    input order.
+    """
+    async def run_one(patient_id):
+        try:
+            result = await handler(patient_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Cohort step failed for patient {patient_id}: {e}")
+            result = {"patient_id": patient_id, "status": "error", "report": str(e)}
+        if on_result is not None:
+            await on_result(result)
+        return result
+
+    return await asyncio.gather(*(run_one(patient_id) for patient_id in patient_ids))
+
+def format_patient_section(result):
+    return f"## Patient {result['patient_id']} [{result['status']}]\n{result['report']}\n"
+
+def format_cohort_report(title, results):
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    summary = ", ".join(f"{status}: {count}" for status, count in sorted(counts.items()))
+    sections = "\n".join(format_patient_section(result) for result in results)
+    return f"# {title}\n{len(results)} patients ({summary})\n\n{sections}"
+
+class CohortRun:
+    """One cohort tool call: the selected patients, their masked records and the LLM slots.
+
+    ``create`` resolves the cohort off the event loop (``ValueError`` for a
+    bad selection) and audits the access to every patient under ``action``.
+    ``ask_llm`` runs a patient's prompt within ``max_parallel`` and logs it;
+    ``run`` calls the per-patient handler for everyone, streams each section
+    as it finishes and returns the report.
+    """
+    def __init__(self, arguments, patient_ids, hipaa_logger):
+        self.user_role = arguments["user_role"]
+        self.query = arguments["query"]
+        self.hipaa_logger = hipaa_logger
+        self.patient_ids = patient_ids
+        self.llm_slots = asyncio.Semaphore(parallelism(arguments))
+
+    @classmethod
+    async def create(cls, arguments, action, hipaa_logger):
+        # Filters query the EHR store, which may open and read SQLite
+        patient_ids = await asyncio.to_thread(resolve_cohort_ids, arguments)
+        cohort = cls(arguments, patient_ids, hipaa_logger)
+        for patient_id in patient_ids:
+            hipaa_logger.log_audit(cohort.user_role, action, patient_id,
+                                   {"query": cohort.query, "cohort_size": len(patient_ids)})
+        return cohort
+
+    async def masked_records(self, hipaa_compliance):
+        """Records of the patients found in the EHR, masked for the caller's role, by patient ID"""
+        return await asyncio.to_thread(self._load_masked, hipaa_compliance)
+
+    def _load_masked(self, hipaa_compliance):
+        records = load_patient_records(self.patient_ids)
+        found_ids = [patient_id for patient_id in self.patient_ids if patient_id in records]
+        return dict(zip(
+            found_ids,
+            hipaa_compliance.mask_pii_records([records[patient_id] for patient_id in found_ids], self.user_role)
+        ))
+
+    async def ask_llm(self, patient_id, prompt, label):
+        async with self.llm_slots:
+            response = await call_local_llama(prompt.prompt, system=prompt.system)
+        self.hipaa_logger.log_prompt(self.user_role, f"{label} (patient {patient_id}): {self.query}", response)
+        status = "error" if is_failed_response(response) else "ok"
+        return {"patient_id": patient_id, "status": status, "report": response}
+
+    async def run(self, handler, title):
+        stream = get_stream_sink()
+
+        async def on_result(result):
+            if stream:
+                await stream(format_patient_section(result))
+
+        results = await run_per_patient(self.patient_ids, handler, on_result)
+        return format_cohort_report(title, results)
@@ -1,18 +1,162 @@
+import asyncio
+import copy
 import json
 import os
+import threading
 import logging
+from collections import OrderedDict
+from .metrics import timed_stage
+from .single_flight import SingleFlight
 
 logger = logging.getLogger("hipaa-medical-mcp")
 
+class PatientRecordCache:
+    """Bounded LRU cache of parsed EHR records.
+
+    Entries are validated against the file's ``(st_mtime_ns, st_size)`` on
+    every lookup, so an edited record is re-read on the next call. With
+    ``share_records`` enabled the cached object itself is returned and callers
+    must treat it as read-only; otherwise each hit returns a deep copy.
+    """
+
+    def __init__(self, max_entries=None, share_records=None):
+        if max_entries is None:
+            max_entries = int(os.environ.get("HIPAA_RECORD_CACHE_SIZE", "256"))
+        if share_records is None:
+            share_records = os.environ.get("HIPAA_RECORD_CACHE_SHARE", "1") != "0"
+        self.max_entries = max_entries
+        self.share_records = share_records
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.invalidate(path)
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return self._view(entry[1])
+            if entry is not None:
+                self.invalidations += 1
+            self.misses += 1
+
+        with open(path, 'r') as f:
+            record = json.load(f)
+
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[path] = (signature, record)
+                self._entries.move_to_end(path)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return self._view(record)
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            elif self._entries.pop(path, None) is not None:
+                self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+    def _view(self, record):
+        return record if self.share_records else copy.deepcopy(record)
+
+record_cache = PatientRecordCache()
+
+_ehr_store = None
+_ehr_store_lock = threading.Lock()
+
+def configure_ehr_store(store):
+    """Serve records from an indexed store (an ``EHRStore`` or a database path); ``None`` disables it"""
+    global _ehr_store
+    if isinstance(store, str):
+        from .ehr_store import EHRStore
+        store = EHRStore(store)
+    with _ehr_store_lock:
+        previous, _ehr_store = _ehr_store, store
+    if previous is not None and previous is not store:
+        previous.close()
+
+def get_ehr_store():
+    """Return the configured store, opening ``HIPAA_EHR_STORE`` on first use"""
+    global _ehr_store
+    if _ehr_store is None:
+        db_path = os.environ.get("HIPAA_EHR_STORE")
+        if db_path:
+            with _ehr_store_lock:
+                if _ehr_store is None:
+                    from .ehr_store import EHRStore
+                    _ehr_store = EHRStore(db_path)
+    return _ehr_store
+
+@timed_stage("load")
 def load_patient_data(patient_id):
-    """Load patient data from EHR files"""
+    """Load patient data from the indexed EHR store or the EHR files"""
     try:
+        store = get_ehr_store()
+        if store is not None:
+            record = store.get(patient_id)
+            if record is not None:
+                return record
         patient_file = f"ehr/Patient_{patient_id}.json"
-        if not os.path.exists(patient_file):
-            return None
-        
-        with open(patient_file, 'r') as f:
-            return json.load(f)
+        return record_cache.get(patient_file)
     except Exception as e:
         logger.error(f"Failed to load patient data: {e}")
-        return None
\ No newline at end of file
+        return None
+
+record_flight = SingleFlight("patient_record")
+
+async def load_patient_data_async(patient_id):
+    """``load_patient_data`` off the event loop; concurrent loads of one patient share a single read"""
+    record = await record_flight.do(str(patient_id), lambda _: asyncio.to_thread(load_patient_data, patient_id))
+    # Callers mask independently, but with sharing disabled each still gets its own copy
+    return record if record is None or record_cache.share_records else copy.deepcopy(record)
+
+@timed_stage("load_bulk")
+def load_patient_records(patient_ids):
+    """Load several patient records at once; returns ``{patient_id: record}`` for those found"""
+    records = {}
+    remaining = list(patient_ids)
+    store = get_ehr_store()
+    if store is not None:
+        try:
+            records.update(store.get_many(remaining))
+        except Exception as e:
+            logger.error(f"Failed to load patient records from store: {e}")
+        remaining = [patient_id for patient_id in remaining if patient_id not in records]
+    for patient_id in remaining:
+        try:
+            record = record_cache.get(f"ehr/Patient_{patient_id}.json")
+        except Exception as e:
+            logger.error(f"Failed to load patient data: {e}")
+            continue
+        if record is not None:
+            records[patient_id] = record
+    return records
+
+def get_xray_image_path(patient_id):
+    """Path of the patient's normalized X-ray, or None if there is no image"""
+    image_path = f"normalized_patients/Patient_{patient_id}.png"
+    return image_path if os.path.exists(image_path) else None
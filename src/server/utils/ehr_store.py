@@ -0,0 +1,310 @@
+import argparse
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger("hipaa-medical-mcp")
+
+DEFAULT_DB_PATH = os.path.join("ehr", "ehr_store.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS patients (
+    patient_key TEXT PRIMARY KEY,
+    patient_id TEXT,
+    record_schema TEXT NOT NULL,
+    age INTEGER,
+    gender TEXT,
+    diagnosis TEXT,
+    status TEXT,
+    source_path TEXT NOT NULL UNIQUE,
+    source_mtime_ns INTEGER NOT NULL,
+    source_size INTEGER NOT NULL,
+    record_json TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_patients_patient_id ON patients(patient_id);
+CREATE INDEX IF NOT EXISTS idx_patients_diagnosis ON patients(diagnosis COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS patient_aliases (
+    alias TEXT PRIMARY KEY,
+    patient_key TEXT NOT NULL REFERENCES patients(patient_key) ON DELETE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS patient_conditions (
+    patient_key TEXT NOT NULL REFERENCES patients(patient_key) ON DELETE CASCADE,
+    condition TEXT NOT NULL,
+    term TEXT NOT NULL COLLATE NOCASE
+);
+CREATE INDEX IF NOT EXISTS idx_conditions_term ON patient_conditions(term);
+CREATE INDEX IF NOT EXISTS idx_conditions_patient ON patient_conditions(patient_key);
+
+CREATE TABLE IF NOT EXISTS patient_medications (
+    patient_key TEXT NOT NULL REFERENCES patients(patient_key) ON DELETE CASCADE,
+    medication TEXT NOT NULL,
+    term TEXT NOT NULL COLLATE NOCASE
+);
+CREATE INDEX IF NOT EXISTS idx_medications_term ON patient_medications(term);
+CREATE INDEX IF NOT EXISTS idx_medications_patient ON patient_medications(patient_key);
+
+CREATE TABLE IF NOT EXISTS patient_visits (
+    patient_key TEXT NOT NULL REFERENCES patients(patient_key) ON DELETE CASCADE,
+    visit_date TEXT NOT NULL,
+    visit_type TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_visits_date ON patient_visits(visit_date);
+CREATE INDEX IF NOT EXISTS idx_visits_patient ON patient_visits(patient_key);
+"""
+
+_FILE_PATTERNS = [
+    (re.compile(r"^Patient_(\w+)\.json$"), "demographic"),
+    (re.compile(r"^patient_(\w+)\.json$"), "encounter"),
+]
+
+def normalize_record(record, record_schema):
+    """Map either EHR schema onto the indexed fields"""
+    if record_schema == "demographic":
+        conditions = list(record.get("medical_conditions") or [])
+        medications = list(record.get("current_medications") or [])
+        visits = [(record["last_visit"], "visit")] if record.get("last_visit") else []
+        diagnosis = conditions[0] if conditions else None
+    else:
+        diagnosis = record.get("diagnosis")
+        conditions = [diagnosis] if diagnosis else []
+        medications = list(record.get("medications") or [])
+        visits = [(record[field], kind) for field, kind in
+                  (("admission_date", "admission"), ("discharge_date", "discharge")) if record.get(field)]
+    age = record.get("age")
+    return {
+        "patient_id": str(record["patient_id"]) if record.get("patient_id") is not None else None,
+        "age": age if isinstance(age, int) else None,
+        "gender": record.get("gender"),
+        "diagnosis": diagnosis,
+        "status": record.get("status"),
+        "conditions": conditions,
+        "medications": medications,
+        "visits": visits
+    }
+
+class EHRStore:
+    """Single-file SQLite store holding every EHR record plus secondary indexes.
+
+    Records are kept verbatim so ``get`` is a drop-in replacement for reading
+    the JSON file; the normalized columns only back the lookup indexes.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, cache_size=256):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+        self._data_version = None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def ingest(self, ehr_dir="ehr"):
+        """Incrementally load ``Patient_N.json`` and ``patient_PNNN.json`` files.
+
+        Records previously loaded from ``ehr_dir`` whose file is gone are removed.
+        """
+        stats = {"added": 0, "updated": 0, "unchanged": 0, "removed": 0, "failed": 0}
+        seen_paths = set()
+        with self._lock, self._conn:
+            known = {
+                row[0]: (row[1], row[2])
+                for row in self._conn.execute("SELECT source_path, source_mtime_ns, source_size FROM patients")
+            }
+            for path in sorted(glob.glob(os.path.join(ehr_dir, "*.json"))):
+                name = os.path.basename(path)
+                for pattern, record_schema in _FILE_PATTERNS:
+                    match = pattern.match(name)
+                    if match:
+                        break
+                else:
+                    continue
+                seen_paths.add(path)
+                stat = os.stat(path)
+                if known.get(path) == (stat.st_mtime_ns, stat.st_size):
+                    stats["unchanged"] += 1
+                    continue
+                try:
+                    with open(path, "r") as f:
+                        record = json.load(f)
+                    self._upsert(match.group(1), record_schema, record, path, stat)
+                except Exception as e:
+                    stats["failed"] += 1
+                    logger.error(f"Failed to ingest {path}: {e}")
+                    continue
+                stats["updated" if path in known else "added"] += 1
+
+            # Only records loaded from this directory can be stale here; a store
+            # filled from several directories keeps the others' records
+            directory = os.path.abspath(ehr_dir)
+            for path in set(known) - seen_paths:
+                if os.path.dirname(os.path.abspath(path)) != directory:
+                    continue
+                self._conn.execute("DELETE FROM patients WHERE source_path = ?", (path,))
+                stats["removed"] += 1
+        self._cache.clear()
+        return stats
+
+    def _upsert(self, file_key, record_schema, record, path, stat):
+        fields = normalize_record(record, record_schema)
+        self._conn.execute("DELETE FROM patients WHERE patient_key = ? OR source_path = ?", (file_key, path))
+        self._conn.execute(
+            "INSERT INTO patients (patient_key, patient_id, record_schema, age, gender, diagnosis, status,"
+            " source_path, source_mtime_ns, source_size, record_json) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (file_key, fields["patient_id"], record_schema, fields["age"], fields["gender"], fields["diagnosis"],
+             fields["status"], path, stat.st_mtime_ns, stat.st_size, json.dumps(record, separators=(",", ":")))
+        )
+        aliases = {file_key.lower()}
+        if fields["patient_id"]:
+            aliases.add(fields["patient_id"].lower())
+        self._conn.executemany(
+            "INSERT OR IGNORE INTO patient_aliases (alias, patient_key) VALUES (?, ?)",
+            [(alias, file_key) for alias in aliases]
+        )
+        self._conn.executemany(
+            "INSERT INTO patient_conditions (patient_key, condition, term) VALUES (?, ?, ?)",
+            [(file_key, condition, term) for condition in fields["conditions"] for term in _word_suffixes(condition)]
+        )
+        self._conn.executemany(
+            "INSERT INTO patient_medications (patient_key, medication, term) VALUES (?, ?, ?)",
+            [(file_key, medication, term) for medication in fields["medications"] for term in _word_suffixes(medication)]
+        )
+        self._conn.executemany(
+            "INSERT INTO patient_visits (patient_key, visit_date, visit_type) VALUES (?, ?, ?)",
+            [(file_key, date, kind) for date, kind in fields["visits"]]
+        )
+
+    def get(self, patient_id):
+        """Fetch a record by file key (``1``, ``P001``) or by its ``patient_id``"""
+        alias = str(patient_id).lower()
+        with self._lock:
+            self._check_data_version()
+            record = self._cache.get(alias)
+            if record is not None:
+                self._cache.move_to_end(alias)
+                return record
+            row = self._conn.execute(
+                "SELECT p.record_json FROM patient_aliases a JOIN patients p ON p.patient_key = a.patient_key"
+                " WHERE a.alias = ?", (alias,)
+            ).fetchone()
+            if row is None:
+                return None
+            record = json.loads(row[0])
+            if self._cache_size > 0:
+                self._cache[alias] = record
+                while len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+            return record
+
+    def get_many(self, patient_ids):
+        """Fetch several records with one query; returns ``{patient_id: record}`` for those found"""
+        found = {}
+        with self._lock:
+            self._check_data_version()
+            missing = {}
+            for patient_id in patient_ids:
+                alias = str(patient_id).lower()
+                record = self._cache.get(alias)
+                if record is not None:
+                    found[patient_id] = record
+                else:
+                    missing.setdefault(alias, []).append(patient_id)
+            aliases = list(missing)
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(aliases), 500):
+                chunk = aliases[start:start + 500]
+                rows = self._conn.execute(
+                    "SELECT a.alias, p.record_json FROM patient_aliases a JOIN patients p"
+                    f" ON p.patient_key = a.patient_key WHERE a.alias IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                for alias, record_json in rows:
+                    record = json.loads(record_json)
+                    if self._cache_size > 0:
+                        self._cache[alias] = record
+                    for patient_id in missing[alias]:
+                        found[patient_id] = record
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return found
+
+    def _check_data_version(self):
+        # data_version changes whenever another connection commits, e.g. a re-ingest
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._cache.clear()
+            self._data_version = version
+
+    def _keys(self, sql, params):
+        with self._lock:
+            return [row[0] for row in self._conn.execute(sql, params)]
+
+    def patient_keys(self):
+        return self._keys("SELECT patient_key FROM patients ORDER BY patient_key", ())
+
+    def find_by_patient_id(self, patient_id):
+        return self._keys("SELECT patient_key FROM patients WHERE patient_id = ?", (str(patient_id),))
+
+    def find_by_condition(self, term):
+        """Patients with a diagnosis or condition containing a word starting with ``term``"""
+        return self._keys(
+            "SELECT DISTINCT patient_key FROM patient_conditions WHERE term >= ? AND term < ?"
+            " ORDER BY patient_key", _prefix_range(term)
+        )
+
+    def find_by_medication(self, term):
+        """Patients with a medication containing a word starting with ``term`` (e.g. ``metformin``)"""
+        return self._keys(
+            "SELECT DISTINCT patient_key FROM patient_medications WHERE term >= ? AND term < ?"
+            " ORDER BY patient_key", _prefix_range(term)
+        )
+
+    def find_by_visit_range(self, start=None, end=None):
+        """Patients with any visit, admission or discharge in ``[start, end]`` (ISO dates)"""
+        return self._keys(
+            "SELECT DISTINCT patient_key FROM patient_visits WHERE visit_date >= ? AND visit_date <= ?"
+            " ORDER BY patient_key", (start or "", end or "9999-12-31")
+        )
+
+def _word_suffixes(text):
+    # "Type 2 Diabetes" -> ["Type 2 Diabetes", "2 Diabetes", "Diabetes"], so an
+    # indexed prefix match finds any word in the value
+    words = str(text).split()
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+def _prefix_range(term):
+    # Index-friendly prefix match on NOCASE columns
+    term = term.strip()
+    return (term, term + "\U0010ffff")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the indexed EHR store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest = subparsers.add_parser("ingest", help="Ingest JSON records into the store")
+    ingest.add_argument("--ehr-dir", default="ehr")
+    ingest.add_argument("--db", default=DEFAULT_DB_PATH)
+    args = parser.parse_args(argv)
+
+    store = EHRStore(args.db)
+    try:
+        stats = store.ingest(args.ehr_dir)
+    finally:
+        store.close()
+    print(json.dumps(stats))
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,263 @@
 import asyncio
+import json
+import os
 import logging
+import httpx
+from .response_cache import ResponseCache, get_response_cache
+from .metrics import timed_stage
+from .single_flight import SingleFlight
 
 logger = logging.getLogger("hipaa-medical-mcp")
 
-async def call_local_llama(prompt):
-    """Call local LLaMA model for AI responses"""
+UNAVAILABLE_MESSAGE = "LLaMA model is currently unavailable. Please try again later."
+# Appended to the text streamed so far when generation fails mid-stream
+INTERRUPTED_MARKER = "[response interrupted]"
+
+def is_failed_response(text):
+    """True for responses that must not be cached or shown as a complete answer"""
+    return text == UNAVAILABLE_MESSAGE or text.endswith(INTERRUPTED_MARKER)
+
+class OllamaClient:
+    """Long-lived async client for the Ollama REST API.
+
+    One pooled ``httpx.AsyncClient`` is reused for every request so TCP
+    connections stay alive between tool calls, and ``keep_alive`` asks Ollama
+    to keep the model resident between generations.
+    """
+
+    def __init__(self, base_url=None, model=None, keep_alive=None, max_concurrency=None,
+                 timeout=None, connect_timeout=None, max_retries=None, max_connections=None):
+        self.base_url = (base_url or os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434")).rstrip("/")
+        if "://" not in self.base_url:
+            self.base_url = f"http://{self.base_url}"
+        self.model = model or os.environ.get("OLLAMA_MODEL", "llama3.2:latest")
+        self.keep_alive = keep_alive or os.environ.get("OLLAMA_KEEP_ALIVE", "30m")
+        self.max_concurrency = max_concurrency or int(os.environ.get("OLLAMA_MAX_CONCURRENCY", "4"))
+        self.timeout = timeout or float(os.environ.get("OLLAMA_TIMEOUT", "300"))
+        self.connect_timeout = connect_timeout or float(os.environ.get("OLLAMA_CONNECT_TIMEOUT", "5"))
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get("OLLAMA_MAX_RETRIES", "2"))
+        self.max_connections = max_connections or max(self.max_concurrency, 8)
+        self._client = None
+        self._semaphore = None
+
+    def _get_client(self):
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60.0
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    def _payload(self, prompt, stream, system=None):
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive
+        }
+        if system:
+            payload["system"] = system
+        return payload
+
+    async def generate(self, prompt, system=None):
+        client = self._get_client()
+        async with self._semaphore:
+            response = await self._post_with_retries(client, "/api/generate", self._payload(prompt, False, system))
+            return response.json().get("response", "").strip()
+
+    async def generate_stream(self, prompt, on_token, system=None):
+        """Stream a generation, awaiting ``on_token(chunk)`` as chunks arrive.
+
+        Connection failures are retried only until the first chunk has been
+        received; the concatenated text is returned at the end.
+        """
+        client = self._get_client()
+        async with self._semaphore:
+            delay = 0.25
+            for attempt in range(self.max_retries + 1):
+                parts = []
+                try:
+                    async with client.stream("POST", "/api/generate", json=self._payload(prompt, True, system)) as response:
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if not line:
+                                continue
+                            chunk = json.loads(line)
+                            if chunk.get("error"):
+                                raise RuntimeError(chunk["error"])
+                            text = chunk.get("response", "")
+                            if text:
+                                parts.append(text)
+                                await on_token(text)
+                            if chunk.get("done"):
+                                break
+                    return "".join(parts).strip()
+                except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                    retryable = not parts and (
+                        isinstance(e, httpx.TransportError) or e.response.status_code >= 500
+                    )
+                    if not retryable or attempt == self.max_retries:
+                        raise
+                    logger.warning(f"Ollama stream failed ({e}), retrying in {delay:.2f}s")
+                    await asyncio.sleep(delay)
+                    delay *= 2
+
+    async def warm_up(self):
+        """Load the model into Ollama memory without generating anything"""
+        client = self._get_client()
+        payload = {"model": self.model, "keep_alive": self.keep_alive}
+        await self._post_with_retries(client, "/api/generate", payload)
+
+    async def _post_with_retries(self, client, path, payload):
+        delay = 0.25
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.post(path, json=payload)
+                if response.status_code < 500:
+                    response.raise_for_status()
+                    return response
+                error = httpx.HTTPStatusError(
+                    f"Ollama returned {response.status_code}", request=response.request, response=response
+                )
+            except httpx.TransportError as e:
+                error = e
+            if attempt == self.max_retries:
+                raise error
+            logger.warning(f"Ollama request failed ({error}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+            delay *= 2
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+_default_client = None
+_llm_backend = None
+# Identical prompts in flight at the same time share one generation
+llm_flight = SingleFlight("llm")
+
+def get_ollama_client():
+    global _default_client
+    if _default_client is None:
+        _default_client = OllamaClient()
+    return _default_client
+
+def set_ollama_client(client):
+    """Replace the shared client, e.g. to point at a stub server"""
+    global _default_client
+    _default_client = client
+
+def set_llm_backend(backend):
+    """Route generations to ``backend(prompt, on_token, system=None)`` instead of Ollama; ``None`` restores Ollama.
+
+    Used by the benchmarks to plug in a deterministic stub model.
+    """
+    global _llm_backend
+    _llm_backend = backend
+
+async def close_ollama_client():
+    if _default_client is not None:
+        await _default_client.aclose()
+
+async def _call_ollama_cli(prompt, model):
+    process = await asyncio.create_subprocess_exec(
+        "ollama", "run", model,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+
+    stdout, stderr = await process.communicate(input=prompt.encode())
+
+    if process.returncode != 0:
+        raise Exception(f"LLaMA execution failed: {stderr.decode()}")
+
+    return stdout.decode().strip()
+
+@timed_stage("llm")
+async def call_local_llama(prompt, on_token=None, system=None):
+    """Call local LLaMA model for AI responses.
+
+    If ``on_token`` is given the response is streamed and each chunk is
+    awaited through it; the full text is returned either way. ``system`` is
+    sent as Ollama's system prompt so a prefix shared by many requests can be
+    reused from the model's prompt cache. Responses are served from the
+    response cache when the exact prompt was seen recently, and concurrent
+    calls with the same prompt share one generation (late joiners are sent
+    the chunks streamed so far, then the rest as they arrive).
+    """
+    client = get_ollama_client()
+    cache = get_response_cache()
+    key = ResponseCache.key_for(prompt, client.model, system)
+    if cache is not None:
+        cached = await cache.aget(key)
+        if cached is not None:
+            if on_token is not None:
+                await on_token(cached)
+            return cached
+
+    async def generate(emit):
+        # Stream only if the caller that started the generation asked for it
+        response = await _generate(client, prompt, emit if on_token is not None else None, system)
+        if cache is not None and not is_failed_response(response):
+            await cache.aput(key, response)
+        return response
+
+    if on_token is None:
+        return await llm_flight.do(key, generate)
+
+    streamed = False
+
+    async def listener(text):
+        nonlocal streamed
+        streamed = True
+        await on_token(text)
+
+    response = await llm_flight.do(key, generate, listener)
+    if not streamed:
+        # Joined a non-streaming generation
+        await on_token(response)
+    return response
+
+async def _generate(client, prompt, on_token, system=None):
+    if _llm_backend is not None:
+        return await _llm_backend(prompt, on_token, system=system)
+    parts = []
+    try:
+        if on_token is None:
+            return await client.generate(prompt, system)
+
+        async def forward(text):
+            parts.append(text)
+            await on_token(text)
+
+        return await client.generate_stream(prompt, forward, system)
+    except Exception as e:
+        logger.warning(f"Ollama HTTP API unavailable: {e}")
+        if parts:
+            # The client already shows these chunks; keep them and say the answer is cut short
+            # rather than replacing them with a retry message
+            marker = f"\n\n{INTERRUPTED_MARKER}"
+            try:
+                await on_token(marker)
+            except Exception:
+                pass
+            return "".join(parts) + marker
+
+    if os.environ.get("OLLAMA_CLI_FALLBACK", "1") == "0":
+        return UNAVAILABLE_MESSAGE
     try:
-        process = await asyncio.create_subprocess_exec(
-            "ollama", "run", "llama3.2:latest",
-            stdin=asyncio.subprocess.PIPE,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        stdout, stderr = await process.communicate(input=prompt.encode())
-        
-        if process.returncode != 0:
-            raise Exception(f"LLaMA execution failed: {stderr.decode()}")
-        
-        return stdout.decode().strip()
-        
+        response = await _call_ollama_cli(f"{system}\n\n{prompt}" if system else prompt, client.model)
     except Exception as e:
         logger.warning(f"Local LLaMA unavailable: {e}")
-        return "LLaMA model is currently unavailable. Please try again later."
\ No newline at end of file
+        return UNAVAILABLE_MESSAGE
+    if on_token is not None:
+        await on_token(response)
+    return response
@@ -0,0 +1,232 @@
+import asyncio
+import functools
+import inspect
+import os
+import threading
+import time
+import logging
+from bisect import bisect_left
+from collections import deque
+
+logger = logging.getLogger("hipaa-medical-mcp")
+
+class Histogram:
+    """Fixed-bucket histogram with a small reservoir of recent samples for percentiles"""
+
+    def __init__(self, buckets, reservoir_size=1024):
+        self.buckets = sorted(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._recent = deque(maxlen=reservoir_size)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        with self._lock:
+            self._counts[bisect_left(self.buckets, value)] += 1
+            self._recent.append(value)
+            self.count += 1
+            self.total += value
+            self.min = value if self.min is None else min(self.min, value)
+            self.max = value if self.max is None else max(self.max, value)
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)
+            self._recent.clear()
+            self.count = 0
+            self.total = 0.0
+            self.min = None
+            self.max = None
+
+    def percentile(self, q):
+        with self._lock:
+            samples = sorted(self._recent)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, max(0, int(round(q / 100.0 * (len(samples) - 1)))))
+        return samples[index]
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            count, total, low, high = self.count, self.total, self.min, self.max
+        buckets = {str(bound): counts[i] for i, bound in enumerate(self.buckets)}
+        buckets["+Inf"] = counts[-1]
+        return {
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else None,
+            "min": low,
+            "max": high,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": buckets
+        }
+
+class Counter:
+    """Monotonic counter"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+# Seconds; spans sub-millisecond masking up to multi-second LLM generations
+LATENCY_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120]
+
+class MetricsRegistry:
+    """Named, labelled counters and histograms with JSON and Prometheus text export"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._scales = {}
+        self._help = {}
+
+    def counter(self, name, help_text="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._counters.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._counters.setdefault(key, Counter())
+                self._help.setdefault(name, help_text)
+        return metric
+
+    def histogram(self, name, help_text="", buckets=LATENCY_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self._histograms.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._histograms.setdefault(key, Histogram(buckets))
+                self._help.setdefault(name, help_text)
+        return metric
+
+    def register_histogram(self, name, histogram, help_text="", scale=1.0, **labels):
+        """Expose a histogram owned by another component.
+
+        ``scale`` converts its observations to the exported unit, e.g. ``0.001``
+        to export a milliseconds histogram as ``*_seconds``.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._histograms[key] = histogram
+            self._scales[key] = scale
+            self._help.setdefault(name, help_text)
+
+    def reset(self):
+        """Zero every metric in place (benchmarks call this after warm-up)"""
+        with self._lock:
+            counters = list(self._counters.values())
+            histograms = list(self._histograms.values())
+        for counter in counters:
+            with counter._lock:
+                counter.value = 0
+        for histogram in histograms:
+            histogram.reset()
+
+    def snapshot(self):
+        with self._lock:
+            counters = list(self._counters.items())
+            histograms = list(self._histograms.items())
+        result = {"counters": {}, "histograms": {}}
+        for (name, labels), metric in counters:
+            result["counters"].setdefault(name, []).append({"labels": dict(labels), "value": metric.value})
+        for (name, labels), metric in histograms:
+            entry = metric.snapshot()
+            entry.pop("buckets")
+            scale = self._scales.get((name, labels), 1.0)
+            if scale != 1.0:
+                entry = {key: value * scale if key != "count" and value is not None else value
+                         for key, value in entry.items()}
+            result["histograms"].setdefault(name, []).append(dict(entry, labels=dict(labels)))
+        return result
+
+    def to_prometheus(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+        lines = []
+        seen = set()
+        for (name, labels), metric in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {self._help.get(name, '')}")
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{name}{_format_labels(labels)} {metric.value}")
+        for (name, labels), metric in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f"# HELP {name} {self._help.get(name, '')}")
+                lines.append(f"# TYPE {name} histogram")
+            scale = self._scales.get((name, labels), 1.0)
+            with metric._lock:
+                counts = list(metric._counts)
+                count, total = metric.count, metric.total
+            cumulative = 0
+            for bound, bucket_count in zip(metric.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', f'{bound * scale:g}'),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total * scale}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Atomically write the text exposition format, e.g. for node_exporter's textfile collector"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for key, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+metrics = MetricsRegistry()
+
+def stage_histogram(stage):
+    return metrics.histogram("hipaa_stage_duration_seconds", "Time spent per request pipeline stage", stage=stage)
+
+def timed_stage(stage):
+    """Decorator recording a function's wall time in ``hipaa_stage_duration_seconds{stage=...}``"""
+    def decorator(func):
+        histogram = stage_histogram(stage)
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - started)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+async def export_prometheus_file(path, interval):
+    """Rewrite ``path`` with the current metrics every ``interval`` seconds until cancelled"""
+    while True:
+        try:
+            await asyncio.to_thread(metrics.write_prometheus, path)
+        except OSError as e:
+            logger.warning(f"Failed to write metrics file {path}: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,46 @@
+import cProfile
+import io
+import os
+import pstats
+import time
+import logging
+
+logger = logging.getLogger("hipaa-medical-mcp")
+
+_active = False
+
+def profiling_enabled():
+    return os.environ.get("HIPAA_ALLOW_PROFILING", "0") == "1"
+
+async def profile_call(awaitable, top=25):
+    """Await ``awaitable`` under cProfile and return ``(result, report)``.
+
+    cProfile is process-wide, so other requests running concurrently show up
+    in the profile too; only one profiled request runs at a time and any
+    overlapping request is simply not profiled (``report`` is None).
+    """
+    global _active
+    if _active:
+        return await awaitable, None
+    _active = True
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        result = await awaitable
+    finally:
+        profiler.disable()
+        _active = False
+    elapsed = time.perf_counter() - started
+
+    profile_dir = os.environ.get("HIPAA_PROFILE_DIR")
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+        path = os.path.join(profile_dir, f"request-{int(time.time() * 1000)}.prof")
+        profiler.dump_stats(path)
+        logger.info(f"Request profile written to {path}")
+
+    out = io.StringIO()
+    out.write(f"Profiled request wall time: {elapsed * 1000:.1f} ms\n")
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top)
+    return result, out.getvalue()
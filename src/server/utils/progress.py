@@ -0,0 +1,79 @@
+import contextvars
+import os
+import time
+import logging
+
+logger = logging.getLogger("hipaa-medical-mcp")
+
+_current_streamer = contextvars.ContextVar("hipaa_progress_streamer", default=None)
+
+class ProgressStreamer:
+    """Forward partial LLM output to the client as MCP progress notifications.
+
+    Tokens are coalesced so that at most one notification is sent per
+    ``flush_interval`` seconds; the first token is always sent immediately so
+    time-to-first-token is not delayed.
+    """
+
+    def __init__(self, session, progress_token, request_id=None, flush_interval=None):
+        self.session = session
+        self.progress_token = progress_token
+        self.request_id = request_id
+        if flush_interval is None:
+            flush_interval = float(os.environ.get("HIPAA_STREAM_FLUSH_INTERVAL", "0.05"))
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._sent = 0
+        self._last_flush = 0.0
+        self._failed = False
+        self._context_token = None
+
+    async def send(self, text):
+        if not text or self._failed:
+            return
+        self._buffer.append(text)
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            await self.flush()
+
+    async def flush(self):
+        if not self._buffer or self._failed:
+            return
+        chunk = "".join(self._buffer)
+        self._buffer = []
+        self._sent += 1
+        self._last_flush = time.monotonic()
+        try:
+            await self.session.send_progress_notification(
+                self.progress_token,
+                progress=self._sent,
+                message=chunk,
+                related_request_id=str(self.request_id) if self.request_id is not None else None
+            )
+        except Exception as e:
+            # Streaming is best effort; the full text is still returned at the end
+            self._failed = True
+            logger.warning(f"Failed to stream progress: {e}")
+
+    async def close(self):
+        """Send any buffered text and detach from the current request"""
+        await self.flush()
+        if self._context_token is not None:
+            _current_streamer.reset(self._context_token)
+            self._context_token = None
+
+def bind_request_streamer(request_context):
+    """Attach a streamer to the current request if the client asked for progress"""
+    if os.environ.get("HIPAA_STREAM_TOKENS", "1") == "0":
+        return None
+    meta = getattr(request_context, "meta", None)
+    progress_token = getattr(meta, "progressToken", None) if meta else None
+    if progress_token is None:
+        return None
+    streamer = ProgressStreamer(request_context.session, progress_token, request_context.request_id)
+    streamer._context_token = _current_streamer.set(streamer)
+    return streamer
+
+def get_stream_sink():
+    """Return the token callback for the current request, or None if not streaming"""
+    streamer = _current_streamer.get()
+    return streamer.send if streamer else None
@@ -0,0 +1,153 @@
+import json
+import os
+import re
+from collections import namedtuple
+
+# ``system`` is identical for every call of a tool, so the backend can reuse
+# its KV/prompt cache for that prefix; ``prompt`` carries the per-request part
+Prompt = namedtuple("Prompt", ["system", "prompt"])
+
+CLINICAL_SYSTEM_PROMPT = """You are a clinical decision support assistant integrated into a hospital's EHR system, assisting licensed clinicians as part of their workflow. Patient data comes from the hospital's secure EHR and has already been filtered for the requesting role under HIPAA access controls. Use professional medical terminology and include appropriate medical disclaimers."""
+
+PATIENT_INFO_SYSTEM_PROMPT = CLINICAL_SYSTEM_PROMPT + """
+
+Answer the clinical query from the patient record provided: focus on conditions, medications and clinical findings relevant to the query, and suggest appropriate clinical considerations."""
+
+XRAY_SYSTEM_PROMPT = CLINICAL_SYSTEM_PROMPT + """
+
+You will receive torchxrayvision pathology probability scores for a chest X-ray and the patient's record. Write a clinical report suitable for medical documentation: interpret the scores (>0.5 noteworthy, >0.7 highly significant), correlate them with the patient's history, recommend follow-up actions and include a disclaimer about AI-assisted diagnosis."""
+
+CHAT_SYSTEM_PROMPT = CLINICAL_SYSTEM_PROMPT + """
+
+Respond conversationally but stay clinically focused: provide medically relevant information, clinical considerations and recommendations."""
+
+# Fields always kept so the model knows who it is reasoning about
+CORE_FIELDS = ("patient_id", "age", "gender")
+
+# Query keyword stems -> record fields that answer them, most relevant first.
+# Both record shapes are covered (Patient_N and patient_PNNN).
+FIELD_GROUPS = [
+    (("medic", "drug", "prescri", "dose", "dosage", "pill", "interact", "taking", "pharm"),
+     ("current_medications", "medications", "allergies", "medical_conditions", "diagnosis")),
+    (("allerg", "reaction", "intoleran"),
+     ("allergies", "current_medications", "medications")),
+    (("vital", "blood pressure", "bp", "heart rate", "pulse", "temperature", "fever", "weight", "height", "bmi"),
+     ("vital_signs", "medical_conditions", "diagnosis")),
+    (("lab", "a1c", "glucose", "cholesterol", "test", "result", "level"),
+     ("lab_results", "medical_conditions", "diagnosis", "current_medications", "medications")),
+    (("condition", "diagnos", "problem", "disease", "comorbid", "complaint", "symptom", "history"),
+     ("medical_conditions", "diagnosis", "chief_complaint", "notes", "status")),
+    (("visit", "admi", "discharg", "appointment", "follow", "status", "stay"),
+     ("last_visit", "admission_date", "discharge_date", "status", "chief_complaint")),
+    (("insurance", "policy", "coverage"),
+     ("insurance", "policy_number")),
+    (("contact", "phone", "email", "address"),
+     ("phone", "email", "address", "emergency_contact")),
+]
+
+# Without a specific match the whole record is sent, clinical fields first so
+# identifiers and billing details are the first to go when over budget
+CLINICAL_PRIORITY = list(dict.fromkeys(field for _, fields in FIELD_GROUPS[:6] for field in fields))
+
+_GROUP_PATTERNS = [
+    (re.compile("|".join(r"\b" + re.escape(stem) for stem in stems), re.IGNORECASE), fields)
+    for stems, fields in FIELD_GROUPS
+]
+
+# Smallest record context budget, whatever the query and scores leave over
+MIN_RECORD_TOKENS = 64
+# Shortened values keep at least this many characters
+MIN_VALUE_CHARS = 16
+
+def token_budget():
+    return int(os.environ.get("HIPAA_PROMPT_TOKEN_BUDGET", "1024"))
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token for English and JSON)"""
+    return (len(text) + 3) // 4
+
+def compact_json(value):
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+def select_fields(query):
+    """Record fields relevant to ``query`` in priority order, or None to keep the whole record"""
+    selected = []
+    for pattern, fields in _GROUP_PATTERNS:
+        if pattern.search(query or ""):
+            selected.extend(field for field in fields if field not in selected)
+    return selected or None
+
+def build_record_context(record, query, budget_tokens):
+    """Serialize the parts of ``record`` relevant to ``query`` within ``budget_tokens``.
+
+    The result is always a valid JSON object holding the core fields and the
+    most relevant one; a tiny or negative budget is raised to
+    ``MIN_RECORD_TOKENS``.
+    """
+    if not record:
+        return "{}"
+    budget_tokens = max(budget_tokens, MIN_RECORD_TOKENS)
+    fields = select_fields(query)
+    if fields is None:
+        ordered = [key for key in CLINICAL_PRIORITY if key in record]
+        ordered += [key for key in record if key not in CORE_FIELDS and key not in ordered]
+    else:
+        ordered = [key for key in fields if key in record]
+    keys = [key for key in CORE_FIELDS if key in record] + ordered
+    context = {key: record[key] for key in keys if record[key] not in (None, "", [], {})}
+
+    text = compact_json(context)
+    # Least relevant fields go first (the most relevant one always stays),
+    # then the remaining values are shortened one at a time
+    droppable = [key for key in reversed(ordered[1:]) if key in context]
+    while estimate_tokens(text) > budget_tokens and droppable:
+        del context[droppable.pop(0)]
+        text = compact_json(context)
+    for key in reversed([key for key in context if key not in CORE_FIELDS]):
+        # Escaping can make the serialized value longer than its text, so repeat until it fits
+        while len(text) > budget_tokens * 4:
+            # Lists and objects are cut as their JSON text, so the record stays valid JSON
+            value = context[key] if isinstance(context[key], str) else compact_json(context[key])
+            limit = max(MIN_VALUE_CHARS, len(value) - (len(text) - budget_tokens * 4) - 1)
+            if limit >= len(value) - 1:
+                break
+            context[key] = value[:limit] + "…"
+            text = compact_json(context)
+    return text
+
+def _split_budget(query, budget_tokens):
+    # The query is user-supplied; cap it so the record always keeps room
+    query = query or ""
+    max_query_chars = budget_tokens * 2
+    if len(query) > max_query_chars:
+        query = query[:max_query_chars] + "…"
+    return query, budget_tokens - estimate_tokens(query) - 32
+
+def build_patient_info_prompt(user_role, masked_data, query, budget_tokens=None):
+    """Prompt for a clinical question about one patient record"""
+    query, remaining = _split_budget(query, budget_tokens or token_budget())
+    record = build_record_context(masked_data, query, remaining)
+    return Prompt(PATIENT_INFO_SYSTEM_PROMPT,
+                  f"Role: {user_role}\nRecord: {record}\nQuery: {query}")
+
+def format_scores(results):
+    """Pathology scores sorted by probability, rounded to three decimals"""
+    ordered = sorted(results.items(), key=lambda item: -float(item[1]))
+    return compact_json({name: round(float(score), 3) for name, score in ordered})
+
+def build_xray_prompt(user_role, patient_id, masked_data, results, query, budget_tokens=None):
+    """Prompt for interpreting one patient's pathology scores"""
+    scores = format_scores(results)
+    query, remaining = _split_budget(query, budget_tokens or token_budget())
+    # Imaging findings are correlated with history, so conditions stay in scope
+    record = build_record_context(masked_data, f"{query} history", remaining - estimate_tokens(scores))
+    return Prompt(XRAY_SYSTEM_PROMPT,
+                  f"Role: {user_role}\nPatient ID: {patient_id}\nX-ray scores: {scores}\nRecord: {record}\nQuery: {query}")
+
+def build_chat_prompt(user_role, message, patient_context="", masked_data=None, budget_tokens=None):
+    """Prompt for a free-form clinical question, optionally about one patient"""
+    message, remaining = _split_budget(message, budget_tokens or token_budget())
+    context = ""
+    if masked_data:
+        context = f"Patient {patient_context}: {build_record_context(masked_data, message, remaining)}\n"
+    return Prompt(CHAT_SYSTEM_PROMPT, f"Role: {user_role}\n{context}Query: {message}")
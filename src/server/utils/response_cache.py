@@ -0,0 +1,199 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger("hipaa-medical-mcp")
+
+class EncryptedDiskTier:
+    """On-disk cache entries encrypted with Fernet (AES-128-CBC + HMAC).
+
+    Requires the optional ``cryptography`` package and a Fernet key, e.g. from
+    ``python -c "from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())"``.
+    """
+
+    def __init__(self, directory, key, ttl_seconds):
+        try:
+            from cryptography.fernet import Fernet, InvalidToken
+        except ImportError as e:
+            raise RuntimeError("The encrypted LLM cache tier requires the 'cryptography' package") from e
+        if not key:
+            raise RuntimeError("HIPAA_LLM_CACHE_KEY must be set to enable the encrypted LLM cache tier")
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self._fernet = Fernet(key.encode() if isinstance(key, str) else key)
+        self._invalid_token = InvalidToken
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                token = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            # Fernet tokens carry their creation time, so the TTL is enforced on decrypt
+            return self._fernet.decrypt(token, ttl=int(self.ttl_seconds) if self.ttl_seconds else None).decode()
+        except self._invalid_token:
+            self.delete(key)
+            return None
+
+    def put(self, key, text):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self._fernet.encrypt(text.encode()))
+        os.replace(tmp_path, path)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".bin"):
+                os.remove(os.path.join(self.directory, name))
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.bin")
+
+class ResponseCache:
+    """TTL + LRU cache of LLM responses keyed by a hash of the final prompt.
+
+    Prompts embed the user role, the masked EHR record and any X-ray scores,
+    so a changed record or image yields a different key and stale answers are
+    never served. An encrypted disk tier can be enabled on top of the
+    in-memory tier.
+    """
+
+    def __init__(self, ttl_seconds=None, max_entries=None, max_bytes=None, disk_tier=None):
+        if ttl_seconds is None:
+            ttl_seconds = float(os.environ.get("HIPAA_LLM_CACHE_TTL", "3600"))
+        if max_entries is None:
+            max_entries = int(os.environ.get("HIPAA_LLM_CACHE_SIZE", "1024"))
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("HIPAA_LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_tier = disk_tier
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key_for(prompt, model="", system=None):
+        if system:
+            return hashlib.sha256(f"{model}\0{system}\0{prompt}".encode()).hexdigest()
+        return hashlib.sha256(f"{model}\0{prompt}".encode()).hexdigest()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, text, _ = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return text
+                self._remove(key)
+        if self.disk_tier is not None:
+            try:
+                text = self.disk_tier.get(key)
+            except Exception as e:
+                logger.warning(f"LLM cache disk read failed: {e}")
+                text = None
+            if text is not None:
+                self._put_memory(key, text)
+                with self._lock:
+                    self.disk_hits += 1
+                return text
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, text):
+        self._put_memory(key, text)
+        if self.disk_tier is not None:
+            try:
+                self.disk_tier.put(key, text)
+            except Exception as e:
+                logger.warning(f"LLM cache disk write failed: {e}")
+
+    async def aget(self, key):
+        if self.disk_tier is None:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aput(self, key, text):
+        if self.disk_tier is None:
+            return self.put(key, text)
+        await asyncio.to_thread(self.put, key, text)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.disk_tier is not None:
+            self.disk_tier.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0
+            }
+
+    def _put_memory(self, key, text):
+        size = len(text.encode())
+        if self.max_entries <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, text, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+_response_cache = None
+
+def get_response_cache():
+    """Return the shared response cache, or None if ``HIPAA_LLM_CACHE=0``"""
+    global _response_cache
+    if _response_cache is None and os.environ.get("HIPAA_LLM_CACHE", "1") != "0":
+        disk_tier = None
+        disk_dir = os.environ.get("HIPAA_LLM_CACHE_DIR")
+        if disk_dir:
+            try:
+                disk_tier = EncryptedDiskTier(
+                    disk_dir, os.environ.get("HIPAA_LLM_CACHE_KEY"),
+                    float(os.environ.get("HIPAA_LLM_CACHE_TTL", "3600"))
+                )
+            except RuntimeError as e:
+                logger.warning(f"LLM cache disk tier disabled: {e}")
+        _response_cache = ResponseCache(disk_tier=disk_tier)
+    return _response_cache
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import logging
+from .metrics import metrics
+
+logger = logging.getLogger("hipaa-medical-mcp")
+
+class _Flight:
+    def __init__(self):
+        self.task = None
+        self.events = []
+        self.listeners = []
+        self.waiters = 0
+
+    async def emit(self, event):
+        """Record an event for late joiners and forward it to current listeners"""
+        self.events.append(event)
+        for listener in list(self.listeners):
+            try:
+                await listener(event)
+            except Exception as e:
+                # One caller's broken stream must not fail the shared work
+                logger.warning(f"Dropping single-flight listener: {e}")
+                self._remove(listener)
+
+    async def subscribe(self, listener):
+        # Replay what the flight has emitted so far; re-check the length after
+        # each await since the producer may have emitted more meanwhile
+        delivered = 0
+        while delivered < len(self.events):
+            await listener(self.events[delivered])
+            delivered += 1
+        self.listeners.append(listener)
+
+    def _remove(self, listener):
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+class SingleFlight:
+    """Coalesce concurrent calls that would do identical work.
+
+    The first caller for a key starts ``fn(emit)`` as a task; callers that
+    arrive with the same key while it is running await the same task instead
+    of repeating the work. ``emit`` lets the work publish progress events
+    (e.g. streamed tokens), which are replayed to late joiners and forwarded
+    to every caller's ``listener``. The work is cancelled only when every
+    waiting caller has been cancelled.
+    """
+
+    def __init__(self, name, enabled=None):
+        if enabled is None:
+            enabled = os.environ.get("HIPAA_SINGLE_FLIGHT", "1") != "0"
+        self.name = name
+        self.enabled = enabled
+        self.leaders = 0
+        self.shared = 0
+        self._flights = {}
+
+    async def do(self, key, fn, listener=None):
+        if not self.enabled:
+            flight = _Flight()
+            if listener is not None:
+                flight.listeners.append(listener)
+            return await fn(flight.emit)
+
+        flight = self._flights.get(key)
+        if flight is None or flight.task.done():
+            flight = _Flight()
+            flight.task = asyncio.ensure_future(fn(flight.emit))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._finish(key, flight))
+            self.leaders += 1
+            role = "leader"
+        else:
+            self.shared += 1
+            role = "shared"
+        metrics.counter("hipaa_single_flight_calls_total", "Coalescable calls by whether they ran or joined the work",
+                        flight=self.name, role=role).inc()
+
+        flight.waiters += 1
+        try:
+            if listener is not None:
+                await flight.subscribe(listener)
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if listener is not None:
+                flight._remove(listener)
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    def _finish(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            # Failures are delivered to every waiter; don't warn about them again
+            flight.task.exception()
+
+    def stats(self):
+        calls = self.leaders + self.shared
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._flights),
+            "executed": self.leaders,
+            "shared": self.shared,
+            "shared_rate": self.shared / calls if calls else 0.0
+        }